@@ -0,0 +1,86 @@
+"""Memoisation of backtest metrics for strategy variants."""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+from collections import OrderedDict
+from typing import Any, Dict
+
+
+class FitnessCache:
+    """LRU cache of variant metrics keyed by parameters and data window.
+
+    Parameters
+    ----------
+    max_entries : int
+        Number of evaluations kept; the least recently used are evicted.
+    path : str, optional
+        JSON file used by :meth:`load` and :meth:`save` to persist the cache
+        between runs.
+    """
+
+    def __init__(self, max_entries: int = 10000, path: str | None = None) -> None:
+        self.max_entries = max_entries
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[str, Dict[str, float]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def key(params: Dict[str, Any], fingerprint: str) -> str:
+        """Return the cache key of ``params`` evaluated on ``fingerprint``."""
+
+        payload = json.dumps(params, sort_keys=True, default=str) + fingerprint
+        return hashlib.sha1(payload.encode()).hexdigest()
+
+    def get(self, key: str) -> Dict[str, float] | None:
+        """Return a copy of the cached metrics for ``key`` or ``None``."""
+
+        metrics = self._entries.get(key)
+        if metrics is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._entries.move_to_end(key)
+        return dict(metrics)
+
+    def put(self, key: str, metrics: Dict[str, float]) -> None:
+        """Store ``metrics`` under ``key`` evicting the oldest entries."""
+
+        self._entries[key] = dict(metrics)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def load(self) -> None:
+        """Read persisted entries from :attr:`path` if it exists."""
+
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path) as f:
+                entries = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return
+        for key, metrics in entries:
+            self.put(key, metrics)
+
+    def save(self) -> None:
+        """Persist the entries to :attr:`path` atomically."""
+
+        if not self.path:
+            return
+        tmp = self.path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(list(self._entries.items()), f)
+        os.replace(tmp, self.path)
+
+    def stats(self) -> Dict[str, int]:
+        """Return hit/miss counters and current size."""
+
+        return {"cache_hits": self.hits, "cache_misses": self.misses, "cache_size": len(self)}
@@ -1,10 +1,201 @@
 """Engine to run historical backtests of trading strategies."""
 
 
-import random
+import hashlib
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from typing import List, Dict
 
+import numpy as np
+
+from backtest.cache import FitnessCache
+from data_feed.storage import interval_to_ms, open_store, records_to_frame
+from models.features import STOCH_WINDOW, candle_numbers, stochastic_k
 from strategy import StrategyVariant
+from trading.simulation import ExecutionModel, candle_arrays
+
+
+def strategy_returns(close, positions, commission_pct, entry=None, exit=None):
+    """Compute per-candle returns of long/flat ``positions``.
+
+    ``positions[v, t]`` is decided at the close of candle ``t`` and earns the
+    return from ``t`` to ``t + 1``. Every change of position pays
+    ``commission_pct`` of the traded notional after that candle's return.
+    With ``entry``/``exit`` prices (see
+    :meth:`trading.simulation.ExecutionModel.round_trip_prices`) the first
+    candle of a position earns ``close / entry`` and the candle after it
+    ends earns ``exit / previous close`` instead of close-to-close returns.
+
+    Parameters
+    ----------
+    close : numpy.ndarray
+        Close prices of shape ``(T,)``.
+    positions : numpy.ndarray
+        Boolean array of shape ``(V, T)``, one row per variant.
+    entry, exit : numpy.ndarray, optional
+        Fill prices of shape ``(T,)`` of orders decided at the previous close.
+
+    Returns
+    -------
+    numpy.ndarray
+        Strategy returns of shape ``(V, T)``; the first column is ``0``
+        except for the commission of positions opened on the first candle.
+    """
+
+    returns = np.zeros(len(close))
+    returns[1:] = close[1:] / close[:-1] - 1
+    held = np.zeros(positions.shape, dtype=bool)
+    held[:, 1:] = positions[:, :-1]
+    turnover = np.abs(np.diff(positions.astype(np.int8), prepend=0, axis=1))
+    if entry is None:
+        gross = held * returns
+    else:
+        before = np.zeros(positions.shape, dtype=bool)
+        before[:, 1:] = held[:, :-1]
+        entry_returns = close / entry - 1
+        exit_returns = np.zeros(len(close))
+        exit_returns[1:] = exit[1:] / close[:-1] - 1
+        gross = np.where(
+            held,
+            np.where(before, returns, entry_returns),
+            np.where(before, exit_returns, 0.0),
+        )
+    return (1 + gross) * (1 - turnover * commission_pct) - 1
+
+
+def evaluate_batch(close, positions, commission_pct, entry=None, exit=None):
+    """Return metrics of every row of ``positions`` with 2-D array operations.
+
+    ``entry``/``exit`` are passed to :func:`strategy_returns`; a trade's
+    result includes the candle in which its exit fills. When the next trade
+    opens in that same candle, its entry commission counts towards the new
+    trade only.
+
+    Returns
+    -------
+    dict
+        Arrays of shape ``(V,)`` with ``roi``, ``drawdown``, ``trades`` (round
+        trips, counting one still open at the end) and ``wins``.
+    """
+
+    n_variants, n_candles = positions.shape
+    log_equity = np.zeros((n_variants, n_candles + 1))
+    np.cumsum(
+        np.log1p(strategy_returns(close, positions, commission_pct, entry, exit)),
+        axis=1,
+        out=log_equity[:, 1:],
+    )
+    equity = np.exp(log_equity[:, 1:])
+    drawdown = (1 - equity / np.maximum.accumulate(equity, axis=1)).max(axis=1)
+
+    change = np.diff(positions.astype(np.int8), prepend=0, axis=1)
+    exits = change == -1
+    # Las operaciones abiertas al final del histórico se cierran en la última vela
+    exits[:, -1] |= positions[:, -1]
+    rows, entry_cols = np.nonzero(change == 1)
+    _, exit_cols = np.nonzero(exits)
+    # La salida se ejecuta en la vela siguiente a la decisión
+    trade_log = log_equity[rows, np.minimum(exit_cols + 2, n_candles)] - log_equity[rows, entry_cols]
+    # Si se reentra en la vela de la salida, esa vela lleva la salida de una
+    # operación y la comisión de entrada de la siguiente: se reparte entre ambas
+    fee = np.log1p(-commission_pct)
+    handover = (exit_cols + 1 < n_candles) & (change[rows, np.minimum(exit_cols + 1, n_candles - 1)] == 1)
+    takeover = (entry_cols > 0) & (change[rows, np.maximum(entry_cols - 1, 0)] == -1)
+    shared = log_equity[rows, entry_cols + 1] - log_equity[rows, entry_cols]
+    trade_log -= np.where(handover, fee, 0.0) + np.where(takeover, shared - fee, 0.0)
+    return {
+        "roi": equity[:, -1] - 1,
+        "drawdown": drawdown,
+        "trades": np.bincount(rows, minlength=n_variants),
+        "wins": np.bincount(rows, weights=trade_log > 0, minlength=n_variants),
+    }
+
+
+def evaluate(close, position, commission_pct, entry=None, exit=None):
+    """Return ROI, winrate, drawdown and number of trades of one ``position``."""
+
+    if len(close) == 0:
+        return {"roi": 0.0, "winrate": 0.0, "drawdown": 0.0, "trades": 0}
+    batch = evaluate_batch(
+        close, np.asarray(position, dtype=bool)[None, :], commission_pct, entry, exit
+    )
+    trades = int(batch["trades"][0])
+    return {
+        "roi": float(batch["roi"][0]),
+        "winrate": float(batch["wins"][0] / trades) if trades else 0.0,
+        "drawdown": float(batch["drawdown"][0]),
+        "trades": trades,
+    }
+
+
+def evaluate_population(
+    close, high, low, windows, thresholds, commission_pct, chunk_cells, start=0, entry=None, exit=None
+):
+    """Evaluate a population on one symbol in a single matrix pass.
+
+    A variant is long while the stochastic %K over its ``window`` is above
+    its ``threshold`` and flat otherwise. Variants sharing a window share
+    the indicator, and their positions, returns and equity curves are
+    computed as ``(variants, candles)`` arrays in chunks of at most
+    ``chunk_cells`` cells. Candles before ``start`` only warm up the
+    indicator; metrics cover the returns of ``close[start:]``, entering at
+    the close of the candle before ``start`` when the signal is already on.
+    ``entry``/``exit`` fill prices are passed to :func:`evaluate_batch`.
+
+    Returns
+    -------
+    dict
+        Arrays aligned with ``windows``/``thresholds`` as returned by
+        :func:`evaluate_batch`.
+    """
+
+    metrics = {
+        "roi": np.zeros(len(windows)),
+        "drawdown": np.zeros(len(windows)),
+        "trades": np.zeros(len(windows), dtype=np.int64),
+        "wins": np.zeros(len(windows)),
+    }
+    begin = max(start - 1, 0)
+    chunk = max(1, chunk_cells // (len(close) - begin))
+    if entry is not None:
+        entry, exit = entry[begin:], exit[begin:]
+    for window in np.unique(windows):
+        score = np.nan_to_num(stochastic_k(close, high, low, window), nan=-np.inf)
+        members = np.flatnonzero(windows == window)
+        for first in range(0, len(members), chunk):
+            idx = members[first : first + chunk]
+            positions = score[None, begin:] > thresholds[idx, None]
+            batch = evaluate_batch(close[begin:], positions, commission_pct, entry, exit)
+            for name, values in batch.items():
+                metrics[name][idx] = values
+    return metrics
+
+
+def _evaluate_shard(path, windows, thresholds, commission_pct, chunk_cells, start=0):
+    """Evaluate a slice of the population on candles memory-mapped from ``path``."""
+
+    close, high, low, entry, exit = np.load(path, mmap_mode="r")
+    return evaluate_population(
+        close, high, low, windows, thresholds, commission_pct, chunk_cells, start, entry, exit
+    )
+
+
+def combine_windows(windows):
+    """Aggregate out-of-sample metrics of consecutive walk-forward windows.
+
+    ROI compounds across windows, winrate is computed over all trades and
+    drawdown is the worst of any window.
+    """
+
+    trades = sum(w["trades"] for w in windows)
+    wins = sum(w["winrate"] * w["trades"] for w in windows)
+    return {
+        "roi": float(np.prod([1 + w["roi"] for w in windows]) - 1) if windows else 0.0,
+        "winrate": float(wins / trades) if trades else 0.0,
+        "drawdown": max((w["drawdown"] for w in windows), default=0.0),
+        "trades": int(trades),
+    }
 
 
 class Backtester:
@@ -15,8 +206,275 @@ class Backtester:
 
         self.config = config
         self.logger = logger
+        self.commission_pct = config.get("commission_pct", 0.001)
+        self.symbols = config.get("symbols", [])
+        self.days = config.get("backtest_days")
+        # Límite de celdas variantes x velas por bloque para acotar memoria
+        self.chunk_cells = config.get("backtest_chunk_cells", 5_000_000)
+        self.workers = config.get("backtest_workers", 1)
+        # Walk-forward: ventanas de train/test medidas en velas (0 lo desactiva)
+        self.train_candles = config.get("walk_forward_train", 0)
+        self.test_candles = config.get("walk_forward_test", 0)
+        self.step = interval_to_ms(config.get("interval", "1m"))
+        # Mismo modelo de ejecución que el simulador de paper trading
+        self.execution = ExecutionModel.from_config(config)
+        self.trade_size = config.get("trade_size", 10)
+        self._executor = None
+        # Métricas por ventana de la última pasada walk-forward, con o sin caché
+        self._windows = {}
+        self.cache = None
+        if config.get("fitness_cache_size", 10000) > 0:
+            path = config.get("fitness_cache_path")
+            if path is None and config.get("population_path"):
+                # Por defecto el caché se guarda junto a population.json
+                path = os.path.join(
+                    os.path.dirname(config["population_path"]), "fitness_cache.json"
+                )
+            self.cache = FitnessCache(config.get("fitness_cache_size", 10000), path)
+            self.cache.load()
+
+    def load_data(self):
+        """Load stored candles of every configured symbol.
+
+        Returns
+        -------
+        dict
+            Mapping of symbol to a candle data frame; symbols without data
+            are omitted.
+        """
+
+        if not self.symbols:
+            return {}
+        store = open_store(self.config)
+        data = {}
+        for symbol in self.symbols:
+            start = None
+            last = store.last_open_time(symbol)
+            if last is None:
+                continue
+            if self.days:
+                start = last - int(self.days * 86_400_000)
+            records = store.load_records(symbol, start=start)
+            if len(records):
+                data[symbol] = records_to_frame(records, symbol)
+        return data
+
+    def _shard_count(self, n_symbols, n_variants):
+        """Return in how many variant slices each symbol is split."""
+
+        # Unas dos unidades de trabajo por proceso equilibran la carga
+        slices = -(-2 * self.workers // n_symbols)
+        return max(1, min(slices, n_variants))
 
-    def run(self, variants: List[StrategyVariant] | None = None) -> Dict[int, Dict[str, float]]:
+    def fingerprint(self, segments):
+        """Return a digest identifying the candle segments and execution costs.
+
+        Any new, removed or revised candle of any symbol changes the digest,
+        so cached metrics are only reused for exactly the same data.
+        """
+
+        digest = hashlib.sha1(repr((self.commission_pct, self.execution.params())).encode())
+        for symbol in sorted(segments):
+            prices, start = segments[symbol]
+            digest.update(f"{symbol}:{start}".encode())
+            digest.update(np.ascontiguousarray(prices).tobytes())
+        return digest.hexdigest()
+
+    def stats(self):
+        """Return fitness cache counters (empty when the cache is disabled)."""
+
+        return self.cache.stats() if self.cache is not None else {}
+
+    def _evaluate(self, segments, windows, thresholds):
+        """Yield ``(variant_indices, metrics)`` for every (variant, symbol) shard.
+
+        ``segments`` maps each symbol to its ``(5, T)`` close/high/low/entry/
+        exit array and the index where evaluation starts. With ``backtest_workers``
+        above one, shards run in a process pool. Candle arrays are written
+        once per run to memory-mapped ``.npy`` files that every worker maps
+        instead of receiving pickled frames.
+        """
+
+        if self.workers <= 1:
+            everyone = np.arange(len(windows))
+            for (close, high, low, entry, exit), start in segments.values():
+                yield everyone, evaluate_population(
+                    close, high, low, windows, thresholds,
+                    self.commission_pct, self.chunk_cells, start, entry, exit,
+                )
+            return
+
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        shards = np.array_split(
+            np.arange(len(windows)), self._shard_count(len(segments), len(windows))
+        )
+        with tempfile.TemporaryDirectory(prefix="backtest_") as tmp:
+            futures = {}
+            for n, (array, start) in enumerate(segments.values()):
+                path = os.path.join(tmp, f"{n}.npy")
+                np.save(path, array)
+                for idx in shards:
+                    future = self._executor.submit(
+                        _evaluate_shard, path, windows[idx], thresholds[idx],
+                        self.commission_pct, self.chunk_cells, start,
+                    )
+                    futures[future] = idx
+            for future in as_completed(futures):
+                yield futures[future], future.result()
+
+    def close(self):
+        """Shut down the worker processes used by parallel backtests."""
+
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
+            self._executor = None
+
+    def _metrics(self, variants, segments):
+        """Return metrics of every variant on ``segments``, one dict each.
+
+        ROI is the average across symbols, winrate is computed over all
+        trades and drawdown is the worst of any symbol. Variants whose params
+        were already evaluated on the same segments are served from the
+        fitness cache and identical params are evaluated once.
+        """
+
+        keys = [None] * len(variants)
+        cached = {}
+        pending = {}
+        if self.cache is not None:
+            fingerprint = self.fingerprint(segments)
+            for i, variant in enumerate(variants):
+                keys[i] = FitnessCache.key(variant.params, fingerprint)
+                if keys[i] in pending:
+                    # Clones idénticos en la misma población se evalúan una vez
+                    continue
+                metrics = self.cache.get(keys[i])
+                if metrics is None:
+                    pending[keys[i]] = i
+                else:
+                    cached[keys[i]] = metrics
+            todo = list(pending.values())
+        else:
+            todo = list(range(len(variants)))
+
+        computed = {}
+        if todo:
+            subset = [variants[i] for i in todo]
+            windows = np.array([int(v.params.get("window", STOCH_WINDOW)) for v in subset])
+            thresholds = np.array([float(v.params.get("threshold", 0.5)) for v in subset])
+            roi = np.zeros(len(subset))
+            drawdown = np.zeros(len(subset))
+            trades = np.zeros(len(subset), dtype=np.int64)
+            wins = np.zeros(len(subset))
+            for idx, batch in self._evaluate(segments, windows, thresholds):
+                roi[idx] += batch["roi"]
+                drawdown[idx] = np.maximum(drawdown[idx], batch["drawdown"])
+                trades[idx] += batch["trades"]
+                wins[idx] += batch["wins"]
+            roi /= len(segments)
+            for j, i in enumerate(todo):
+                computed[i] = {
+                    "roi": float(roi[j]),
+                    "winrate": float(wins[j] / trades[j]) if trades[j] else 0.0,
+                    "drawdown": float(drawdown[j]),
+                    "trades": int(trades[j]),
+                }
+                if self.cache is not None:
+                    self.cache.put(keys[i], computed[i])
+
+        results = []
+        for i in range(len(variants)):
+            if i in computed:
+                results.append(computed[i])
+            elif keys[i] in cached:
+                results.append(dict(cached[keys[i]]))
+            else:
+                results.append(dict(computed[pending[keys[i]]]))
+        return results
+
+    def _prices(self, df):
+        """Return close, high, low and the entry/exit fill prices of ``df``."""
+
+        candles = candle_arrays(df)
+        entry, exit = self.execution.round_trip_prices(candles, self.trade_size)
+        return np.vstack([candles["close"], candles["high"], candles["low"], entry, exit])
+
+    def _window_metrics(self, variants, segments, previous):
+        """Return :meth:`_metrics` of one walk-forward window.
+
+        Variants already evaluated on the same candles in the previous pass
+        (``previous``) reuse those metrics; the metrics of this pass are kept
+        in ``self._windows`` for the next one.
+        """
+
+        fingerprint = self.fingerprint(segments)
+        keys = [FitnessCache.key(v.params, fingerprint) for v in variants]
+        todo = {}
+        for i, key in enumerate(keys):
+            if key in previous:
+                self._windows[key] = previous[key]
+            else:
+                todo.setdefault(key, i)
+        if todo:
+            computed = self._metrics([variants[i] for i in todo.values()], segments)
+            self._windows.update(zip(todo, computed))
+        return [dict(self._windows[key]) for key in keys]
+
+    def walk_forward(self, variants, data):
+        """Evaluate ``variants`` on rolling train/test windows.
+
+        Test windows span ``walk_forward_test`` candles aligned to the epoch,
+        so their boundaries do not move as history grows; each is preceded by
+        ``walk_forward_train`` candles that warm up the indicator and give the
+        in-sample metrics. The metrics of every window are kept until the
+        next call, so when a new candle arrives only windows whose candles
+        changed (normally the latest, still open one) are evaluated again,
+        even with the fitness cache disabled.
+
+        Returns
+        -------
+        dict
+            Mapping of variant ``id`` to a list of windows, each with its
+            ``start``/``end`` candle numbers and ``train``/``test`` metrics.
+        """
+
+        train, test = self.train_candles, self.test_candles
+        series = {
+            symbol: (candle_numbers(df, self.step), self._prices(df))
+            for symbol, df in data.items()
+        }
+        first = min(numbers[0] for numbers, _ in series.values())
+        last = max(numbers[-1] for numbers, _ in series.values())
+        reports = {id(v): [] for v in variants}
+        previous, self._windows = self._windows, {}
+        for k in range(-(-(first + train) // test), last // test + 1):
+            a, b = k * test, (k + 1) * test
+            train_segments, test_segments = {}, {}
+            for symbol, (numbers, prices) in series.items():
+                if numbers[0] > a - train:
+                    continue
+                lo, mid, hi = np.searchsorted(numbers, [a - train, a, b])
+                if hi == mid:
+                    continue
+                test_segments[symbol] = (prices[:, lo:hi], mid - lo)
+                if mid - lo > 1:
+                    train_segments[symbol] = (prices[:, lo:mid], 0)
+            if not test_segments:
+                continue
+            out = self._window_metrics(variants, test_segments, previous)
+            ins = (
+                self._window_metrics(variants, train_segments, previous)
+                if train_segments
+                else [None] * len(variants)
+            )
+            for variant, test_metrics, train_metrics in zip(variants, out, ins):
+                reports[id(variant)].append(
+                    {"start": int(a), "end": int(b), "train": train_metrics, "test": test_metrics}
+                )
+        return reports
+
+    def run(self, variants: List[StrategyVariant] | None = None, data=None) -> Dict[int, Dict[str, float]]:
         """Execute the backtest for provided variants.
 
         Parameters
@@ -24,26 +482,48 @@ class Backtester:
         variants : list[StrategyVariant], optional
             Strategy variants to evaluate. When ``None`` only logs the start
             of a generic backtest.
+        data : dict, optional
+            Mapping of symbol to candle data frame. Stored candles of the
+            configured ``symbols`` are used when omitted.
 
         Returns
         -------
         dict
             Mapping of variant ``id`` to metrics generated during the run.
+            ROI is the average across symbols, winrate is computed over all
+            trades and drawdown is the worst of any symbol. With
+            ``walk_forward_test`` set, metrics aggregate the out-of-sample
+            windows (see :func:`combine_windows`) and a ``windows`` entry holds
+            the per-window report of :meth:`walk_forward`; only the aggregate
+            is recorded in the variant's history.
         """
 
         self.logger.info("Iniciando backtest sobre histórico...")
         results: Dict[int, Dict[str, float]] = {}
         if not variants:
             return results
+        if data is None:
+            data = self.load_data()
+        data = {s: df for s, df in data.items() if len(df) > 1}
+        if not data:
+            self.logger.warning("Sin velas almacenadas para el backtest.")
+            return results
 
-        for variant in variants:
-            metrics = {
-                "roi": random.uniform(-0.05, 0.05),
-                "winrate": random.uniform(0, 1),
-                "drawdown": random.uniform(0, 0.1),
-            }
-            variant.record_result(metrics)
-            results[id(variant)] = metrics
+        misses = self.cache.misses if self.cache is not None else 0
+        if self.test_candles > 0:
+            reports = self.walk_forward(variants, data)
+            for variant in variants:
+                windows = reports[id(variant)]
+                metrics = combine_windows([w["test"] for w in windows])
+                variant.record_result(metrics)
+                results[id(variant)] = {**metrics, "windows": windows}
+        else:
+            segments = {symbol: (self._prices(df), 0) for symbol, df in data.items()}
+            for variant, metrics in zip(variants, self._metrics(variants, segments)):
+                variant.record_result(metrics)
+                results[id(variant)] = metrics
+        if self.cache is not None and self.cache.misses > misses:
+            self.cache.save()
         best = max(results.values(), key=lambda m: m["roi"], default=None)
         if best:
             self.logger.info(
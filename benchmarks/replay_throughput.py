@@ -0,0 +1,74 @@
+"""Measure how many aggregated trades per second ``Simulator.replay`` processes.
+
+A synthetic archive of ``--trades`` random-walk trades is written to a
+temporary directory (or ``--archive`` of an existing symbol is used) and
+``--orders`` market orders spread over it are replayed with chunks of
+``--chunk`` trades::
+
+    python benchmarks/replay_throughput.py --trades 20000000 --orders 1000
+"""
+
+import argparse
+import logging
+import os
+import sys
+import tempfile
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data_feed.trades import TRADE_DTYPE, TradeArchive  # noqa: E402
+from trading.simulation import Simulator  # noqa: E402
+
+
+def synthetic_archive(directory, n_trades, block=5_000_000, seed=0):
+    """Write ``n_trades`` random-walk trades in blocks and return the archive."""
+
+    rng = np.random.default_rng(seed)
+    archive = TradeArchive(directory, "BENCH")
+    price, now = 100.0, 0
+    for first in range(0, n_trades, block):
+        n = min(block, n_trades - first)
+        records = np.empty(n, dtype=TRADE_DTYPE)
+        records["agg_id"] = np.arange(first, first + n)
+        records["time"] = now + np.cumsum(rng.integers(1, 20, n))
+        records["price"] = price * np.exp(np.cumsum(rng.normal(0, 1e-4, n)))
+        records["qty"] = rng.exponential(0.05, n)
+        records["buyer_maker"] = rng.random(n) < 0.5
+        archive.append(records)
+        price, now = float(records["price"][-1]), int(records["time"][-1])
+    return archive
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--trades", type=int, default=10_000_000)
+    parser.add_argument("--orders", type=int, default=1000)
+    parser.add_argument("--chunk", type=int, default=1_000_000)
+    parser.add_argument("--quote", type=float, default=1000.0)
+    parser.add_argument("--archive", help="directorio y símbolo existentes, p. ej. data/BTCUSDT")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    logger = logging.getLogger("bench")
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.archive:
+            archive = TradeArchive(os.path.dirname(args.archive), os.path.basename(args.archive))
+        else:
+            archive = synthetic_archive(tmp, args.trades)
+        records = archive.records()
+        times = np.sort(np.random.default_rng(1).choice(records["time"], args.orders))
+        side = np.where(np.arange(args.orders) % 2, -1, 1)
+        size = os.path.getsize(archive.path) / 2**20
+        del records
+        sim = Simulator({"replay_chunk_trades": args.chunk, "max_volume_pct": 0.5}, logger)
+        result = sim.replay(archive.symbol, archive, times, side, quote=args.quote)
+        print(
+            f"{result['trades']:,} trades ({size:,.0f} MiB) en {result['seconds']:.2f} s: "
+            f"{result['trades_per_second']:,.0f} trades/s"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,208 @@
+"""Paginated, resumable download of deep kline history."""
+
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from data_feed.storage import interval_to_ms
+
+
+def find_missing_ranges(open_times, start, end, step):
+    """Return ``[first, last]`` open-time ranges missing between ``start`` and ``end``.
+
+    Parameters
+    ----------
+    open_times : numpy.ndarray
+        Sorted ``open_time`` values in ms already stored.
+    start, end : int
+        Inclusive bounds of the wanted history in ms, aligned to ``step``.
+    step : int
+        Interval between consecutive candles in ms.
+
+    Returns
+    -------
+    list[tuple[int, int]]
+        Inclusive ranges of candle open times that are not stored.
+    """
+
+    times = np.asarray(open_times, dtype=np.int64)
+    times = times[(times >= start) & (times <= end)]
+    if len(times) == 0:
+        return [(start, end)] if start <= end else []
+    ranges = []
+    if times[0] > start:
+        ranges.append((start, int(times[0]) - step))
+    gaps = np.flatnonzero(np.diff(times) > step)
+    for i in gaps:
+        ranges.append((int(times[i]) + step, int(times[i + 1]) - step))
+    if times[-1] < end:
+        ranges.append((int(times[-1]) + step, end))
+    return ranges
+
+
+def _subtract(ranges, holes):
+    """Remove the ``holes`` ranges from ``ranges``."""
+
+    result = []
+    for lo, hi in ranges:
+        pieces = [(lo, hi)]
+        for h_lo, h_hi in holes:
+            next_pieces = []
+            for p_lo, p_hi in pieces:
+                if h_hi < p_lo or h_lo > p_hi:
+                    next_pieces.append((p_lo, p_hi))
+                    continue
+                if p_lo < h_lo:
+                    next_pieces.append((p_lo, h_lo - 1))
+                if h_hi < p_hi:
+                    next_pieces.append((h_hi + 1, p_hi))
+            pieces = next_pieces
+        result.extend(pieces)
+    return result
+
+
+class Backfiller:
+    """Download months of candles for every symbol of a :class:`DataFeed`.
+
+    History is requested page by page with ``startTime``/``endTime`` only
+    for ranges missing from the feed's store, so gaps left by downtime are
+    detected and filled and an interrupted run resumes where it stopped.
+    Ranges after the stored tail are appended to the store every
+    ``backfill_flush_pages`` pages; a range before the tail (a gap in the
+    middle or older history) is merged once when it has been downloaded or
+    the download stops, because merging it rewrites the stored file.
+    Ranges for which the exchange returns no candles (e.g. before a
+    symbol was listed) are remembered in ``backfill_state.json`` inside
+    ``data_dir`` so they are not requested again.
+
+    Parameters
+    ----------
+    config : dict
+        Configuration with optional ``backfill_days``,
+        ``backfill_flush_pages`` and ``data_dir`` keys.
+    logger : logging.Logger
+        Logger used to report progress.
+    feed : data_feed.downloader.DataFeed
+        Feed providing the HTTP client, rate limiter and store.
+    """
+
+    def __init__(self, config, logger, feed):
+        self.config = config
+        self.logger = logger
+        self.feed = feed
+        self.days = config.get("backfill_days", 30)
+        self.flush_pages = max(1, config.get("backfill_flush_pages", 50))
+        self.step = interval_to_ms(feed.interval)
+        self.state_path = os.path.join(
+            config.get("data_dir", "."), "backfill_state.json"
+        )
+        self._lock = threading.Lock()
+        self._state = self._load_state()
+
+    def _load_state(self):
+        try:
+            with open(self.state_path) as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def _record_hole(self, symbol, lo, hi):
+        """Persist a range the exchange has no candles for."""
+
+        with self._lock:
+            holes = self._state.setdefault(symbol, {}).setdefault("holes", [])
+            holes.append([int(lo), int(hi)])
+            tmp = self.state_path + ".tmp"
+            with open(tmp, "w") as f:
+                json.dump(self._state, f)
+            os.replace(tmp, self.state_path)
+
+    def run(self, days=None, end=None):
+        """Backfill ``days`` of history up to ``end`` (ms) for every symbol.
+
+        Returns
+        -------
+        dict
+            Number of candles downloaded per symbol.
+        """
+
+        days = self.days if days is None else days
+        if end is None:
+            end = int(time.time() * 1000)
+        end = end // self.step * self.step
+        start = end - int(days * 86_400_000) // self.step * self.step
+        symbols = self.feed.symbols
+        workers = min(self.feed.max_workers, len(symbols)) or 1
+        self.logger.info(
+            f"Iniciando backfill de {days} días para {len(symbols)} símbolos"
+        )
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            counts = executor.map(
+                lambda symbol: self.backfill_symbol(symbol, start, end), symbols
+            )
+            return dict(zip(symbols, counts))
+
+    def missing_ranges(self, symbol, start, end):
+        """Return ranges between ``start`` and ``end`` still to download."""
+
+        stored = self.feed.store.load_records(symbol, start=start, end=end)
+        ranges = find_missing_ranges(stored["open_time"], start, end, self.step)
+        with self._lock:
+            holes = list(self._state.get(symbol, {}).get("holes", []))
+        return _subtract(ranges, holes)
+
+    def backfill_symbol(self, symbol, start, end):
+        """Download every missing candle of ``symbol`` between ``start`` and ``end``."""
+
+        ranges = self.missing_ranges(symbol, start, end)
+        total = 0
+        for lo, hi in ranges:
+            total += self._download_range(symbol, lo, hi)
+        if total:
+            self.feed.invalidate(symbol)
+            self.logger.info(f"Backfill {symbol}: {total} velas descargadas")
+        return total
+
+    def _download_range(self, symbol, lo, hi):
+        pages = []
+        total = 0
+        cursor = lo
+        last = self.feed.store.last_open_time(symbol)
+        appending = last is None or lo >= last
+        while cursor <= hi:
+            df = self.feed._fetch_binance_klines(
+                symbol, limit=self.feed.kline_limit, start_time=cursor, end_time=hi
+            )
+            if df.empty:
+                if len(df.columns):
+                    # Respuesta válida sin velas: el exchange no tiene datos
+                    self._record_hole(symbol, cursor, hi)
+                else:
+                    self.logger.warning(
+                        f"Backfill {symbol} interrumpido; se reanudará en la próxima ejecución"
+                    )
+                break
+            times = df["open_time"].astype("datetime64[ms]").astype("int64").to_numpy()
+            if times[0] > cursor:
+                self._record_hole(symbol, cursor, int(times[0]) - self.step)
+            pages.append(df)
+            total += len(df)
+            cursor = int(times[-1]) + self.step
+            if appending and len(pages) >= self.flush_pages:
+                self._flush(symbol, pages)
+                pages = []
+        self._flush(symbol, pages)
+        return total
+
+    def _flush(self, symbol, pages):
+        """Merge downloaded ``pages`` into the store (an append after its tail)."""
+
+        if pages:
+            self.feed.store.merge(symbol, pd.concat(pages, ignore_index=True))
@@ -0,0 +1,84 @@
+"""Bounded in-memory candle storage used by :class:`~data_feed.downloader.DataFeed`."""
+
+from __future__ import annotations
+
+import threading
+
+import numpy as np
+
+from data_feed.storage import RECORD_DTYPE
+
+
+class CandleBuffer:
+    """Fixed-capacity ring buffer of :data:`~data_feed.storage.RECORD_DTYPE` rows.
+
+    Candles are kept ordered by ``open_time``. Appending costs O(new candles)
+    regardless of how many are stored; once ``capacity`` is reached the oldest
+    candles are overwritten.
+
+    Parameters
+    ----------
+    capacity : int
+        Maximum number of candles kept in memory.
+    """
+
+    def __init__(self, capacity: int) -> None:
+        self.capacity = max(1, int(capacity))
+        self._data = np.zeros(self.capacity, dtype=RECORD_DTYPE)
+        self._start = 0
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _last_index(self) -> int:
+        return (self._start + self._size - 1) % self.capacity
+
+    def last_open_time(self) -> int | None:
+        """Return the ``open_time`` in ms of the newest candle or ``None``."""
+
+        with self._lock:
+            if not self._size:
+                return None
+            return int(self._data["open_time"][self._last_index()])
+
+    def clear(self) -> None:
+        """Drop every stored candle."""
+
+        with self._lock:
+            self._start = 0
+            self._size = 0
+
+    def extend(self, records: np.ndarray) -> None:
+        """Append ``records`` ordered by ``open_time``.
+
+        Records older than the newest stored candle are ignored and one with
+        the same ``open_time`` replaces it, since that candle may have been
+        stored while still open.
+        """
+
+        with self._lock:
+            if self._size:
+                last = self._data["open_time"][self._last_index()]
+                records = records[records["open_time"] >= last]
+                if len(records) and records["open_time"][0] == last:
+                    # Se reemplaza la vela abierta almacenada
+                    self._size -= 1
+            if not len(records):
+                return
+            records = records[-self.capacity :]
+            count = len(records)
+            end = self._start + self._size
+            idx = np.arange(end, end + count) % self.capacity
+            self._data[idx] = records
+            overflow = max(0, self._size + count - self.capacity)
+            self._start = (self._start + overflow) % self.capacity
+            self._size = min(self.capacity, self._size + count)
+
+    def to_records(self) -> np.ndarray:
+        """Return a copy of the stored candles in chronological order."""
+
+        with self._lock:
+            idx = np.arange(self._start, self._start + self._size) % self.capacity
+            return self._data[idx]
@@ -1,10 +1,29 @@
 """Utilities for downloading and reading market data from Binance."""
 
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor
 import requests
 import pandas as pd
 from datetime import datetime
 from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
+
+from data_feed.backfill import Backfiller
+from data_feed.buffer import CandleBuffer
+from data_feed.storage import (
+    KLINE_COLUMNS,
+    frame_to_records,
+    interval_to_ms,
+    open_store,
+    records_to_frame,
+    to_ms,
+)
+from modules.ratelimit import RateLimiter
+
+
+# Peso que Binance asigna a cada petición de /api/v3/klines
+KLINES_WEIGHT = 2
 
 
 class DataFeed:
@@ -32,29 +51,111 @@ class DataFeed:
         self.api_secret = os.environ.get("API_SECRET", config.get("api_secret"))
         self.max_retries = config.get("download_retries", 3)
         self.timeout = config.get("request_timeout", 10)
+        self.incremental = config.get("incremental_sync", True)
+        self.kline_limit = config.get("kline_limit", 1000)
+        self.max_workers = max(1, config.get("download_workers", 4))
+        self.retry_backoff = config.get("retry_backoff", 0.5)
+        self.rate_limiter = RateLimiter(config.get("weight_per_minute", 1200))
+        # Sesión compartida para reutilizar conexiones keep-alive entre ciclos
+        self.session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=self.max_workers, pool_maxsize=self.max_workers
+        )
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.store = open_store(config)
+        self.cache_size = config.get("cache_candles", 1000)
+        # Velas recientes en memoria; el almacenamiento solo se lee al arrancar
+        self._buffers = {}
 
     def update(self):
         """Download the most recent candles for all symbols and store them.
 
-        Saved CSV files include a ``symbol`` column for easier merging of
-        multiple data sets.
+        New candles are kept in an in-memory buffer of ``cache_candles`` rows
+        per symbol and persisted through the backend selected with ``storage``
+        (see :mod:`data_feed.storage`). When ``incremental_sync`` is enabled
+        (the default) only candles newer than the last known ``open_time``
+        are requested and appended. Symbols are downloaded
+        concurrently by up to ``download_workers`` threads sharing one HTTP
+        session.
         """
 
-        for symbol in self.symbols:
-            df = self._fetch_binance_klines(symbol)
-            if df.empty:
-                self.logger.warning(
-                    f"No se recibieron velas para {symbol}; se omite guardado"
-                )
-                continue
+        workers = min(self.max_workers, len(self.symbols))
+        if workers <= 1:
+            for symbol in self.symbols:
+                self._update_symbol(symbol)
+            return
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            list(executor.map(self._update_symbol, self.symbols))
+
+    def _update_symbol(self, symbol):
+        """Download and persist new candles for a single ``symbol``."""
+
+        buffer = self._buffer(symbol)
+        last = buffer.last_open_time() if self.incremental else None
+        if last is None:
+            df = self._fetch_binance_klines(symbol, limit=self.kline_limit)
+        else:
+            df = self._fetch_since(symbol, last)
+        if df.empty:
+            self.logger.warning(
+                f"No se recibieron velas para {symbol}; se omite guardado"
+            )
+            return
+
+        if "symbol" not in df.columns:
+            df["symbol"] = symbol
+
+        if last is None:
+            buffer.clear()
+            self.store.write(symbol, df)
+        else:
+            self.store.append(symbol, df)
+        buffer.extend(frame_to_records(df))
+        self.logger.info(f"Actualizadas velas para {symbol}")
 
-            if "symbol" not in df.columns:
-                df["symbol"] = symbol
+    def _buffer(self, symbol):
+        """Return the in-memory buffer for ``symbol``, warm-starting from disk."""
 
-            df.to_csv(f"{symbol}_{self.interval}.csv", index=False)
-            self.logger.info(f"Actualizadas velas para {symbol}")
+        buffer = self._buffers.get(symbol)
+        if buffer is None:
+            buffer = CandleBuffer(self.cache_size)
+            last = self.store.last_open_time(symbol)
+            if last is not None:
+                start = last - (self.cache_size - 1) * interval_to_ms(self.interval)
+                buffer.extend(self.store.load_records(symbol, start=start))
+            buffer = self._buffers.setdefault(symbol, buffer)
+        return buffer
 
-    def _fetch_binance_klines(self, symbol, limit=1000):
+    def _fetch_since(self, symbol, start_ms):
+        """Page through klines starting at ``start_ms`` until caught up.
+
+        The first returned candle normally repeats the last stored one, which
+        may still have been open when it was saved.
+        """
+
+        pages = []
+        cursor = start_ms
+        while True:
+            df = self._fetch_binance_klines(
+                symbol, limit=self.kline_limit, start_time=cursor
+            )
+            if df.empty:
+                break
+            pages.append(df)
+            if len(df) < self.kline_limit:
+                break
+            next_cursor = to_ms(df["open_time"].iloc[-1])
+            if next_cursor is None or next_cursor <= cursor:
+                break
+            cursor = next_cursor
+        if not pages:
+            return pd.DataFrame()
+        df = pd.concat(pages, ignore_index=True)
+        df = df.drop_duplicates(subset="open_time", keep="last")
+        return df.reset_index(drop=True)
+
+    def _fetch_binance_klines(self, symbol, limit=1000, start_time=None, end_time=None):
         """Request kline data for a symbol.
 
         Parameters
@@ -63,13 +164,20 @@ class DataFeed:
             Market symbol to download.
         limit : int, optional
             Number of klines to request, by default ``1000``.
+        start_time : int, optional
+            Only return candles opened at or after this timestamp in
+            milliseconds. When ``None`` the most recent candles are returned.
+        end_time : int, optional
+            Only return candles opened at or before this timestamp in
+            milliseconds.
 
         Returns
         -------
         pandas.DataFrame
             Data frame with kline information. On success it includes a
-            ``symbol`` column with the requested market name. An empty frame is
-            returned on error.
+            ``symbol`` column with the requested market name. A frame without
+            columns is returned on error, while a successful response without
+            candles yields an empty frame that still has the kline columns.
         """
 
         endpoint = "/api/v3/klines"
@@ -78,33 +186,30 @@ class DataFeed:
             "interval": self.interval,
             "limit": limit,
         }
+        if start_time is not None:
+            params["startTime"] = int(start_time)
+        if end_time is not None:
+            params["endTime"] = int(end_time)
 
+        retry_after = None
         for attempt in range(1, self.max_retries + 1):
+            if attempt > 1:
+                time.sleep(self._retry_delay(attempt, retry_after))
+            retry_after = None
+            self.rate_limiter.acquire(KLINES_WEIGHT)
             try:
-                resp = requests.get(
+                resp = self.session.get(
                     self.api_url + endpoint,
                     params=params,
                     timeout=self.timeout,
                 )
+                headers = getattr(resp, "headers", None) or {}
+                used = headers.get("X-MBX-USED-WEIGHT-1M")
+                if used is not None:
+                    self.rate_limiter.sync(int(used))
                 if resp.status_code == 200:
                     data = resp.json()
-                    df = pd.DataFrame(
-                        data,
-                        columns=[
-                            "open_time",
-                            "open",
-                            "high",
-                            "low",
-                            "close",
-                            "volume",
-                            "close_time",
-                            "quote_asset_volume",
-                            "number_of_trades",
-                            "taker_buy_base",
-                            "taker_buy_quote",
-                            "ignore",
-                        ],
-                    )
+                    df = pd.DataFrame(data, columns=KLINE_COLUMNS)
                     df["open_time"] = pd.to_datetime(df["open_time"], unit="ms")
                     df["close_time"] = pd.to_datetime(
                         df["close_time"], unit="ms"
@@ -112,6 +217,8 @@ class DataFeed:
                     # Include the symbol so downstream consumers know the market
                     df["symbol"] = symbol
                     return df
+                if resp.status_code in (418, 429):
+                    retry_after = headers.get("Retry-After")
                 self.logger.warning(
                     f"Intento {attempt}: respuesta {resp.status_code} al descargar velas"
                 )
@@ -123,35 +230,106 @@ class DataFeed:
         )
         return pd.DataFrame()
 
+    def _retry_delay(self, attempt, retry_after=None):
+        """Return the pause before ``attempt`` using exponential backoff.
+
+        A ``Retry-After`` value sent with 418/429 responses takes precedence.
+        """
+
+        if retry_after is not None:
+            try:
+                return float(retry_after)
+            except ValueError:
+                pass
+        return self.retry_backoff * 2 ** (attempt - 2)
+
     def latest_data(self):
         """Return the latest downloaded data for each symbol.
 
+        Data is served from memory; disk is only read the first time a symbol
+        is accessed in the process.
+
         Returns
         -------
         list[pandas.DataFrame]
-            List of data frames for every configured symbol.
+            List of data frames for every configured symbol. Frames are empty
+            for symbols without stored candles.
         """
 
         dfs = []
         for symbol in self.symbols:
-            try:
-                df = pd.read_csv(f"{symbol}_{self.interval}.csv")
-                dfs.append(df)
-            except FileNotFoundError:
+            buffer = self._buffer(symbol)
+            if len(buffer):
+                dfs.append(records_to_frame(buffer.to_records(), symbol))
+            else:
                 dfs.append(pd.DataFrame())
         return dfs
 
-    def history(self):
+    def apply_kline(self, symbol, record, closed, persist=True):
+        """Update ``symbol`` with one candle received from the stream.
+
+        Parameters
+        ----------
+        symbol : str
+            Market symbol of the candle.
+        record : numpy.ndarray
+            Single-element :data:`~data_feed.storage.RECORD_DTYPE` array.
+        closed : bool
+            Whether the candle is final. Only closed candles are persisted;
+            open ones are kept in memory and replaced by later updates.
+        persist : bool
+            With ``False`` closed candles are only kept in memory and the
+            caller persists them later with :meth:`persist_kline`.
+        """
+
+        self._buffer(symbol).extend(record)
+        if closed and persist:
+            self.persist_kline(symbol, record)
+
+    def persist_kline(self, symbol, record):
+        """Append a closed candle received from the stream to the store."""
+
+        self.store.append(symbol, records_to_frame(record, symbol))
+
+    def invalidate(self, symbol):
+        """Drop the in-memory candles of ``symbol`` so they reload from storage."""
+
+        self._buffers.pop(symbol, None)
+
+    def backfill(self, days=None, end=None):
+        """Download up to ``days`` of missing history for every symbol.
+
+        See :class:`data_feed.backfill.Backfiller`; ``backfill_days`` is used
+        when ``days`` is ``None`` and history ends now unless ``end`` (ms) is
+        given.
+
+        Returns
+        -------
+        dict
+            Number of candles downloaded per symbol.
+        """
+
+        return Backfiller(self.config, self.logger, self).run(days, end)
+
+    def history(self, days=None):
         """Return historical data used for training.
 
-        Currently this simply returns :meth:`latest_data`, but in a real
-        implementation this could aggregate multiple files or query a database.
+        Unlike :meth:`latest_data` this reads from storage, covering the last
+        ``days`` (``history_days`` by default, everything stored when unset)
+        of candles downloaded by :meth:`update` and :meth:`backfill`.
 
         Returns
         -------
         list[pandas.DataFrame]
-            Training data frames.
+            Training data frames, one per symbol.
         """
 
-        # Para entrenamiento puedes concatenar varios CSVs, cargar desde DB, etc.
-        return self.latest_data()
+        days = self.config.get("history_days") if days is None else days
+        dfs = []
+        for symbol in self.symbols:
+            start = None
+            last = self.store.last_open_time(symbol)
+            if days and last is not None:
+                start = last - int(days * 86_400_000)
+            dfs.append(self.store.load(symbol, start=start))
+        return dfs
@@ -0,0 +1,520 @@
+"""Storage backends used by :class:`~data_feed.downloader.DataFeed`.
+
+Every backend persists candles per symbol and supports appending new candles
+(replacing a repeated, previously open, last candle), reading a time range and
+querying the last stored ``open_time``. Select one with the ``storage`` config
+key:
+
+``csv``
+    One ``{symbol}_{interval}.csv`` file per symbol. Human readable, slowest.
+``numpy``
+    One ``{symbol}_{interval}.bin`` file of fixed-size binary records read
+    through :class:`numpy.memmap`, so loads and range reads are zero-copy.
+``sqlite``
+    A single SQLite database at ``database_path`` with one table for all
+    symbols, indexed by ``(symbol, interval, open_time)``.
+"""
+
+from __future__ import annotations
+
+import os
+import sqlite3
+import threading
+
+import numpy as np
+import pandas as pd
+
+
+KLINE_COLUMNS = [
+    "open_time",
+    "open",
+    "high",
+    "low",
+    "close",
+    "volume",
+    "close_time",
+    "quote_asset_volume",
+    "number_of_trades",
+    "taker_buy_base",
+    "taker_buy_quote",
+    "ignore",
+]
+
+# Registro binario de una vela: tiempos en ms y contadores como int64
+RECORD_DTYPE = np.dtype(
+    [
+        ("open_time", "<i8"),
+        ("open", "<f8"),
+        ("high", "<f8"),
+        ("low", "<f8"),
+        ("close", "<f8"),
+        ("volume", "<f8"),
+        ("close_time", "<i8"),
+        ("quote_asset_volume", "<f8"),
+        ("number_of_trades", "<i8"),
+        ("taker_buy_base", "<f8"),
+        ("taker_buy_quote", "<f8"),
+    ]
+)
+
+
+def to_ms(value):
+    """Convert an ``open_time`` value to epoch milliseconds.
+
+    Integers are assumed to already be milliseconds; anything else is parsed
+    as a timestamp. ``None`` is returned when the value cannot be parsed.
+    """
+
+    if value is None:
+        return None
+    if isinstance(value, (int, np.integer)):
+        return int(value)
+    if isinstance(value, str) and value.strip().isdigit():
+        return int(value)
+    try:
+        ts = pd.Timestamp(value)
+    except (TypeError, ValueError):
+        return None
+    if pd.isna(ts):
+        return None
+    return int((ts - pd.Timestamp(0)) // pd.Timedelta(milliseconds=1))
+
+
+_INTERVAL_UNITS_MS = {
+    "s": 1000,
+    "m": 60_000,
+    "h": 3_600_000,
+    "d": 86_400_000,
+    "w": 604_800_000,
+}
+
+
+def interval_to_ms(interval):
+    """Return the duration in ms of a Binance interval such as ``"1m"``.
+
+    Monthly intervals (``"1M"``) are approximated as 30 days.
+    """
+
+    if interval.endswith("M"):
+        return int(interval[:-1]) * 30 * _INTERVAL_UNITS_MS["d"]
+    return int(interval[:-1]) * _INTERVAL_UNITS_MS[interval[-1]]
+
+
+def times_to_ms(series):
+    """Vectorised :func:`to_ms` for a column of timestamps."""
+
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return series.astype("datetime64[ms]").astype("int64").to_numpy()
+    if pd.api.types.is_numeric_dtype(series):
+        return series.astype("int64").to_numpy()
+    return pd.to_datetime(series).astype("datetime64[ms]").astype("int64").to_numpy()
+
+
+def frame_to_records(df):
+    """Convert a kline data frame into a :data:`RECORD_DTYPE` array."""
+
+    records = np.empty(len(df), dtype=RECORD_DTYPE)
+    for name in RECORD_DTYPE.names:
+        if name in ("open_time", "close_time"):
+            records[name] = times_to_ms(df[name])
+        else:
+            records[name] = pd.to_numeric(df[name]).to_numpy()
+    return records
+
+
+def records_to_frame(records, symbol):
+    """Build a typed kline data frame from a :data:`RECORD_DTYPE` array."""
+
+    data = {name: np.asarray(records[name]) for name in RECORD_DTYPE.names}
+    df = pd.DataFrame(data)
+    df["open_time"] = df["open_time"].astype("datetime64[ms]")
+    df["close_time"] = df["close_time"].astype("datetime64[ms]")
+    df["ignore"] = 0
+    df["symbol"] = symbol
+    return df
+
+
+def _filter_range(df, start=None, end=None):
+    """Return rows of ``df`` with ``start <= open_time <= end`` (ms)."""
+
+    if df.empty or (start is None and end is None):
+        return df
+    times = times_to_ms(df["open_time"])
+    mask = np.ones(len(df), dtype=bool)
+    if start is not None:
+        mask &= times >= start
+    if end is not None:
+        mask &= times <= end
+    return df[mask].reset_index(drop=True)
+
+
+class CandleStore:
+    """Interface shared by all candle storage backends."""
+
+    def __init__(self, directory=".", interval="1m"):
+        self.directory = directory
+        self.interval = interval
+
+    def _path(self, symbol, ext):
+        return os.path.join(self.directory, f"{symbol}_{self.interval}.{ext}")
+
+    def last_open_time(self, symbol):
+        """Return the last stored ``open_time`` in ms or ``None`` if empty."""
+
+        raise NotImplementedError
+
+    def write(self, symbol, df):
+        """Replace every stored candle of ``symbol`` with ``df``."""
+
+        raise NotImplementedError
+
+    def append(self, symbol, df):
+        """Append candles from ``df`` that are not older than the stored tail.
+
+        A candle with the same ``open_time`` as the last stored one replaces
+        it, since that candle may have been saved while still open.
+        """
+
+        raise NotImplementedError
+
+    def merge(self, symbol, df):
+        """Insert candles from ``df`` anywhere in the stored range.
+
+        Unlike :meth:`append` this also accepts candles older than the stored
+        tail, replacing stored candles that share an ``open_time``. Candles
+        that all start at or after the stored tail are simply appended; any
+        older candle makes file backends rewrite the whole symbol, so callers
+        should batch those.
+        """
+
+        if df.empty:
+            return
+        if self._after_tail(symbol, times_to_ms(df["open_time"])):
+            df = df.copy()
+            df["open_time"] = pd.to_datetime(times_to_ms(df["open_time"]), unit="ms")
+            df = df.drop_duplicates(subset="open_time", keep="last")
+            self.append(symbol, df.sort_values("open_time").reset_index(drop=True))
+            return
+        stored = self.load(symbol)
+        if not stored.empty:
+            stored = stored.copy()
+            stored["open_time"] = pd.to_datetime(times_to_ms(stored["open_time"]), unit="ms")
+            df = df.copy()
+            df["open_time"] = pd.to_datetime(times_to_ms(df["open_time"]), unit="ms")
+            df = pd.concat([stored, df], ignore_index=True)
+        df = df.drop_duplicates(subset="open_time", keep="last")
+        self.write(symbol, df.sort_values("open_time").reset_index(drop=True))
+
+    def _after_tail(self, symbol, times):
+        """Return ``True`` if candles at ``times`` (ms) can be appended."""
+
+        last = self.last_open_time(symbol)
+        return last is None or int(np.min(times)) >= last
+
+    def load(self, symbol, start=None, end=None):
+        """Return stored candles with ``start <= open_time <= end`` (ms).
+
+        An empty data frame is returned when nothing is stored.
+        """
+
+        raise NotImplementedError
+
+    def load_records(self, symbol, start=None, end=None):
+        """Return stored candles as a :data:`RECORD_DTYPE` array."""
+
+        df = self.load(symbol, start, end)
+        if df.empty:
+            return np.empty(0, dtype=RECORD_DTYPE)
+        return frame_to_records(df)
+
+
+class CsvStore(CandleStore):
+    """Persist candles as one CSV file per symbol."""
+
+    def __init__(self, directory=".", interval="1m"):
+        super().__init__(directory, interval)
+        # Posición del inicio de la última fila y su open_time por símbolo
+        self._tail_offset = {}
+        self._last_open_time = {}
+
+    def path(self, symbol):
+        """Return the CSV file used to persist ``symbol`` candles."""
+
+        return self._path(symbol, "csv")
+
+    def last_open_time(self, symbol):
+        path = self.path(symbol)
+        if not os.path.exists(path):
+            self._last_open_time.pop(symbol, None)
+            self._tail_offset.pop(symbol, None)
+            return None
+        if symbol not in self._last_open_time:
+            tail = _read_tail_row(path)
+            if tail is None:
+                return None
+            self._tail_offset[symbol], self._last_open_time[symbol] = tail
+        return self._last_open_time[symbol]
+
+    def write(self, symbol, df):
+        with open(self.path(symbol), "wb") as f:
+            self._write_rows(symbol, f, df, header=True)
+
+    def append(self, symbol, df):
+        last = self.last_open_time(symbol)
+        if last is None:
+            self.write(symbol, df)
+            return
+        times = times_to_ms(df["open_time"])
+        df = df[times >= last]
+        times = times[times >= last]
+        if df.empty:
+            return
+        with open(self.path(symbol), "r+b") as f:
+            if times[0] == last:
+                f.seek(self._tail_offset[symbol])
+                f.truncate()
+            else:
+                f.seek(0, os.SEEK_END)
+            self._write_rows(symbol, f, df, header=False)
+
+    def _write_rows(self, symbol, f, df, header):
+        """Write ``df`` to the binary handle ``f`` tracking the tail offset."""
+
+        if header:
+            f.write(df.iloc[:0].to_csv(index=False).encode())
+        f.write(df.iloc[:-1].to_csv(index=False, header=False).encode())
+        self._tail_offset[symbol] = f.tell()
+        f.write(df.iloc[-1:].to_csv(index=False, header=False).encode())
+        self._last_open_time[symbol] = to_ms(df["open_time"].iloc[-1])
+
+    def load(self, symbol, start=None, end=None):
+        try:
+            df = pd.read_csv(self.path(symbol))
+        except FileNotFoundError:
+            return pd.DataFrame()
+        for name in ("open_time", "close_time"):
+            if name in df.columns and not df.empty:
+                df[name] = pd.to_datetime(times_to_ms(df[name]), unit="ms")
+        return _filter_range(df, start, end)
+
+
+class NumpyStore(CandleStore):
+    """Persist candles as fixed-size binary records read via memory maps."""
+
+    def path(self, symbol):
+        """Return the binary file used to persist ``symbol`` candles."""
+
+        return self._path(symbol, "bin")
+
+    def _memmap(self, symbol):
+        path = self.path(symbol)
+        if not os.path.exists(path) or os.path.getsize(path) == 0:
+            return np.empty(0, dtype=RECORD_DTYPE)
+        return np.memmap(path, dtype=RECORD_DTYPE, mode="r")
+
+    def last_open_time(self, symbol):
+        records = self._memmap(symbol)
+        if len(records) == 0:
+            return None
+        return int(records["open_time"][-1])
+
+    def write(self, symbol, df):
+        with open(self.path(symbol), "wb") as f:
+            f.write(frame_to_records(df).tobytes())
+
+    def append(self, symbol, df):
+        self._append_records(symbol, frame_to_records(df))
+
+    def _append_records(self, symbol, new):
+        if len(new) == 0:
+            return
+        stored = self._memmap(symbol)
+        if len(stored) == 0:
+            with open(self.path(symbol), "wb") as f:
+                f.write(new.tobytes())
+            return
+        last = int(stored["open_time"][-1])
+        new = new[new["open_time"] >= last]
+        if len(new) == 0:
+            return
+        # Las velas repetidas sobrescriben la cola almacenada
+        keep = int(np.searchsorted(stored["open_time"], new["open_time"][0]))
+        del stored
+        with open(self.path(symbol), "r+b") as f:
+            f.seek(keep * RECORD_DTYPE.itemsize)
+            f.truncate()
+            f.write(new.tobytes())
+
+    def merge(self, symbol, df):
+        new = frame_to_records(df)
+        if len(new) == 0:
+            return
+        if self._after_tail(symbol, new["open_time"]):
+            # Si un open_time se repite gana su última aparición
+            _, last = np.unique(new["open_time"][::-1], return_index=True)
+            self._append_records(symbol, new[::-1][last])
+            return
+        stored = np.array(self._memmap(symbol))
+        records = np.concatenate([new, stored])
+        # np.unique conserva la primera aparición, es decir la vela nueva
+        _, first = np.unique(records["open_time"], return_index=True)
+        with open(self.path(symbol), "wb") as f:
+            f.write(records[first].tobytes())
+
+    def load_records(self, symbol, start=None, end=None):
+        """Return a zero-copy memory-mapped view of the requested range."""
+
+        records = self._memmap(symbol)
+        if len(records) == 0:
+            return records
+        times = records["open_time"]
+        lo = 0 if start is None else int(np.searchsorted(times, start, "left"))
+        hi = len(records) if end is None else int(np.searchsorted(times, end, "right"))
+        return records[lo:hi]
+
+    def load(self, symbol, start=None, end=None):
+        records = self.load_records(symbol, start, end)
+        if len(records) == 0:
+            return pd.DataFrame()
+        return records_to_frame(records, symbol)
+
+
+class SqliteStore(CandleStore):
+    """Persist candles of every symbol in a single SQLite database."""
+
+    def __init__(self, database_path="binance_1m.db", interval="1m"):
+        super().__init__(os.path.dirname(database_path) or ".", interval)
+        self.database_path = database_path
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _connection(self):
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.database_path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            columns = ", ".join(
+                f"{name} {'INTEGER' if RECORD_DTYPE[name].kind == 'i' else 'REAL'}"
+                for name in RECORD_DTYPE.names
+            )
+            self._conn.execute(
+                f"CREATE TABLE IF NOT EXISTS klines (symbol TEXT NOT NULL, "
+                f"interval TEXT NOT NULL, {columns}, "
+                f"PRIMARY KEY (symbol, interval, open_time)) WITHOUT ROWID"
+            )
+        return self._conn
+
+    def last_open_time(self, symbol):
+        with self._lock:
+            row = (
+                self._connection()
+                .execute(
+                    "SELECT MAX(open_time) FROM klines WHERE symbol=? AND interval=?",
+                    (symbol, self.interval),
+                )
+                .fetchone()
+            )
+        return None if row[0] is None else int(row[0])
+
+    def _insert(self, conn, symbol, records):
+        placeholders = ", ".join("?" * (len(RECORD_DTYPE.names) + 2))
+        rows = (
+            (symbol, self.interval, *record) for record in records.tolist()
+        )
+        conn.executemany(
+            f"INSERT OR REPLACE INTO klines VALUES ({placeholders})", rows
+        )
+
+    def write(self, symbol, df):
+        records = frame_to_records(df)
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                conn.execute(
+                    "DELETE FROM klines WHERE symbol=? AND interval=?",
+                    (symbol, self.interval),
+                )
+                self._insert(conn, symbol, records)
+
+    def append(self, symbol, df):
+        records = frame_to_records(df)
+        last = self.last_open_time(symbol)
+        if last is not None:
+            records = records[records["open_time"] >= last]
+        if len(records) == 0:
+            return
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                self._insert(conn, symbol, records)
+
+    def merge(self, symbol, df):
+        records = frame_to_records(df)
+        if len(records) == 0:
+            return
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                self._insert(conn, symbol, records)
+
+    def load_records(self, symbol, start=None, end=None):
+        query = "SELECT {} FROM klines WHERE symbol=? AND interval=?".format(
+            ", ".join(RECORD_DTYPE.names)
+        )
+        args = [symbol, self.interval]
+        if start is not None:
+            query += " AND open_time >= ?"
+            args.append(int(start))
+        if end is not None:
+            query += " AND open_time <= ?"
+            args.append(int(end))
+        query += " ORDER BY open_time"
+        with self._lock:
+            rows = self._connection().execute(query, args).fetchall()
+        return np.array(rows, dtype=RECORD_DTYPE) if rows else np.empty(0, RECORD_DTYPE)
+
+    def load(self, symbol, start=None, end=None):
+        records = self.load_records(symbol, start, end)
+        if len(records) == 0:
+            return pd.DataFrame()
+        return records_to_frame(records, symbol)
+
+
+def open_store(config):
+    """Create the storage backend selected by the ``storage`` config key."""
+
+    kind = config.get("storage", "csv")
+    interval = config.get("interval", "1m")
+    directory = config.get("data_dir", ".")
+    if kind == "csv":
+        return CsvStore(directory, interval)
+    if kind == "numpy":
+        return NumpyStore(directory, interval)
+    if kind == "sqlite":
+        return SqliteStore(config.get("database_path", "binance_1m.db"), interval)
+    raise ValueError(f"Backend de almacenamiento desconocido: {kind}")
+
+
+def _read_tail_row(path, block_size=4096):
+    """Return ``(offset, open_time_ms)`` of the last row in a CSV file.
+
+    Only the end of the file is read so the cost does not depend on its size.
+    ``None`` is returned for files without data rows.
+    """
+
+    size = os.path.getsize(path)
+    with open(path, "rb") as f:
+        start = max(0, size - block_size)
+        f.seek(start)
+        data = f.read()
+    body = data.rstrip(b"\r\n")
+    cut = body.rfind(b"\n")
+    if cut == -1 and start > 0:
+        return _read_tail_row(path, block_size * 4)
+    if cut == -1:
+        # Solo existe la cabecera
+        return None
+    line = body[cut + 1 :].decode()
+    open_time = to_ms(line.split(",", 1)[0])
+    if open_time is None:
+        return None
+    return start + cut + 1, open_time
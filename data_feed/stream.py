@@ -0,0 +1,142 @@
+"""Streaming kline feed over the Binance combined WebSocket stream."""
+
+from __future__ import annotations
+
+import asyncio
+import json
+
+import numpy as np
+from websockets.asyncio.client import connect
+from websockets.exceptions import WebSocketException
+
+from data_feed.storage import RECORD_DTYPE
+
+
+def kline_to_record(kline):
+    """Convert the ``k`` payload of a kline event to a storage record."""
+
+    record = np.zeros(1, dtype=RECORD_DTYPE)
+    record["open_time"] = kline["t"]
+    record["open"] = float(kline["o"])
+    record["high"] = float(kline["h"])
+    record["low"] = float(kline["l"])
+    record["close"] = float(kline["c"])
+    record["volume"] = float(kline["v"])
+    record["close_time"] = kline["T"]
+    record["quote_asset_volume"] = float(kline["q"])
+    record["number_of_trades"] = kline["n"]
+    record["taker_buy_base"] = float(kline["V"])
+    record["taker_buy_quote"] = float(kline["Q"])
+    return record
+
+
+class KlineStream:
+    """Keep a :class:`DataFeed` up to date from the kline WebSocket stream.
+
+    One combined stream carries the candles of every configured symbol. Each
+    message updates the feed's in-memory candles; when a candle closes
+    ``on_close(symbol)`` is invoked so predictions can run immediately, and
+    the candle is queued for a writer task that persists it in a worker
+    thread, so slow disk writes never delay receiving messages. After every
+    (re)connection pending writes are flushed and the feed catches up through
+    REST with :meth:`DataFeed.update`, so candles missed while disconnected
+    are recovered.
+
+    Parameters
+    ----------
+    config : dict
+        Configuration with optional ``stream_url`` and
+        ``stream_reconnect_delay`` keys.
+    logger : logging.Logger
+        Logger used to report connection events.
+    feed : data_feed.downloader.DataFeed
+        Feed whose candles are updated.
+    on_close : callable, optional
+        Called with the symbol of every closed candle.
+    """
+
+    def __init__(self, config, logger, feed, on_close=None):
+        self.config = config
+        self.logger = logger
+        self.feed = feed
+        self.on_close = on_close
+        self.base_url = config.get("stream_url", "wss://stream.binance.com:9443")
+        self.reconnect_delay = config.get("stream_reconnect_delay", 1.0)
+        self._stopped = False
+        self._ws = None
+        self._unsaved = asyncio.Queue()
+
+    @property
+    def url(self):
+        """Return the combined stream URL for every configured symbol."""
+
+        streams = "/".join(
+            f"{symbol.lower()}@kline_{self.feed.interval}" for symbol in self.feed.symbols
+        )
+        return f"{self.base_url}/stream?streams={streams}"
+
+    def handle_message(self, message):
+        """Apply one stream message and return the symbol if its candle closed."""
+
+        data = json.loads(message)
+        payload = data.get("data", data)
+        kline = payload.get("k")
+        if payload.get("e") != "kline" or kline is None:
+            return None
+        symbol = kline["s"]
+        closed = bool(kline["x"])
+        record = kline_to_record(kline)
+        self.feed.apply_kline(symbol, record, closed, persist=False)
+        if closed:
+            self._unsaved.put_nowait((symbol, record))
+            if self.on_close is not None:
+                self.on_close(symbol)
+        return symbol if closed else None
+
+    async def _write_closed(self):
+        """Persist queued closed candles in order, off the event loop."""
+
+        while True:
+            symbol, record = await self._unsaved.get()
+            try:
+                await asyncio.to_thread(self.feed.persist_kline, symbol, record)
+            except Exception as exc:
+                self.logger.error(f"No se pudo guardar la vela de {symbol}: {exc}")
+            finally:
+                self._unsaved.task_done()
+
+    async def run(self):
+        """Consume the stream until :meth:`stop` is called, reconnecting on errors."""
+
+        delay = self.reconnect_delay
+        writer = asyncio.create_task(self._write_closed())
+        try:
+            while not self._stopped:
+                try:
+                    async with connect(self.url) as ws:
+                        self._ws = ws
+                        self.logger.info("Conectado al stream de velas")
+                        # La recuperación por REST no debe escribir a la vez que el writer
+                        await self._unsaved.join()
+                        # Recuperar por REST lo perdido mientras no había conexión
+                        await asyncio.to_thread(self.feed.update)
+                        delay = self.reconnect_delay
+                        async for message in ws:
+                            self.handle_message(message)
+                except (OSError, WebSocketException) as exc:
+                    self.logger.warning(f"Stream de velas desconectado: {exc}")
+                finally:
+                    self._ws = None
+                if not self._stopped:
+                    await asyncio.sleep(delay)
+                    delay = min(delay * 2, 60)
+            await self._unsaved.join()
+        finally:
+            writer.cancel()
+
+    async def stop(self):
+        """Stop consuming the stream and close the connection."""
+
+        self._stopped = True
+        if self._ws is not None:
+            await self._ws.close()
@@ -0,0 +1,170 @@
+"""Memory-mapped archives of Binance aggregated trades.
+
+Each symbol is stored in ``{symbol}_aggTrades.bin`` as packed
+:data:`TRADE_DTYPE` records sorted by aggregate trade ID, so archives of
+many gigabytes are read through :class:`numpy.memmap` and replayed in
+chunks without loading them into memory. :func:`import_agg_trades_csv`
+converts the public dumps from https://data.binance.vision.
+
+Usage::
+
+    python -m data_feed.trades BTCUSDT BTCUSDT-aggTrades-2024-01-01.zip --data-dir data
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+# Registro empaquetado de un aggTrade: 33 bytes, tiempo en ms
+TRADE_DTYPE = np.dtype(
+    [
+        ("agg_id", "<i8"),
+        ("time", "<i8"),
+        ("price", "<f8"),
+        ("qty", "<f8"),
+        ("buyer_maker", "?"),
+    ]
+)
+
+AGG_TRADE_COLUMNS = [
+    "agg_trade_id",
+    "price",
+    "quantity",
+    "first_trade_id",
+    "last_trade_id",
+    "transact_time",
+    "is_buyer_maker",
+    "is_best_match",
+]
+
+
+class TradeArchive:
+    """Append-only aggregated trade archive of one symbol.
+
+    Parameters
+    ----------
+    directory : str
+        Directory holding the archive files.
+    symbol : str
+        Market symbol of the trades.
+    """
+
+    def __init__(self, directory: str, symbol: str) -> None:
+        self.directory = directory
+        self.symbol = symbol
+        self.path = os.path.join(directory, f"{symbol}_aggTrades.bin")
+
+    def records(self) -> np.ndarray:
+        """Return a read-only memory map of every stored trade."""
+
+        if not os.path.exists(self.path) or os.path.getsize(self.path) == 0:
+            return np.empty(0, dtype=TRADE_DTYPE)
+        return np.memmap(self.path, dtype=TRADE_DTYPE, mode="r")
+
+    def __len__(self) -> int:
+        if not os.path.exists(self.path):
+            return 0
+        return os.path.getsize(self.path) // TRADE_DTYPE.itemsize
+
+    def last_id(self) -> int | None:
+        """Return the aggregate ID of the last stored trade."""
+
+        records = self.records()
+        return int(records["agg_id"][-1]) if len(records) else None
+
+    def append(self, records: np.ndarray) -> int:
+        """Append trades newer than the last stored one and return how many.
+
+        ``records`` must be sorted by ``agg_id``; trades already stored are
+        skipped, so an interrupted import can simply be repeated.
+        """
+
+        last = self.last_id()
+        if last is not None:
+            records = records[records["agg_id"] > last]
+        if len(records) == 0:
+            return 0
+        os.makedirs(self.directory or ".", exist_ok=True)
+        with open(self.path, "ab") as f:
+            f.write(np.ascontiguousarray(records, dtype=TRADE_DTYPE).tobytes())
+        return len(records)
+
+    def chunks(self, chunk_size: int = 1_000_000, start: int | None = None, end: int | None = None):
+        """Yield consecutive zero-copy slices of at most ``chunk_size`` trades.
+
+        ``start`` and ``end`` bound the trade ``time`` in ms (both
+        inclusive); they are located by binary search, so only the pages of
+        the yielded slices are read from disk.
+        """
+
+        records = self.records()
+        if len(records) == 0:
+            return
+        times = records["time"]
+        lo = 0 if start is None else int(np.searchsorted(times, start, "left"))
+        hi = len(records) if end is None else int(np.searchsorted(times, end, "right"))
+        for first in range(lo, hi, chunk_size):
+            yield records[first : min(first + chunk_size, hi)]
+
+
+def _has_header(path: str) -> bool:
+    first = pd.read_csv(path, header=None, nrows=1).iloc[0, 0]
+    return not str(first).strip().lstrip("-").isdigit()
+
+
+def import_agg_trades_csv(path: str, archive: TradeArchive, chunk_rows: int = 1_000_000) -> int:
+    """Import a Binance public aggTrades CSV (or zipped CSV) into ``archive``.
+
+    Dumps with and without a header row are accepted, and timestamps in
+    microseconds (spot dumps since 2025) are converted to milliseconds. The
+    file is read ``chunk_rows`` rows at a time.
+
+    Returns
+    -------
+    int
+        Number of trades appended.
+    """
+
+    header = 0 if _has_header(path) else None
+    reader = pd.read_csv(
+        path,
+        header=header,
+        names=AGG_TRADE_COLUMNS,
+        usecols=range(7),
+        chunksize=chunk_rows,
+    )
+    imported = 0
+    for chunk in reader:
+        records = np.empty(len(chunk), dtype=TRADE_DTYPE)
+        records["agg_id"] = chunk["agg_trade_id"].to_numpy(dtype=np.int64)
+        times = chunk["transact_time"].to_numpy(dtype=np.int64)
+        # Más de 1e14 solo puede ser un tiempo en microsegundos
+        records["time"] = np.where(times > 10**14, times // 1000, times)
+        records["price"] = chunk["price"].to_numpy(dtype=float)
+        records["qty"] = chunk["quantity"].to_numpy(dtype=float)
+        maker = chunk["is_buyer_maker"]
+        if maker.dtype != bool:
+            maker = maker.astype(str).str.lower() == "true"
+        records["buyer_maker"] = maker.to_numpy(dtype=bool)
+        imported += archive.append(records)
+    return imported
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Importa volcados aggTrades de Binance")
+    parser.add_argument("symbol")
+    parser.add_argument("files", nargs="+")
+    parser.add_argument("--data-dir", default=".")
+    args = parser.parse_args(argv)
+    archive = TradeArchive(args.data_dir, args.symbol)
+    for path in args.files:
+        count = import_agg_trades_csv(path, archive)
+        print(f"{path}: {count} trades importados")
+
+
+if __name__ == "__main__":
+    main()
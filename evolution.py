@@ -3,8 +3,12 @@
 from __future__ import annotations
 
 import json
+import logging
+import multiprocessing
+from concurrent.futures import Future, ProcessPoolExecutor
+from logging.handlers import QueueHandler, QueueListener
 from pathlib import Path
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Tuple
 
 from strategy import StrategyVariant
 
@@ -51,19 +55,18 @@ def evolve_population(
     return new_population[:population_size]
 
 
-def save_population(variants: List[StrategyVariant], path: str) -> None:
-    data = [
+def population_to_dicts(variants: List[StrategyVariant]) -> List[Dict[str, Any]]:
+    """Serialise variants to plain dictionaries."""
+
+    return [
         {"params": v.params, "generation": v.generation, "history": v.history}
         for v in variants
     ]
-    Path(path).write_text(json.dumps(data))
 
 
-def load_population(path: str) -> List[StrategyVariant]:
-    p = Path(path)
-    if not p.exists():
-        return []
-    data = json.loads(p.read_text())
+def population_from_dicts(data: List[Dict[str, Any]]) -> List[StrategyVariant]:
+    """Rebuild variants serialised with :func:`population_to_dicts`."""
+
     variants = []
     for item in data:
         variant = StrategyVariant(
@@ -74,3 +77,158 @@ def load_population(path: str) -> List[StrategyVariant]:
             variant.record_result(hist)
         variants.append(variant)
     return variants
+
+
+def save_population(variants: List[StrategyVariant], path: str) -> None:
+    Path(path).write_text(json.dumps(population_to_dicts(variants)))
+
+
+def load_population(path: str) -> List[StrategyVariant]:
+    p = Path(path)
+    if not p.exists():
+        return []
+    return population_from_dicts(json.loads(p.read_text()))
+
+
+# Backtester propio de cada proceso del pool, creado por _init_worker
+_worker_backtester = None
+
+
+def _init_worker(config: Dict[str, Any], log_queue) -> None:
+    global _worker_backtester
+    from backtest.engine import Backtester
+
+    # Los registros viajan al proceso principal, el único que escribe el log
+    logger = logging.getLogger("Bot.evolucion")
+    logger.handlers = [QueueHandler(log_queue)]
+    logger.propagate = False
+    logger.setLevel(config.get("log_level", "INFO"))
+    _worker_backtester = Backtester(config, logger)
+
+
+def _logger_handlers(logger: logging.Logger) -> List[logging.Handler]:
+    """Return the handlers a record logged on ``logger`` reaches."""
+
+    handlers: List[logging.Handler] = []
+    current = logger
+    while current is not None:
+        handlers.extend(current.handlers)
+        if not current.propagate:
+            break
+        current = current.parent
+    return handlers
+
+
+def run_evolution_cycle(
+    population: List[Dict[str, Any]],
+    population_size: int,
+    mutation_rate: float = 0.1,
+    top_pct: float = 0.5,
+) -> Dict[str, Any]:
+    """Backtest and evolve a serialised population inside a worker process.
+
+    Returns
+    -------
+    dict
+        ``population`` with the evolved variants serialised, ``best`` with
+        the evaluated variant of highest ROI (``None`` if nothing was
+        evaluated) and ``backtest`` with the backtester's cache counters.
+    """
+
+    variants = population_from_dicts(population)
+    results = _worker_backtester.run(variants)
+    best = None
+    if results:
+        ranked = [v for v in variants if id(v) in results]
+        top = max(ranked, key=lambda v: results[id(v)]["roi"])
+        best = population_to_dicts([top])[0]
+    evolved = evolve_population(
+        variants,
+        population_size=population_size,
+        mutation_rate=mutation_rate,
+        top_pct=top_pct,
+    )
+    return {
+        "population": population_to_dicts(evolved),
+        "best": best,
+        "backtest": _worker_backtester.stats(),
+    }
+
+
+class EvolutionWorker:
+    """Run evolutionary cycles in a background process.
+
+    Backtesting and evolving the population is CPU bound, so it runs in a
+    separate process that does not compete with the trading path for the
+    GIL. Callers :meth:`submit` a population and later :meth:`poll` for the
+    evolved one; at most one cycle is in flight at a time. The worker's log
+    records are sent through a queue to the handlers of ``logger``, so only
+    this process writes the log file.
+
+    Parameters
+    ----------
+    config : dict
+        Configuration used to build the worker's backtester and the
+        ``population_size``, ``mutation_rate`` and ``selection_pct`` options.
+    logger : logging.Logger
+        Logger for progress information.
+    """
+
+    def __init__(self, config: Dict[str, Any], logger: Any) -> None:
+        self.config = config
+        self.logger = logger
+        self.population_size = config.get("population_size", 4)
+        self.mutation_rate = config.get("mutation_rate", 0.1)
+        self.selection_pct = config.get("selection_pct", 0.5)
+        self._log_queue = multiprocessing.Queue()
+        self._listener = QueueListener(
+            self._log_queue, *_logger_handlers(logger), respect_handler_level=True
+        )
+        self._listener.start()
+        self._executor = ProcessPoolExecutor(
+            max_workers=1, initializer=_init_worker, initargs=(config, self._log_queue)
+        )
+        self._future: Future | None = None
+        # Contadores del backtester del proceso, actualizados en cada poll()
+        self.stats: Dict[str, Any] = {}
+
+    @property
+    def busy(self) -> bool:
+        """Return ``True`` while a submitted cycle has not finished."""
+
+        return self._future is not None and not self._future.done()
+
+    def submit(self, population: List[StrategyVariant]) -> bool:
+        """Start a cycle for ``population`` unless one is already running."""
+
+        if self._future is not None:
+            return False
+        self._future = self._executor.submit(
+            run_evolution_cycle,
+            population_to_dicts(population),
+            self.population_size,
+            self.mutation_rate,
+            self.selection_pct,
+        )
+        return True
+
+    def poll(self) -> Tuple[List[StrategyVariant], StrategyVariant | None] | None:
+        """Return ``(population, best)`` of a finished cycle or ``None``.
+
+        Errors raised by the worker propagate to the caller.
+        """
+
+        if self._future is None or not self._future.done():
+            return None
+        future, self._future = self._future, None
+        result = future.result()
+        self.stats = result.get("backtest", {})
+        best = result["best"]
+        best_variant = population_from_dicts([best])[0] if best else None
+        return population_from_dicts(result["population"]), best_variant
+
+    def shutdown(self) -> None:
+        """Stop the worker process, discarding any pending cycle."""
+
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self._listener.stop()
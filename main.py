@@ -8,12 +8,13 @@ from logging_utils.logging import setup_logging
 from watchdog.watchdog import Watchdog
 from strategy import StrategyVariant
 from evolution import (
-    evolve_population,
+    EvolutionWorker,
     save_population,
     load_population,
 )
 from modules.analytics import gather_metrics, save_metrics
-import time
+from scheduler import Scheduler
+import asyncio
 from datetime import datetime
 
 import yaml
@@ -46,6 +47,8 @@ def main():
     check_api_keys(config, logger)
 
     feed = DataFeed(config, logger)
+    if config.get("backfill_days"):
+        feed.backfill()
     model_manager = ModelManager(config, logger)
     trader = Trader(config, logger)
     simulator = Simulator(config, logger)
@@ -54,8 +57,6 @@ def main():
 
     population_path = config.get("population_path", "population.json")
     population_size = config.get("population_size", 4)
-    mutation_rate = config.get("mutation_rate", 0.1)
-    selection_pct = config.get("selection_pct", 0.5)
 
     population = load_population(population_path)
     if not population:
@@ -64,44 +65,98 @@ def main():
             for _ in range(population_size)
         ]
 
-    try:
-        while True:
-            watchdog.heartbeat()
-            feed.update()
-            if mode == "live":
-                signals = model_manager.predict(feed.latest_data())
-                trader.execute(signals)
-            elif mode == "test":
-                signals = model_manager.predict(feed.latest_data())
-                simulator.simulate(signals)
-            elif mode == "backtest":
-                backtester.run(population)
-                break
-            if model_manager.need_retrain():
-                model_manager.retrain(feed.history())
-            results = backtester.run(population)
-            population = evolve_population(
-                population,
-                population_size=population_size,
-                mutation_rate=mutation_rate,
-                top_pct=selection_pct,
-            )
-            if results:
-                best_id = max(results, key=lambda k: results[k]["roi"])
-                best = results[best_id]
+    if mode == "backtest":
+        # El backtest evalúa sobre datos al día, no sobre lo que haya en disco
+        feed.update()
+        backtester.run(population)
+        logger.info(f"Caché de fitness: {backtester.stats()}")
+        return
+
+    state = {"population": population}
+    # En modo test las métricas reflejan el balance y las posiciones simuladas
+    account = simulator if mode == "test" else trader
+    evolution = EvolutionWorker(config, logger)
+    candles = asyncio.Event()
+    scheduler = Scheduler(logger)
+
+    def trade():
+        watchdog.heartbeat()
+        data = feed.latest_data()
+        signals = model_manager.predict(data)
+        if mode == "live":
+            trader.execute(signals)
+        elif mode == "test":
+            simulator.simulate(signals, data)
+
+    def retrain():
+        if model_manager.need_retrain():
+            model_manager.retrain(feed.history())
+
+    def evolve():
+        # El ciclo evolutivo corre en otro proceso; aquí solo se recoge el resultado
+        result = evolution.poll()
+        if result is not None:
+            population, best = result
+            if best is not None:
+                metrics = best.history[-1]
                 logger.info(
-                    f"Fin de ciclo evolutivo. Estrategia top: ROI {best['roi']:.3f} | Winrate: {best['winrate']:.2f}"
+                    f"Fin de ciclo evolutivo. Estrategia top: ROI {metrics['roi']:.3f} | Winrate: {metrics['winrate']:.2f}"
                 )
                 logger.info("Nuevas variantes generadas y mutadas.")
+                model_manager.apply_variant(best)
             save_population(population, population_path)
-            metrics = gather_metrics(trader, model_manager, population)
-            save_metrics(metrics, "results.json")
-            logger.info(
-                f"Balance actual: {metrics['trader'].get('balance', 0):.2f}"
+            state["population"] = population
+        evolution.submit(state["population"])
+
+    def write_metrics():
+        metrics = gather_metrics(
+            account, model_manager, state["population"], evolution.stats
+        )
+        save_metrics(metrics, "results.json")
+        logger.info(
+            f"Balance actual: {metrics['trader'].get('balance', 0):.2f}"
+        )
+
+    async def run():
+        # Las velas nuevas disparan el trading; el resto va a su propio ritmo
+        loop = asyncio.get_running_loop()
+        # Primera descarga antes de arrancar para que las etapas tengan datos
+        await asyncio.to_thread(feed.update)
+        candles.set()
+        if config.get("feed_mode", "rest") == "stream":
+            from data_feed.stream import KlineStream
+
+            stream = KlineStream(
+                config, logger, feed, on_close=lambda symbol: candles.set()
             )
-            time.sleep(config.get("cycle_sleep", 60))
+            scheduler.add(stream.run)
+        else:
+
+            def poll():
+                feed.update()
+                loop.call_soon_threadsafe(candles.set)
+
+            # La primera descarga ya está hecha: el sondeo empieza un ciclo después
+            cycle_sleep = config.get("cycle_sleep", 60)
+            scheduler.every("descarga", cycle_sleep, poll, delay=cycle_sleep)
+        if mode == "live" and config.get("user_stream", True):
+            from trading.account import UserDataStream
+
+            user_stream = UserDataStream(
+                config, logger, trader.client, trader.account, on_update=trader.sync_balance
+            )
+            scheduler.add(user_stream.run)
+        scheduler.on("trading", candles, trade)
+        scheduler.every("reentrenamiento", config.get("retrain_interval", 3600), retrain)
+        scheduler.every("evolución", config.get("evolution_interval", 300), evolve)
+        scheduler.every("métricas", config.get("metrics_interval", 60), write_metrics)
+        await scheduler.run()
+
+    try:
+        asyncio.run(run())
     except KeyboardInterrupt:
-        metrics = gather_metrics(trader, model_manager, population)
+        evolution.shutdown()
+        metrics = gather_metrics(account, model_manager, state["population"])
         logger.info(
             f"=== Bot detenido ===\nResumen final: Balance: {metrics['trader'].get('balance', 0):.2f}, Trades: {metrics['trader'].get('trades', 0)}"
         )
@@ -0,0 +1,109 @@
+"""Array-based tree ensembles for low-latency inference."""
+
+from __future__ import annotations
+
+import numpy as np
+
+
+class CompactForest:
+    """Flattened copy of a fitted scikit-learn tree ensemble classifier.
+
+    The nodes of every tree are stored in shared arrays (split feature,
+    threshold, children and leaf class probabilities) and a batch is scored
+    by advancing all ``(sample, tree)`` pairs one level per step with NumPy
+    indexing. Leaves point to themselves, and pairs drop out of the batch as
+    soon as they reach one. Inputs are cast to ``float32`` exactly like
+    scikit-learn does, so probabilities match ``predict_proba``.
+
+    Use :meth:`from_sklearn` to build one.
+    """
+
+    def __init__(self, roots, feature, threshold, children, value, classes, n_features, max_depth):
+        self.roots = roots
+        self.feature = feature
+        self.threshold = threshold
+        self.children = children
+        self.value = value
+        self.classes_ = classes
+        self.n_features_in_ = n_features
+        self.max_depth = max_depth
+
+    @classmethod
+    def from_sklearn(cls, model):
+        """Build a compact forest from a fitted ``RandomForestClassifier``-like model."""
+
+        trees = [estimator.tree_ for estimator in model.estimators_]
+        sizes = np.array([tree.node_count for tree in trees])
+        offsets = np.concatenate([[0], np.cumsum(sizes)[:-1]])
+        feature, threshold, children, value = [], [], [], []
+        for tree, offset in zip(trees, offsets):
+            nodes = np.arange(tree.node_count)
+            leaf = tree.children_left == -1
+            left = np.where(leaf, nodes, tree.children_left) + offset
+            right = np.where(leaf, nodes, tree.children_right) + offset
+            feature.append(np.where(leaf, 0, tree.feature))
+            # Las hojas siempre "van a la izquierda", es decir, a sí mismas
+            threshold.append(np.where(leaf, np.inf, tree.threshold))
+            children.append(np.stack([left, right], axis=1))
+            counts = tree.value[:, 0, :]
+            value.append(counts / counts.sum(axis=1, keepdims=True))
+        return cls(
+            roots=offsets.astype(np.int32),
+            feature=np.concatenate(feature).astype(np.int32),
+            threshold=np.concatenate(threshold),
+            children=np.concatenate(children).astype(np.int32),
+            value=np.concatenate(value),
+            classes=np.asarray(model.classes_),
+            n_features=model.n_features_in_,
+            max_depth=max(tree.max_depth for tree in trees),
+        )
+
+    @property
+    def nbytes(self):
+        """Memory used by the node arrays."""
+
+        return sum(
+            a.nbytes for a in (self.roots, self.feature, self.threshold, self.children, self.value)
+        )
+
+    def apply(self, X):
+        """Return the leaf reached by every sample in every tree, shape ``(n, trees)``."""
+
+        X = np.asarray(X, dtype=np.float32)
+        n_trees = len(self.roots)
+        nodes = np.tile(self.roots, len(X))
+        rows = np.repeat(np.arange(len(X)), n_trees)
+        active = np.arange(len(nodes))
+        # Solo se avanzan los pares que aún no han llegado a una hoja
+        while len(active):
+            current = nodes[active]
+            go_right = X[rows[active], self.feature[current]] > self.threshold[current]
+            following = self.children[current, go_right.astype(np.intp)]
+            nodes[active] = following
+            active = active[following != current]
+        return nodes.reshape(len(X), n_trees)
+
+    def predict_proba(self, X):
+        """Return class probabilities averaged over the trees."""
+
+        return self.value[self.apply(X)].mean(axis=1)
+
+    def predict(self, X):
+        """Return the most probable class of every sample."""
+
+        return self.classes_[np.argmax(self.predict_proba(X), axis=1)]
+
+
+def compact_model(model):
+    """Return a :class:`CompactForest` of ``model`` or ``model`` itself.
+
+    Only fitted single-output tree ensemble classifiers are converted;
+    anything else, including an already compact model, is returned as is.
+    """
+
+    estimators = getattr(model, "estimators_", None)
+    if not estimators or not all(hasattr(e, "tree_") for e in estimators):
+        return model
+    if getattr(model, "n_outputs_", 1) != 1:
+        return model
+    return CompactForest.from_sklearn(model)
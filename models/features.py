@@ -0,0 +1,336 @@
+"""Feature definitions shared by training, prediction and backtesting.
+
+Every feature is available in two forms that produce the same values:
+:func:`compute_features` evaluates a whole history with vectorised
+NumPy/pandas operations for training and backtests, and
+:class:`IncrementalFeatures` updates them candle by candle in ``O(1)`` for
+live prediction.
+"""
+
+from __future__ import annotations
+
+from collections import deque
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+from data_feed.storage import times_to_ms
+
+RET_LAG = 5
+VOLATILITY_WINDOW = 20
+EMA_SPAN = 20
+RSI_PERIOD = 14
+MACD_FAST, MACD_SLOW, MACD_SIGNAL = 12, 26, 9
+VOLUME_WINDOW = 20
+STOCH_WINDOW = 14
+
+FEATURE_NAMES = (
+    "ret_1",
+    "ret_5",
+    "volatility",
+    "ema_ratio",
+    "rsi",
+    "macd",
+    "macd_hist",
+    "volume_ratio",
+    "stoch_k",
+)
+
+
+def stochastic_k(close, high, low, window=STOCH_WINDOW):
+    """Return the stochastic oscillator %K scaled to ``[0, 1]``.
+
+    The value measures where ``close`` sits within the high/low range of the
+    last ``window`` candles. The first ``window - 1`` values are ``NaN``.
+    """
+
+    k = np.full(len(close), np.nan)
+    if len(close) < window:
+        return k
+    highest = sliding_window_view(high, window).max(axis=1)
+    lowest = sliding_window_view(low, window).min(axis=1)
+    span = highest - lowest
+    with np.errstate(divide="ignore", invalid="ignore"):
+        k[window - 1 :] = np.where(span > 0, (close[window - 1 :] - lowest) / span, 0.5)
+    return k
+
+
+def _ema(values, span=None, alpha=None):
+    """Exponential moving average seeded with the first valid value."""
+
+    return pd.Series(values).ewm(span=span, alpha=alpha, adjust=False).mean().to_numpy()
+
+
+def compute_features(close, high, low, volume):
+    """Return the feature matrix of a candle history.
+
+    Returns
+    -------
+    numpy.ndarray
+        Array of shape ``(T, len(FEATURE_NAMES))``. Rows whose rolling
+        windows are not yet full contain ``NaN``.
+    """
+
+    close = np.asarray(close, dtype=float)
+    high = np.asarray(high, dtype=float)
+    low = np.asarray(low, dtype=float)
+    volume = np.asarray(volume, dtype=float)
+    n = len(close)
+    features = np.full((n, len(FEATURE_NAMES)), np.nan)
+    if n == 0:
+        return features
+
+    ret_1 = np.full(n, np.nan)
+    ret_1[1:] = close[1:] / close[:-1] - 1
+    features[:, 0] = ret_1
+    features[RET_LAG:, 1] = close[RET_LAG:] / close[:-RET_LAG] - 1
+    features[:, 2] = (
+        pd.Series(ret_1).rolling(VOLATILITY_WINDOW).std(ddof=0).to_numpy()
+    )
+    features[:, 3] = close / _ema(close, span=EMA_SPAN) - 1
+
+    delta = np.diff(close, prepend=np.nan)
+    gain = _ema(np.clip(delta, 0, None), alpha=1 / RSI_PERIOD)
+    loss = _ema(np.clip(-delta, 0, None), alpha=1 / RSI_PERIOD)
+    total = gain + loss
+    with np.errstate(divide="ignore", invalid="ignore"):
+        features[:, 4] = np.where(total > 0, gain / total, 0.5)
+    features[0, 4] = np.nan
+
+    macd = (_ema(close, span=MACD_FAST) - _ema(close, span=MACD_SLOW)) / close
+    features[:, 5] = macd
+    features[:, 6] = macd - _ema(macd, span=MACD_SIGNAL)
+
+    mean_volume = pd.Series(volume).rolling(VOLUME_WINDOW).mean().to_numpy()
+    with np.errstate(divide="ignore", invalid="ignore"):
+        features[:, 7] = np.where(mean_volume > 0, volume / mean_volume - 1, 0.0)
+    features[: VOLUME_WINDOW - 1, 7] = np.nan
+    features[:, 8] = stochastic_k(close, high, low, STOCH_WINDOW)
+    return features
+
+
+def _frame_columns(df):
+    """Return close, high, low and volume arrays of ``df``.
+
+    Missing ``high``/``low`` columns fall back to ``close`` and a missing
+    ``volume`` to ones.
+    """
+
+    close = df["close"].to_numpy(dtype=float)
+    high = df["high"].to_numpy(dtype=float) if "high" in df else close
+    low = df["low"].to_numpy(dtype=float) if "low" in df else close
+    volume = df["volume"].to_numpy(dtype=float) if "volume" in df else np.ones(len(close))
+    return close, high, low, volume
+
+
+def feature_matrix(df):
+    """Return :func:`compute_features` for a candle data frame."""
+
+    return compute_features(*_frame_columns(df))
+
+
+def forward_labels(close, horizon=1, threshold=0.0):
+    """Label each candle with ``1`` if the return ``horizon`` candles ahead
+    exceeds ``threshold`` and ``0`` otherwise.
+
+    The last ``horizon`` candles have no future and are labelled ``-1``.
+    """
+
+    close = np.asarray(close, dtype=float)
+    labels = np.full(len(close), -1, dtype=np.int8)
+    if len(close) > horizon:
+        labels[:-horizon] = close[horizon:] / close[:-horizon] - 1 > threshold
+    return labels
+
+
+def candle_numbers(df, step):
+    """Return the absolute candle number (``open_time // step``) of each row.
+
+    Frames without ``open_time`` are numbered by position.
+    """
+
+    if "open_time" in df:
+        return times_to_ms(df["open_time"]) // step
+    return np.arange(len(df))
+
+
+class _RollingExtreme:
+    """Maximum (or minimum) of the last ``window`` values via a monotonic deque."""
+
+    def __init__(self, window, largest=True):
+        self.window = window
+        self.sign = 1.0 if largest else -1.0
+        self._items = deque()
+
+    def peek(self, index, value):
+        """Return the extreme including ``value`` at ``index`` without storing it."""
+
+        best = self.sign * value
+        for i, v in self._items:
+            if i > index - self.window:
+                best = max(best, v)
+                break
+        return self.sign * best
+
+    def push(self, index, value):
+        value = self.sign * value
+        while self._items and self._items[-1][1] <= value:
+            self._items.pop()
+        self._items.append((index, value))
+        while self._items[0][0] <= index - self.window:
+            self._items.popleft()
+
+
+class IncrementalFeatures:
+    """Update :data:`FEATURE_NAMES` one candle at a time.
+
+    :meth:`update` commits a closed candle to the state and :meth:`peek`
+    evaluates a candle that may still change (the one currently open)
+    without committing it. Both run in constant time regardless of how much
+    history has been seen.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self._closes = deque(maxlen=RET_LAG)
+        self._returns = deque(maxlen=VOLATILITY_WINDOW)
+        self._ret_sum = 0.0
+        self._ret_sq = 0.0
+        self._volumes = deque(maxlen=VOLUME_WINDOW)
+        self._volume_sum = 0.0
+        self._ema = {EMA_SPAN: np.nan, MACD_FAST: np.nan, MACD_SLOW: np.nan}
+        self._signal = np.nan
+        self._gain = np.nan
+        self._loss = np.nan
+        self._highs = _RollingExtreme(STOCH_WINDOW, largest=True)
+        self._lows = _RollingExtreme(STOCH_WINDOW, largest=False)
+
+    @staticmethod
+    def _smooth(previous, value, alpha):
+        return value if np.isnan(previous) else alpha * value + (1 - alpha) * previous
+
+    def _step(self, close, high, low, volume, commit):
+        features = np.full(len(FEATURE_NAMES), np.nan)
+        prev = self._closes[-1] if self._closes else np.nan
+        ret = close / prev - 1
+        features[0] = ret
+        if len(self._closes) == RET_LAG:
+            features[1] = close / self._closes[0] - 1
+
+        ret_sum, ret_sq, n_returns = self._ret_sum, self._ret_sq, len(self._returns)
+        if self.count:
+            if n_returns == VOLATILITY_WINDOW:
+                old = self._returns[0]
+                ret_sum -= old
+                ret_sq -= old * old
+                n_returns -= 1
+            ret_sum += ret
+            ret_sq += ret * ret
+            n_returns += 1
+            if n_returns == VOLATILITY_WINDOW:
+                mean = ret_sum / n_returns
+                features[2] = np.sqrt(max(ret_sq / n_returns - mean * mean, 0.0))
+
+        ema = {
+            span: self._smooth(value, close, 2 / (span + 1))
+            for span, value in self._ema.items()
+        }
+        features[3] = close / ema[EMA_SPAN] - 1
+
+        gain, loss = self._gain, self._loss
+        if self.count:
+            delta = close - prev
+            gain = self._smooth(gain, max(delta, 0.0), 1 / RSI_PERIOD)
+            loss = self._smooth(loss, max(-delta, 0.0), 1 / RSI_PERIOD)
+            features[4] = gain / (gain + loss) if gain + loss > 0 else 0.5
+
+        macd = (ema[MACD_FAST] - ema[MACD_SLOW]) / close
+        signal = self._smooth(self._signal, macd, 2 / (MACD_SIGNAL + 1))
+        features[5] = macd
+        features[6] = macd - signal
+
+        volume_sum, n_volumes = self._volume_sum, len(self._volumes)
+        if n_volumes == VOLUME_WINDOW:
+            volume_sum -= self._volumes[0]
+            n_volumes -= 1
+        volume_sum += volume
+        n_volumes += 1
+        if n_volumes == VOLUME_WINDOW:
+            mean_volume = volume_sum / n_volumes
+            features[7] = volume / mean_volume - 1 if mean_volume > 0 else 0.0
+
+        if self.count >= STOCH_WINDOW - 1:
+            highest = self._highs.peek(self.count, high)
+            lowest = self._lows.peek(self.count, low)
+            span = highest - lowest
+            features[8] = (close - lowest) / span if span > 0 else 0.5
+
+        if commit:
+            if self.count:
+                self._returns.append(ret)
+            self._ret_sum, self._ret_sq = ret_sum, ret_sq
+            self._volumes.append(volume)
+            self._volume_sum = volume_sum
+            self._closes.append(close)
+            self._ema = ema
+            self._signal = signal
+            self._gain, self._loss = gain, loss
+            self._highs.push(self.count, high)
+            self._lows.push(self.count, low)
+            self.count += 1
+        return features
+
+    def update(self, close, high, low, volume):
+        """Commit a closed candle and return its features."""
+
+        return self._step(float(close), float(high), float(low), float(volume), True)
+
+    def peek(self, close, high, low, volume):
+        """Return the features of a candle without committing it."""
+
+        return self._step(float(close), float(high), float(low), float(volume), False)
+
+
+class FeatureTracker:
+    """Keep :class:`IncrementalFeatures` per symbol in sync with candle frames.
+
+    Candles are committed once, as soon as a newer candle exists, and the
+    last row of every frame is evaluated with :meth:`IncrementalFeatures.peek`
+    because it may still be open. Frames without ``open_time`` or that do not
+    overlap the committed state are replayed from scratch.
+
+    With ``keep`` above zero, the ``(open_time, close, features)`` of the
+    last ``keep`` committed candles of every symbol are kept in
+    :attr:`committed` for consumers such as online learning.
+    """
+
+    def __init__(self, keep=0):
+        self._states = {}
+        self.keep = keep
+        self.committed = {}
+
+    def latest(self, symbol, df):
+        """Return the features of the last row of ``df``."""
+
+        close, high, low, volume = _frame_columns(df)
+        times = times_to_ms(df["open_time"]) if "open_time" in df else None
+        state, last_time = self._states.get(symbol, (None, None))
+        start = 0
+        if times is not None and last_time is not None:
+            start = int(np.searchsorted(times, last_time, side="right"))
+            if not 0 < start < len(times) or times[start - 1] != last_time:
+                start = 0
+        if start == 0:
+            state = IncrementalFeatures()
+        recent = None
+        if self.keep and times is not None:
+            recent = self.committed.setdefault(symbol, deque(maxlen=self.keep))
+        for i in range(start, len(close) - 1):
+            row = state.update(close[i], high[i], low[i], volume[i])
+            # Al repetir desde cero no se duplican velas ya registradas
+            if recent is not None and (not recent or times[i] > recent[-1][0]):
+                recent.append((int(times[i]), close[i], row))
+        last_time = int(times[-2]) if times is not None and len(times) > 1 else None
+        self._states[symbol] = (state, last_time)
+        return state.peek(close[-1], high[-1], low[-1], volume[-1])
@@ -1,13 +1,58 @@
 """Model management for training and prediction tasks."""
 
+import os
+import time
+from collections import defaultdict, deque
+
 import joblib
+import numpy as np
 from sklearn.ensemble import RandomForestClassifier
 import pandas as pd
 
+from data_feed.storage import interval_to_ms
+from models.compact import CompactForest, compact_model
+from models.features import (
+    FEATURE_NAMES,
+    FeatureTracker,
+    STOCH_WINDOW,
+    candle_numbers,
+    feature_matrix,
+    forward_labels,
+    stochastic_k,
+)
+from models.online import OnlineModel
+from models.policy import RetrainPolicy
+from models.registry import ModelRegistry
+from trading.simulation import candle_arrays
+
+
+def purged_splits(numbers, n_splits, horizon, start=None):
+    """Yield ``(train, test)`` index arrays for purged walk-forward validation.
+
+    ``numbers`` are the sorted candle numbers of the samples. The history is
+    cut into ``n_splits + 1`` consecutive blocks; each block after the first
+    is a test fold trained on everything before it, except samples whose
+    ``horizon``-candle label overlaps the fold, which are purged. With
+    ``start`` only ``numbers[start:]`` is cut into ``n_splits`` test folds.
+    """
+
+    if start is None:
+        bounds = np.linspace(0, len(numbers), n_splits + 2).astype(int)[1:]
+    else:
+        bounds = np.linspace(start, len(numbers), n_splits + 1).astype(int)
+    for lo, hi in zip(bounds[:-1], bounds[1:]):
+        if hi <= lo:
+            continue
+        cut = np.searchsorted(numbers[:lo], numbers[lo] - horizon, side="left")
+        if cut:
+            yield np.arange(cut), np.arange(lo, hi)
+
 
 class ModelManager:
     """Load, train and use machine learning models for trading signals."""
 
+    COMPACT_FILE = "compact.joblib"
+
     def __init__(self, config, logger):
         """Instantiate the manager and load any existing model.
 
@@ -21,14 +66,61 @@ class ModelManager:
 
         self.config = config
         self.logger = logger
-        self.model_path = "model_rf.pkl"
+        self.model_path = config.get("model_path", "model_rf.pkl")
+        self.model_version = None
+        self.training = {}
+        self.use_compact = config.get("compact_model", True)
+        self.online = config.get("model_type", "forest") == "sgd"
+        self._compact = (None, None)
+        self.policy = RetrainPolicy(config, config.get("retrain_state_path"))
         self.model = self._load_model()
+        if self.model is not None and self.policy.trained_at is None:
+            # Modelo previo sin estado de la política: se toma su fecha de entrenamiento
+            self.policy.trained_at = self.training.get("created_at", time.time())
+        self.strategy_params = {}
+        self.horizon = config.get("label_horizon", 1)
+        self.label_threshold = config.get("label_threshold", 0.0)
+        self.cv_splits = config.get("cv_splits", 5)
+        self.step = interval_to_ms(config.get("interval", "1m"))
+        # Aprendizaje online: las velas cerradas se guardan hasta conocer su etiqueta
+        self.features = FeatureTracker(keep=self.horizon + 1000 if self.online else 0)
+        self.checkpoint_every = config.get("online_checkpoint_every", 60)
+        self._online_updates = 0
+        self._trained_until = self.training.get("trained_until", 0)
+        # Predicciones pendientes de conocer su resultado, por símbolo
+        self._pending = defaultdict(deque)
+
+    @property
+    def registry(self):
+        """Return the model registry, by default ``model_registry`` next to ``model_path``."""
+
+        root = self.config.get("model_registry") or os.path.join(
+            os.path.dirname(os.path.abspath(self.model_path)), "model_registry"
+        )
+        return ModelRegistry(root, keep=self.config.get("model_registry_keep", 5))
 
     def _load_model(self):
-        """Load the model from disk if present."""
+        """Load the promoted model of the registry, or ``model_path``, if present.
+
+        Arrays are memory-mapped read-only so large forests load quickly.
+        """
 
         try:
-            model = joblib.load(self.model_path)
+            registry = self.registry
+            current = registry.current()
+            if current is not None:
+                # La versión compacta basta para predecir y ocupa mucho menos
+                filename = None
+                if self.use_compact and os.path.exists(registry.path(current, self.COMPACT_FILE)):
+                    filename = self.COMPACT_FILE
+                model, metadata = registry.load(filename=filename)
+                self.model_version = metadata["version"]
+                self.training = {"created_at": metadata.get("created_at"), **metadata.get("metrics", {})}
+                self.logger.info(
+                    f"Modelo cargado desde el registro: {self.model_version}"
+                )
+                return model
+            model = joblib.load(self.model_path, mmap_mode="r")
             self.logger.info(
                 f"Modelo cargado desde disco: {self.model_path}"
             )
@@ -37,9 +129,85 @@ class ModelManager:
             self.logger.warning("No hay modelo, entrenar desde cero.")
             return None
 
+    def latest_features(self, dfs):
+        """Return the non-empty frames and the features of their last candle.
+
+        Indicators are updated incrementally per symbol, so each call only
+        processes candles not seen before.
+
+        Returns
+        -------
+        tuple[list[pandas.DataFrame], numpy.ndarray]
+            Frames in order and a ``(len(frames), n_features)`` matrix.
+        """
+
+        frames = [df for df in dfs if not df.empty]
+        rows = [self.features.latest(df["symbol"].iloc[-1], df) for df in frames]
+        return frames, np.array(rows).reshape(len(frames), -1)
+
+    def _track_outcomes(self, frames, p_up):
+        """Resolve past predictions whose horizon has closed and queue the new ones."""
+
+        for df, p in zip(frames, p_up):
+            if "open_time" not in df:
+                continue
+            symbol = df["symbol"].iloc[-1]
+            numbers = candle_numbers(df, self.step)
+            close = df["close"].to_numpy(dtype=float)
+            pending = self._pending[symbol]
+            # Solo velas cerradas (todas menos la última) resuelven predicciones
+            while pending and len(numbers) > 1 and pending[0][0] + self.horizon <= numbers[-2]:
+                number, price, up = pending.popleft()
+                idx = np.searchsorted(numbers, number + self.horizon)
+                if numbers[idx] == number + self.horizon:
+                    self.policy.observe_outcome(up == (close[idx] / price - 1 > self.label_threshold))
+            if pending and pending[-1][0] == numbers[-1]:
+                pending.pop()
+            pending.append((int(numbers[-1]), float(close[-1]), bool(p >= 0.5)))
+
+    @property
+    def predictor(self):
+        """Return the model used for live scoring.
+
+        With ``compact_model`` enabled, tree ensembles are exported once per
+        model to a :class:`models.compact.CompactForest`, whose vectorised
+        evaluator returns the same probabilities with far less overhead.
+        """
+
+        model = self.model
+        source, predictor = self._compact
+        if source is not model:
+            predictor = compact_model(model) if self.use_compact else model
+            self._compact = (model, predictor)
+        return predictor
+
+    def _model_matches(self, model=None):
+        """Return ``True`` if the model was trained on the current features."""
+
+        model = self.model if model is None else model
+        return getattr(model, "n_features_in_", len(FEATURE_NAMES)) == len(FEATURE_NAMES)
+
+    def _model_usable(self):
+        """Return ``True`` if the model matches the features and ``model_type``."""
+
+        model = self.model
+        # Cambiar model_type obliga a entrenar un modelo del nuevo tipo
+        return (
+            model is not None
+            and self._model_matches(model)
+            and isinstance(model, OnlineModel) == self.online
+        )
+
     def predict(self, dfs):
         """Generate signals for provided data frames.
 
+        The features of the latest candle of every symbol are scored with a
+        single ``predict_proba`` call. Symbols whose probability of an up
+        move is at least the buy threshold produce a BUY if the applied
+        strategy rule is long on them (see :meth:`strategy_allows`), those at
+        or below the sell threshold a SELL, and the rest are held without a
+        signal; see :meth:`thresholds`.
+
         Parameters
         ----------
         dfs : list[pandas.DataFrame]
@@ -51,59 +219,320 @@ class ModelManager:
             List of signal dictionaries.
         """
 
-        if not self.model:
+        # Referencia local: un reentrenamiento puede sustituir self.model en paralelo
+        model = self.predictor
+        if not model:
             self.logger.warning("No hay modelo entrenado.")
             return []
+        if not self._model_matches(model):
+            self.logger.warning("El modelo no coincide con las features actuales; se reentrenará.")
+            return []
+        frames, X = self.latest_features(dfs)
+        if not frames:
+            return []
+        self.learn_online()
+        proba = model.predict_proba(np.nan_to_num(X))
+        classes = list(model.classes_)
+        p_up = proba[:, classes.index(1)] if 1 in classes else np.zeros(len(frames))
+        self.policy.observe_features(np.nan_to_num(X))
+        self._track_outcomes(frames, p_up)
+        buy, sell = self.thresholds()
+        usdt_amount = self.config.get("trade_size", 10)
         signals = []
-        for df in dfs:
-            if not df.empty:
-                price = float(df["close"].astype(float).iloc[-1])
-                usdt_amount = self.config.get("trade_size", 10)
-                qty = usdt_amount / price if price else 0
-                signal = {
-                    "symbol": df["symbol"].iloc[-1],
-                    "side": "BUY",
-                    "score": 1.0,
-                    "usdt_amount": usdt_amount,
-                    "price": price,
-                    "qty": qty,
-                }
-                signals.append(signal)
-                self.logger.info(
-                    "Se\u00f1al detectada | Symbol: %s | Acci\u00f3n: %s | Score: %s | Monto USDT: %s | Qty: %.8f | Precio: %.2f",
-                    signal.get("symbol", "n/a"),
-                    signal.get("side", "n/a"),
-                    signal.get("score", "n/a"),
-                    signal.get("usdt_amount", "n/a"),
-                    signal.get("qty", 0.0),
-                    signal.get("price", float("nan")),
-                )
+        for df, p in zip(frames, p_up):
+            if p >= buy and self.strategy_allows(df):
+                side, score = "BUY", float(p)
+            elif p <= sell:
+                side, score = "SELL", float(1 - p)
+            else:
+                continue
+            price = float(df["close"].astype(float).iloc[-1])
+            qty = usdt_amount / price if price else 0
+            signal = {
+                "symbol": df["symbol"].iloc[-1],
+                "side": side,
+                "score": score,
+                "usdt_amount": usdt_amount,
+                "price": price,
+                "qty": qty,
+            }
+            signals.append(signal)
+            self.logger.info(
+                "Se\u00f1al detectada | Symbol: %s | Acci\u00f3n: %s | Score: %s | Monto USDT: %s | Qty: %.8f | Precio: %.2f",
+                signal.get("symbol", "n/a"),
+                signal.get("side", "n/a"),
+                signal.get("score", "n/a"),
+                signal.get("usdt_amount", "n/a"),
+                signal.get("qty", 0.0),
+                signal.get("price", float("nan")),
+            )
         return signals
 
+    def thresholds(self):
+        """Return the ``(buy, sell)`` probability thresholds of the model."""
+
+        return self.config.get("buy_threshold", 0.55), self.config.get("sell_threshold", 0.45)
+
+    def strategy_allows(self, df):
+        """Return ``True`` if the applied strategy rule is long on ``df``.
+
+        The rule is the one the backtester evolves: the stochastic %K over
+        the variant's ``window`` above its ``threshold`` (see
+        :func:`backtest.engine.evaluate_population`). Without an applied
+        variant every symbol is allowed.
+        """
+
+        if not self.strategy_params:
+            return True
+        window = int(self.strategy_params.get("window", STOCH_WINDOW))
+        threshold = float(self.strategy_params.get("threshold", 0.5))
+        candles = candle_arrays(df.iloc[-window:])
+        k = stochastic_k(candles["close"], candles["high"], candles["low"], window)
+        # Sin historia suficiente %K es NaN y la regla queda fuera
+        return bool(len(k) and k[-1] > threshold)
+
+    def apply_variant(self, variant):
+        """Use the best evolved ``StrategyVariant`` as the strategy rule of BUY signals.
+
+        Its parameters are only read by :meth:`strategy_allows`; the model's
+        probability thresholds stay as configured.
+        """
+
+        self.strategy_params = dict(variant.params)
+        self.logger.info(f"Estrategia activa actualizada: {self.strategy_params}")
+
     def need_retrain(self):
-        """Determine whether the model requires retraining."""
+        """Determine whether the model requires retraining.
+
+        The decision is delegated to :class:`models.policy.RetrainPolicy`,
+        whose counters are persisted on every check. In online mode the
+        model keeps learning from new candles, so a full retrain is only
+        needed when there is no usable online model.
+        """
 
-        # Aquí una lógica simple de ejemplo: reentrenar cada 100 ciclos
-        # Implementar un contador persistente en producción
-        return self.model is None
+        missing = not self._model_usable()
+        if self.online and not missing:
+            return False
+        reasons = self.policy.reasons(model_missing=missing)
+        self.policy.save()
+        if reasons:
+            self.logger.info(f"Reentrenamiento necesario: {', '.join(reasons)}")
+        return bool(reasons)
 
-    def retrain(self, dfs):
-        """Retrain the model using the supplied data frames."""
+    def learn_online(self):
+        """Update the online model with candles whose label became known.
+
+        Closed candles are labelled once the candle ``label_horizon`` steps
+        later has closed, and all of them are passed to one ``partial_fit``
+        call. Every ``online_checkpoint_every`` updates the model is saved
+        to the registry.
+
+        Returns
+        -------
+        int
+            Number of samples learned.
+        """
+
+        model = self.model
+        if not self.online or not isinstance(model, OnlineModel):
+            return 0
+        X, y, latest = [], [], self._trained_until
+        for recent in self.features.committed.values():
+            while len(recent) > self.horizon:
+                open_time, price, row = recent.popleft()
+                future_time, future, _ = recent[self.horizon - 1]
+                # Las velas ya vistas en el último entrenamiento completo se omiten
+                if open_time > self._trained_until and future_time - open_time == self.horizon * self.step:
+                    X.append(row)
+                    y.append(int(future / price - 1 > self.label_threshold))
+                    latest = max(latest, open_time)
+        if not X:
+            return 0
+        model.partial_fit(np.nan_to_num(np.array(X)), np.array(y))
+        self._trained_until = latest
+        self._online_updates += 1
+        if self._online_updates % self.checkpoint_every == 0:
+            self.checkpoint()
+        return len(X)
+
+    def checkpoint(self):
+        """Save the current online model as a new promoted registry version."""
 
-        self.logger.info("Entrenando modelo RandomForest...")
-        X, y = [], []
+        model = self.model
+        registry = self.registry
+        version = registry.save(
+            model,
+            {
+                "created_at": time.time(),
+                "features": list(FEATURE_NAMES),
+                "params": model.get_params(),
+                "metrics": {
+                    **self.training,
+                    "trained_until": self._trained_until,
+                    "samples_seen": model.samples_seen,
+                },
+            },
+        )
+        registry.promote(version, publish_path=self.model_path)
+        self.model_version = version
+        self.logger.info(f"Checkpoint del modelo online: {version}")
+
+    def build_model(self):
+        """Return an unfitted classifier configured from ``model_params``.
+
+        With ``model_type: sgd`` an :class:`models.online.OnlineModel` built
+        from ``online_params`` is returned instead of a RandomForest.
+        """
+
+        if self.online:
+            return OnlineModel(**self.config.get("online_params", {}))
+        params = {"n_estimators": 100, "n_jobs": self.config.get("n_jobs", -1)}
+        params.update(self.config.get("model_params", {}))
+        return RandomForestClassifier(**params)
+
+    def training_set(self, dfs):
+        """Return features, labels and candle numbers of every labelled candle.
+
+        Rows of all symbols are ordered by time and stored as ``float32``
+        arrays; candles whose label horizon lies beyond the data are dropped.
+        """
+
+        X, y, numbers = [], [], []
         for df in dfs:
-            if not df.empty:
-                X.extend(df["close"].astype(float).values.reshape(-1, 1))
-                y.extend([1] * len(df))
-        if X and y:
-            model = RandomForestClassifier()
-            model.fit(X, y)
-            joblib.dump(model, self.model_path)
-            self.model = model
-            self.logger.info("Modelo entrenado y guardado.")
+            if df.empty:
+                continue
+            labels = forward_labels(df["close"].to_numpy(dtype=float), self.horizon, self.label_threshold)
+            keep = labels >= 0
+            # Las ventanas aún incompletas de los indicadores se rellenan con 0
+            X.append(np.nan_to_num(feature_matrix(df)[keep]).astype(np.float32))
+            y.append(labels[keep])
+            numbers.append(candle_numbers(df, self.step)[keep])
+        if not X:
+            return np.empty((0, len(FEATURE_NAMES)), dtype=np.float32), np.empty(0, dtype=np.int8), np.empty(0, dtype=np.int64)
+        numbers = np.concatenate(numbers)
+        order = np.argsort(numbers, kind="stable")
+        return np.concatenate(X)[order], np.concatenate(y)[order], numbers[order]
+
+    def cross_validate(self, X, y, numbers, start=None):
+        """Return the accuracy of every purged time-series validation fold.
+
+        ``start`` is passed to :func:`purged_splits`.
+        """
+
+        scores = []
+        for train, test in purged_splits(numbers, self.cv_splits, self.horizon, start):
+            model = self.build_model().fit(X[train], y[train])
+            scores.append(float(model.score(X[test], y[test])))
+        return scores
+
+    def holdout_start(self, numbers):
+        """Return the index of the first sample the current model was not trained on.
+
+        Returns ``None`` when there is no usable model or its training
+        window is unknown, in which case a candidate cannot be compared
+        with it.
+        """
+
+        if not self._model_usable() or not self._trained_until:
+            return None
+        return int(np.searchsorted(numbers, self._trained_until // self.step, side="right"))
+
+    def score_current(self, X, y, numbers, start):
+        """Return the mean accuracy of the current model on the folds after ``start``.
+
+        The folds are the test blocks of :func:`purged_splits` used to
+        validate a candidate on the same samples, all newer than the current
+        model's training window. Returns ``None`` without folds.
+        """
+
+        model = self.predictor
+        scores = [
+            float(np.mean(model.predict(X[test]) == y[test]))
+            for _, test in purged_splits(numbers, self.cv_splits, self.horizon, start)
+        ]
+        return float(np.mean(scores)) if scores else None
+
+    def _beats_current(self, metrics, current):
+        """Return ``True`` if a candidate with ``metrics`` should replace the model.
+
+        ``current`` is the current model's score on the candidate's folds;
+        without it there is nothing out of sample to prefer the candidate on.
+        """
+
+        return current is not None and metrics["cv_mean"] is not None and metrics["cv_mean"] > current
+
+    def retrain(self, dfs):
+        """Train a candidate model and promote it if it beats the current one.
+
+        Each candle is labelled ``1`` when the close ``label_horizon`` candles
+        later is more than ``label_threshold`` above its own close. The model
+        is validated with ``cv_splits`` purged time-series folds and then fit
+        on all labelled candles. Every candidate is stored in the
+        :attr:`registry`. Without a current model of known training window
+        it is promoted directly; otherwise the folds only cover candles newer
+        than that window (see :meth:`holdout_start`) and the candidate is
+        promoted when its mean CV score beats the current model's accuracy on
+        the same folds (see :meth:`score_current`). A promoted model is
+        published to ``model_path`` and swapped in while predictions keep
+        using the previous model until then.
+        """
+
+        self.logger.info(f"Entrenando modelo {'SGD online' if self.online else 'RandomForest'}...")
+        X, y, numbers = self.training_set(dfs)
+        if not len(X):
+            return
+        started = time.perf_counter()
+        # Con modelo actual, ambos se validan solo en muestras posteriores a su entrenamiento
+        start = self.holdout_start(numbers) if self.cv_splits > 0 else None
+        scores = self.cross_validate(X, y, numbers, start) if self.cv_splits > 0 else []
+        current = self.score_current(X, y, numbers, start) if start is not None else None
+        model = self.build_model()
+        model.fit(X, y)
+        metrics = {
+            "training_time": time.perf_counter() - started,
+            "samples": int(len(X)),
+            "cv_scores": scores,
+            "cv_mean": float(np.mean(scores)) if scores else None,
+            "trained_until": int(numbers[-1]) * self.step,
+        }
+        registry = self.registry
+        compact = compact_model(model) if self.use_compact else model
+        version = registry.save(
+            model,
+            {
+                "created_at": time.time(),
+                "window": [int(numbers[0]) * self.step, int(numbers[-1]) * self.step],
+                "features": list(FEATURE_NAMES),
+                "params": model.get_params(),
+                "metrics": metrics,
+            },
+            extra={self.COMPACT_FILE: compact} if isinstance(compact, CompactForest) else None,
+        )
+        if start is None or self._beats_current(metrics, current):
+            registry.promote(version, publish_path=self.model_path)
+            self._compact = (model, compact)
+            self._trained_until = metrics["trained_until"]
+            self.model, self.model_version, self.training = model, version, metrics
+            self.logger.info(
+                f"Modelo entrenado y guardado. Versión: {version} | Muestras: {len(X)} | CV: {metrics['cv_mean']}"
+            )
+        else:
+            self.logger.info(
+                f"Modelo {version} descartado. CV: {metrics['cv_mean']} | actual en los mismos folds: {current}"
+            )
+        # Los datos actuales pasan a ser la referencia aunque se conserve el modelo
+        self.policy.reset(X, self.training.get("cv_mean"))
 
     def stats(self):
         """Return metrics about the current model."""
 
-        return {}
+        return {
+            "strategy": self.strategy_params,
+            "version": self.model_version,
+            **self.training,
+            "retrain": {
+                "cycles": self.policy.cycles,
+                "drift": self.policy.drift(),
+                "live_accuracy": self.policy.accuracy,
+            },
+        }
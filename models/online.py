@@ -0,0 +1,65 @@
+"""Incrementally trained classifier for the online learning mode."""
+
+from __future__ import annotations
+
+import numpy as np
+from sklearn.linear_model import SGDClassifier
+from sklearn.preprocessing import StandardScaler
+
+
+class OnlineModel:
+    """Standardise features and fit a logistic SGD classifier with ``partial_fit``.
+
+    Both the scaler and the classifier learn incrementally, so updating on a
+    batch of new candles costs the same regardless of how much history the
+    model has already seen.
+
+    Parameters
+    ----------
+    **params
+        Keyword arguments for :class:`sklearn.linear_model.SGDClassifier`.
+    """
+
+    classes_ = np.array([0, 1])
+
+    def __init__(self, **params) -> None:
+        params.setdefault("loss", "log_loss")
+        self.params = params
+        self.scaler = StandardScaler()
+        self.classifier = SGDClassifier(**params)
+        self.samples_seen = 0
+
+    @property
+    def n_features_in_(self):
+        return getattr(self.scaler, "n_features_in_", None)
+
+    def partial_fit(self, X, y):
+        """Update the model with one batch of samples."""
+
+        X = np.asarray(X, dtype=np.float64)
+        self.scaler.partial_fit(X)
+        self.classifier.partial_fit(self.scaler.transform(X), y, classes=self.classes_)
+        self.samples_seen += len(X)
+        return self
+
+    def fit(self, X, y, batch_size=10_000):
+        """Train from scratch on ``X`` in batches of ``batch_size`` rows."""
+
+        self.scaler = StandardScaler()
+        self.classifier = SGDClassifier(**self.params)
+        self.samples_seen = 0
+        for start in range(0, len(X), batch_size):
+            self.partial_fit(X[start : start + batch_size], y[start : start + batch_size])
+        return self
+
+    def predict_proba(self, X):
+        return self.classifier.predict_proba(self.scaler.transform(np.asarray(X, dtype=np.float64)))
+
+    def predict(self, X):
+        return self.classes_[np.argmax(self.predict_proba(X), axis=1)]
+
+    def score(self, X, y):
+        return float(np.mean(self.predict(X) == y))
+
+    def get_params(self):
+        return dict(self.params)
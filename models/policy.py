@@ -0,0 +1,245 @@
+"""Decide when the model needs retraining."""
+
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, List
+
+import numpy as np
+
+
+class RunningMoments:
+    """Per-column mean and variance updated incrementally.
+
+    Batches are merged with the parallel form of Welford's algorithm, so the
+    statistics never require keeping past rows. With ``halflife`` (in rows)
+    older rows are weighted down exponentially, so the moments follow recent
+    data instead of averaging everything seen; ``count`` still counts every
+    row and ``weight`` is their decayed total.
+    """
+
+    def __init__(self, n_columns: int, halflife: float | None = None) -> None:
+        self.halflife = halflife
+        self.count = 0
+        self.weight = 0.0
+        self.mean = np.zeros(n_columns)
+        self.m2 = np.zeros(n_columns)
+
+    @property
+    def var(self) -> np.ndarray:
+        return self.m2 / self.weight if self.weight else np.zeros_like(self.m2)
+
+    def update(self, X) -> None:
+        """Add the rows of ``X`` one batch at a time."""
+
+        X = np.atleast_2d(np.asarray(X, dtype=float))
+        if not len(X):
+            return
+        n = len(X)
+        if self.halflife:
+            # Cada fila pesa 0.5 ** (filas posteriores / halflife)
+            weights = 0.5 ** (np.arange(n - 1, -1, -1) / self.halflife)
+            decay = 0.5 ** (n / self.halflife)
+            self.weight *= decay
+            self.m2 = self.m2 * decay
+        else:
+            weights = np.ones(n)
+        batch_weight = weights.sum()
+        batch_mean = weights @ X / batch_weight
+        batch_m2 = weights @ (X - batch_mean) ** 2
+        total = self.weight + batch_weight
+        delta = batch_mean - self.mean
+        self.mean = self.mean + delta * batch_weight / total
+        self.m2 = self.m2 + batch_m2 + delta**2 * self.weight * batch_weight / total
+        self.weight = total
+        self.count += n
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "weight": self.weight,
+            "halflife": self.halflife,
+            "mean": self.mean.tolist(),
+            "m2": self.m2.tolist(),
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "RunningMoments":
+        moments = cls(len(data["mean"]), data.get("halflife"))
+        moments.count = data["count"]
+        moments.weight = data.get("weight", data["count"])
+        moments.mean = np.asarray(data["mean"], dtype=float)
+        moments.m2 = np.asarray(data["m2"], dtype=float)
+        return moments
+
+
+class RetrainPolicy:
+    """Track model age, usage and drift to decide when to retrain.
+
+    A retrain is due when the model is missing, is older than
+    ``retrain_max_age`` seconds, has served ``retrain_max_cycles`` prediction
+    cycles, the live feature means drift more than ``drift_threshold``
+    reference standard deviations from the training data, or the accuracy
+    of the last ``quality_window`` resolved predictions falls
+    ``quality_tolerance`` below the validation score. The live moments decay
+    with a half-life of ``drift_halflife`` rows (``0`` averages every row
+    since the last retrain). No retrain is requested within
+    ``retrain_min_interval`` seconds of the previous one unless the model is
+    missing. Counters and statistics are persisted to ``path`` so they
+    survive restarts. Predictions update the policy from the trading thread
+    while retrains save and reset it from another, so the counters, moments
+    and outcomes are guarded by a lock.
+
+    Parameters
+    ----------
+    config : dict
+        Configuration with the thresholds above.
+    path : str, optional
+        JSON file where the policy state is stored.
+    """
+
+    def __init__(self, config: Dict[str, Any], path: str | None = None) -> None:
+        self.path = path
+        self.max_age = config.get("retrain_max_age", 86400)
+        self.max_cycles = config.get("retrain_max_cycles", 0)
+        self.min_interval = config.get("retrain_min_interval", 600)
+        self.drift_threshold = config.get("drift_threshold", 1.0)
+        self.drift_min_samples = config.get("drift_min_samples", 100)
+        self.drift_halflife = config.get("drift_halflife", 1000)
+        self.quality_window = config.get("quality_window", 200)
+        self.quality_tolerance = config.get("quality_tolerance", 0.1)
+        self.trained_at = None
+        self.cycles = 0
+        self.expected_accuracy = None
+        self.reference = None
+        self.live = None
+        self._outcomes = deque(maxlen=self.quality_window)
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self) -> None:
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path) as f:
+                state = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return
+        self.trained_at = state.get("trained_at")
+        self.cycles = state.get("cycles", 0)
+        self.expected_accuracy = state.get("expected_accuracy")
+        if state.get("reference"):
+            self.reference = RunningMoments.from_dict(state["reference"])
+        if state.get("live"):
+            self.live = RunningMoments.from_dict(state["live"])
+            self.live.halflife = self.drift_halflife
+        self._outcomes.extend(state.get("outcomes", []))
+
+    def save(self) -> None:
+        """Persist counters and statistics to :attr:`path` atomically."""
+
+        if not self.path:
+            return
+        with self._lock:
+            state = {
+                "trained_at": self.trained_at,
+                "cycles": self.cycles,
+                "expected_accuracy": self.expected_accuracy,
+                "reference": self.reference.to_dict() if self.reference else None,
+                "live": self.live.to_dict() if self.live else None,
+                "outcomes": list(self._outcomes),
+            }
+        tmp = self.path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(state, f)
+        os.replace(tmp, self.path)
+
+    def observe_features(self, X) -> None:
+        """Count one prediction cycle and add its feature rows to the live statistics."""
+
+        X = np.atleast_2d(np.asarray(X, dtype=float))
+        with self._lock:
+            self.cycles += 1
+            if not X.size:
+                return
+            if self.live is None:
+                self.live = RunningMoments(X.shape[1], self.drift_halflife)
+            self.live.update(X)
+
+    def observe_outcome(self, correct: bool) -> None:
+        """Record whether a past prediction turned out right."""
+
+        with self._lock:
+            self._outcomes.append(bool(correct))
+
+    @property
+    def accuracy(self) -> float | None:
+        """Accuracy of the resolved predictions in the quality window."""
+
+        with self._lock:
+            return self._accuracy()
+
+    def _accuracy(self) -> float | None:
+        return sum(self._outcomes) / len(self._outcomes) if self._outcomes else None
+
+    def drift(self) -> float:
+        """Largest shift of a live feature mean in reference standard deviations."""
+
+        with self._lock:
+            return self._drift()
+
+    def _drift(self) -> float:
+        if self.reference is None or self.live is None or self.live.count < self.drift_min_samples:
+            return 0.0
+        if len(self.live.mean) != len(self.reference.mean):
+            return np.inf
+        std = np.sqrt(self.reference.var)
+        shift = np.abs(self.live.mean - self.reference.mean)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            scaled = np.where(std > 0, shift / std, np.where(shift > 0, np.inf, 0.0))
+        return float(scaled.max())
+
+    def reasons(self, model_missing: bool = False, now: float | None = None) -> List[str]:
+        """Return why a retrain is due; an empty list means it is not."""
+
+        if model_missing or self.trained_at is None:
+            return ["sin modelo"]
+        now = time.time() if now is None else now
+        if now - self.trained_at < self.min_interval:
+            return []
+        reasons = []
+        if self.max_age and now - self.trained_at >= self.max_age:
+            reasons.append("antigüedad")
+        with self._lock:
+            if self.max_cycles and self.cycles >= self.max_cycles:
+                reasons.append("ciclos")
+            if self._drift() > self.drift_threshold:
+                reasons.append("deriva de features")
+            accuracy = self._accuracy()
+            if (
+                self.expected_accuracy is not None
+                and accuracy is not None
+                and len(self._outcomes) == self.quality_window
+                and accuracy < self.expected_accuracy - self.quality_tolerance
+            ):
+                reasons.append("calidad de predicción")
+        return reasons
+
+    def reset(self, X, expected_accuracy: float | None = None, now: float | None = None) -> None:
+        """Start tracking a freshly trained model whose training features are ``X``."""
+
+        X = np.atleast_2d(np.asarray(X, dtype=float))
+        reference = RunningMoments(X.shape[1])
+        reference.update(X)
+        with self._lock:
+            self.trained_at = time.time() if now is None else now
+            self.cycles = 0
+            self.expected_accuracy = expected_accuracy
+            self.reference = reference
+            self.live = None
+            self._outcomes.clear()
+        self.save()
@@ -0,0 +1,130 @@
+"""Versioned on-disk registry of trained models."""
+
+from __future__ import annotations
+
+import json
+import os
+import shutil
+import tempfile
+from typing import Any, Dict, List, Tuple
+
+import joblib
+
+
+class ModelRegistry:
+    """Store every trained model in its own version directory.
+
+    Each version ``root/vNNNN`` holds ``model.joblib`` and ``metadata.json``
+    and is written to a temporary directory first, then renamed into place.
+    The promoted version is recorded in ``root/CURRENT``, which is replaced
+    atomically, so a reader never observes a half-written model.
+
+    Parameters
+    ----------
+    root : str
+        Directory of the registry, created on the first :meth:`save`.
+    keep : int
+        Number of most recent versions kept besides the promoted one. The
+        newest version is never pruned, so it can still be promoted after
+        :meth:`save` even with ``keep=0``; older ones are pruned again once
+        it is.
+    """
+
+    MODEL_FILE = "model.joblib"
+    METADATA_FILE = "metadata.json"
+
+    def __init__(self, root: str, keep: int = 5) -> None:
+        self.root = root
+        self.keep = keep
+
+    def versions(self) -> List[str]:
+        """Return the stored versions, oldest first."""
+
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(
+            name for name in os.listdir(self.root)
+            if name.startswith("v") and os.path.isdir(os.path.join(self.root, name))
+        )
+
+    def path(self, version: str, filename: str | None = None) -> str:
+        """Return the model file (or another ``filename``) of ``version``."""
+
+        return os.path.join(self.root, version, filename or self.MODEL_FILE)
+
+    def save(self, model: Any, metadata: Dict[str, Any], extra: Dict[str, Any] | None = None) -> str:
+        """Store ``model`` with ``metadata`` as a new version and return its name.
+
+        ``extra`` maps file names to additional objects dumped in the same
+        version directory, such as exported representations of the model.
+        """
+
+        os.makedirs(self.root, exist_ok=True)
+        versions = self.versions()
+        version = f"v{int(versions[-1][1:]) + 1 if versions else 1:04d}"
+        tmp = tempfile.mkdtemp(prefix=".tmp-", dir=self.root)
+        # Sin compresión para que joblib pueda mapear los arrays en memoria
+        joblib.dump(model, os.path.join(tmp, self.MODEL_FILE))
+        for filename, obj in (extra or {}).items():
+            joblib.dump(obj, os.path.join(tmp, filename))
+        with open(os.path.join(tmp, self.METADATA_FILE), "w") as f:
+            json.dump({**metadata, "version": version}, f, default=str)
+        os.replace(tmp, os.path.join(self.root, version))
+        self._prune()
+        return version
+
+    def metadata(self, version: str) -> Dict[str, Any]:
+        """Return the metadata stored with ``version``."""
+
+        with open(os.path.join(self.root, version, self.METADATA_FILE)) as f:
+            return json.load(f)
+
+    def current(self) -> str | None:
+        """Return the promoted version or ``None``."""
+
+        try:
+            with open(os.path.join(self.root, "CURRENT")) as f:
+                version = f.read().strip()
+        except FileNotFoundError:
+            return None
+        return version if os.path.isdir(os.path.join(self.root, version)) else None
+
+    def promote(self, version: str, publish_path: str | None = None) -> None:
+        """Make ``version`` the current model.
+
+        When ``publish_path`` is given the model file is also copied there,
+        replacing the previous file atomically.
+        """
+
+        if publish_path:
+            tmp = publish_path + ".tmp"
+            shutil.copyfile(self.path(version), tmp)
+            os.replace(tmp, publish_path)
+        tmp = os.path.join(self.root, "CURRENT.tmp")
+        with open(tmp, "w") as f:
+            f.write(version)
+        os.replace(tmp, os.path.join(self.root, "CURRENT"))
+        self._prune()
+
+    def load(
+        self, version: str | None = None, mmap: bool = True, filename: str | None = None
+    ) -> Tuple[Any, Dict[str, Any]]:
+        """Return ``(model, metadata)`` of ``version`` (the current one by default).
+
+        With ``mmap`` the model's arrays are memory-mapped read-only instead
+        of copied into memory, which keeps loading large forests fast.
+        ``filename`` selects one of the ``extra`` files instead of the model.
+        """
+
+        version = version or self.current()
+        if version is None:
+            raise FileNotFoundError("No hay versión promovida en el registro")
+        model = joblib.load(self.path(version, filename), mmap_mode="r" if mmap else None)
+        return model, self.metadata(version)
+
+    def _prune(self) -> None:
+        current = self.current()
+        # La versión más reciente cuenta dentro de keep pero nunca se borra
+        old = [v for v in self.versions()[:-1] if v != current]
+        for version in old[: max(0, len(old) - max(self.keep - 1, 0))]:
+            shutil.rmtree(os.path.join(self.root, version), ignore_errors=True)
@@ -8,8 +8,17 @@ from typing import Any, List, Dict
 from strategy import StrategyVariant
 
 
-def gather_metrics(trader: Any, model_manager: Any, variants: List[StrategyVariant] | None = None) -> Dict[str, Any]:
-    """Collect metrics from core components for serialization."""
+def gather_metrics(
+    trader: Any,
+    model_manager: Any,
+    variants: List[StrategyVariant] | None = None,
+    backtest: Dict[str, Any] | None = None,
+) -> Dict[str, Any]:
+    """Collect metrics from core components for serialization.
+
+    ``backtest`` holds backtester counters such as fitness cache hits and
+    misses.
+    """
     data = {
         "trader": trader.stats(),
         "model": model_manager.stats(),
@@ -23,6 +32,8 @@ def gather_metrics(trader: Any, model_manager: Any, variants: List[StrategyVaria
             }
             for v in variants
         ]
+    if backtest:
+        data["backtest"] = backtest
     return data
 
 
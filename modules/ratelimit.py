@@ -0,0 +1,58 @@
+"""Client-side rate limiting for exchange API requests."""
+
+from __future__ import annotations
+
+import threading
+import time
+
+
+class RateLimiter:
+    """Thread-safe token bucket measured in Binance request weight.
+
+    Parameters
+    ----------
+    capacity : int
+        Maximum weight that may be spent during ``period`` seconds.
+    period : float, optional
+        Length of the budget window in seconds, by default one minute.
+    """
+
+    def __init__(self, capacity: int, period: float = 60.0) -> None:
+        self.capacity = float(capacity)
+        self.period = float(period)
+        self.rate = self.capacity / self.period
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self.updated
+        self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+        self.updated = now
+
+    def acquire(self, weight: int = 1) -> float:
+        """Block until ``weight`` can be spent and return the time waited."""
+
+        weight = min(float(weight), self.capacity)
+        waited = 0.0
+        while True:
+            with self._lock:
+                self._refill(time.monotonic())
+                if self.tokens >= weight:
+                    self.tokens -= weight
+                    return waited
+                delay = (weight - self.tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+    def sync(self, used: int) -> None:
+        """Align the bucket with the weight the exchange reports as used.
+
+        Binance returns the weight consumed in the current window in the
+        ``X-MBX-USED-WEIGHT-1M`` header; other clients sharing the same IP
+        also count towards it, so the local budget is lowered accordingly.
+        """
+
+        with self._lock:
+            self._refill(time.monotonic())
+            self.tokens = min(self.tokens, max(0.0, self.capacity - float(used)))
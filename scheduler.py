@@ -0,0 +1,87 @@
+"""Asyncio scheduler running each bot stage on its own cadence."""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, List
+
+
+class Scheduler:
+    """Run periodic and event-triggered stages concurrently.
+
+    Stages are plain blocking callables executed in worker threads, so a slow
+    stage (retraining, backtesting) never delays the others. A stage never
+    overlaps with itself and an exception raised by one run is logged without
+    stopping the scheduler.
+
+    Parameters
+    ----------
+    logger : logging.Logger
+        Logger used to report stage failures.
+    """
+
+    def __init__(self, logger) -> None:
+        self.logger = logger
+        self._factories: List[Callable[[], Awaitable[Any]]] = []
+        self._tasks: List[asyncio.Task] = []
+        self._stopping = False
+
+    async def _call(self, name: str, func: Callable[[], Any]) -> None:
+        try:
+            await asyncio.to_thread(func)
+        except Exception:
+            self.logger.exception(f"Error en la etapa '{name}'")
+
+    def every(self, name: str, interval: float, func: Callable[[], Any], delay: float = 0.0) -> None:
+        """Run ``func`` every ``interval`` seconds, starting after ``delay`` seconds."""
+
+        async def loop() -> None:
+            next_run = time.monotonic() + delay
+            await asyncio.sleep(delay)
+            while True:
+                await self._call(name, func)
+                next_run += interval
+                # Si la etapa tardó más que su intervalo no se acumulan ejecuciones
+                next_run = max(next_run, time.monotonic())
+                await asyncio.sleep(next_run - time.monotonic())
+
+        self._factories.append(loop)
+
+    def on(self, name: str, event: asyncio.Event, func: Callable[[], Any]) -> None:
+        """Run ``func`` whenever ``event`` is set, coalescing repeated triggers."""
+
+        async def loop() -> None:
+            while True:
+                await event.wait()
+                event.clear()
+                await self._call(name, func)
+
+        self._factories.append(loop)
+
+    def add(self, coro_factory: Callable[[], Awaitable[Any]]) -> None:
+        """Run the coroutine returned by ``coro_factory`` alongside the stages."""
+
+        self._factories.append(coro_factory)
+
+    async def run(self) -> None:
+        """Run every registered stage until :meth:`stop` is called."""
+
+        self._stopping = False
+        self._tasks = [asyncio.create_task(factory()) for factory in self._factories]
+        try:
+            await asyncio.gather(*self._tasks)
+        except asyncio.CancelledError:
+            # Solo se absorbe la cancelación pedida con stop()
+            if not self._stopping:
+                raise
+        finally:
+            for task in self._tasks:
+                task.cancel()
+
+    def stop(self) -> None:
+        """Cancel every running stage."""
+
+        self._stopping = True
+        for task in self._tasks:
+            task.cancel()
@@ -0,0 +1,192 @@
+import asyncio
+import json
+
+import pytest
+from websockets.asyncio.server import serve
+
+from trading.account import AccountState, UserDataStream
+from trading.live import Trader
+
+
+def _report(status, execution, trade_id=None, last_qty=0, last_price=0, side="BUY", client_id="a1"):
+    return {
+        "e": "executionReport",
+        "s": "BTCUSDT",
+        "c": client_id,
+        "C": "",
+        "S": side,
+        "o": "LIMIT",
+        "q": "2",
+        "p": "100",
+        "X": status,
+        "x": execution,
+        "i": 1,
+        "l": str(last_qty),
+        "L": str(last_price),
+        "z": "0",
+        "Z": "0",
+        "n": "0",
+        "N": "USDT",
+        "t": trade_id if trade_id is not None else -1,
+        "T": 0,
+    }
+
+
+def test_execution_reports_track_orders_fills_and_positions():
+    account = AccountState()
+    account.handle_event(_report("NEW", "NEW"))
+    assert list(account.open_orders) == ["a1"]
+    account.handle_event(_report("PARTIALLY_FILLED", "TRADE", 1, 1, 100))
+    account.handle_event(_report("FILLED", "TRADE", 2, 1, 110))
+    # Un evento repetido no vuelve a contar
+    account.handle_event(_report("FILLED", "TRADE", 2, 1, 110))
+    assert account.open_orders == {}
+    assert account.filled_orders == 1
+    assert len(account.fills) == 2
+    assert account.positions["BTCUSDT"]["qty"] == pytest.approx(2)
+    assert account.positions["BTCUSDT"]["avg_price"] == pytest.approx(105)
+    account.handle_event(_report("FILLED", "TRADE", 3, 2, 120, side="SELL", client_id="a2"))
+    assert account.positions["BTCUSDT"]["realized_pnl"] == pytest.approx(30)
+    assert account.snapshot()["positions"] == {}
+
+
+def test_reconcile_replaces_state_and_ignores_older_events():
+    account = AccountState()
+    account.handle_event(_report("NEW", "NEW", client_id="gone"))
+    account.reconcile(
+        {"updateTime": 1000, "balances": [{"asset": "USDT", "free": "50", "locked": "5"}]},
+        [{"clientOrderId": "open", "symbol": "BTCUSDT", "side": "SELL", "status": "NEW", "origQty": "1"}],
+    )
+    assert list(account.open_orders) == ["open"]
+    account.handle_event({"e": "balanceUpdate", "a": "USDT", "d": "10", "T": 900})
+    assert account.balance("USDT") == 50
+    account.handle_event({"e": "balanceUpdate", "a": "USDT", "d": "10", "T": 1100})
+    account.handle_event(
+        {"e": "outboundAccountPosition", "u": 1200, "B": [{"a": "BTC", "f": "0.1", "l": "0"}]}
+    )
+    assert account.balance("USDT") == 60
+    assert account.snapshot()["balances"]["BTC"] == {"free": 0.1, "locked": 0.0}
+
+
+class _FakeClient:
+    def __init__(self):
+        self.keys = 0
+        self.snapshots = 0
+        self.closed = []
+        self.trades = []
+        self.trade_requests = []
+
+    def create_listen_key(self):
+        self.keys += 1
+        return f"key{self.keys}"
+
+    def keepalive_listen_key(self, listen_key):
+        pass
+
+    def close_listen_key(self, listen_key):
+        self.closed.append(listen_key)
+
+    def account(self):
+        self.snapshots += 1
+        return {"updateTime": 0, "balances": [{"asset": "USDT", "free": "100", "locked": "0"}]}
+
+    def open_orders(self):
+        return []
+
+    def my_trades(self, symbol, from_id=None, start_time=None):
+        self.trade_requests.append((symbol, from_id))
+        return [t for t in self.trades if t["symbol"] == symbol and (from_id is None or t["id"] >= from_id)]
+
+
+def test_user_stream_applies_events_and_reconciles_on_reconnect(memory_logger):
+    logger, stream_log = memory_logger
+    client = _FakeClient()
+    account = AccountState()
+    updates = []
+    paths = []
+
+    async def handler(ws):
+        paths.append(ws.request.path)
+        if len(paths) == 1:
+            await ws.send(json.dumps(_report("FILLED", "TRADE", 1, 0.5, 100)))
+            await ws.send(json.dumps({"e": "listenKeyExpired", "E": 1}))
+            # Fill ejecutado mientras el stream está caído
+            client.trades.append({
+                "symbol": "BTCUSDT", "id": 2, "isBuyer": True, "qty": "0.25", "price": "130",
+                "commission": "0", "commissionAsset": "USDT", "time": 2,
+            })
+            await ws.wait_closed()
+            return
+        await ws.send(json.dumps({
+            "e": "outboundAccountPosition", "u": 5, "B": [{"a": "USDT", "f": "50", "l": "0"}]
+        }))
+        await ws.wait_closed()
+
+    async def scenario():
+        async with serve(handler, "127.0.0.1", 0) as server:
+            port = server.sockets[0].getsockname()[1]
+            config = {"user_stream_url": f"ws://127.0.0.1:{port}", "stream_reconnect_delay": 0.01}
+            user_stream = UserDataStream(
+                config, logger, client, account, on_update=lambda: updates.append(account.balance("USDT"))
+            )
+            task = asyncio.create_task(user_stream.run())
+            while account.balance("USDT") != 50:
+                await asyncio.sleep(0.01)
+            await user_stream.stop()
+            await task
+
+    asyncio.run(asyncio.wait_for(scenario(), timeout=10))
+
+    assert paths == ["/ws/key1", "/ws/key2"]
+    assert client.snapshots == 2
+    assert updates == [100, 100, 50]
+    assert client.trade_requests == [("BTCUSDT", 2)]
+    assert account.positions["BTCUSDT"]["qty"] == pytest.approx(0.75)
+    assert account.positions["BTCUSDT"]["avg_price"] == pytest.approx(110)
+    assert account.last_trade_id("BTCUSDT") == 2
+    assert client.closed == ["key2"]
+    assert "listenKey expirada" in stream_log.getvalue()
+    assert "1 fills recuperados" in stream_log.getvalue()
+
+
+def test_trader_balance_follows_exchange_minus_reservations(memory_logger):
+    logger, _ = memory_logger
+    trader = Trader({"balance": 100}, logger)
+    trader._prepare({"symbol": "BTCUSDT", "side": "BUY", "price": 100, "usdt_amount": 20})
+    trader.sync_balance()
+    assert trader.balance == 80
+    trader.account.reconcile({"balances": [{"asset": "USDT", "free": "70", "locked": "0"}]}, [])
+    trader.sync_balance()
+    assert trader.balance == 50
+    assert trader.trades == 0
+
+
+class _FilledClient:
+    def meets_minimum(self, symbol, quantity=None, notional=None):
+        return True
+
+    def place_order(self, symbol, side, quote_quantity=None, quantity=None):
+        return {"status": "FILLED", "executedQty": "0.2", "cummulativeQuoteQty": str(quote_quantity)}
+
+
+def test_fill_seen_by_stream_before_settlement_is_counted_once(memory_logger):
+    logger, _ = memory_logger
+    trader = Trader({"balance": 50}, logger)
+    trader.client = _FilledClient()
+    trader.account.reconcile({"balances": [{"asset": "USDT", "free": "100", "locked": "0"}]}, [])
+    order = trader._prepare({"symbol": "BTCUSDT", "side": "BUY", "price": 100, "usdt_amount": 20})
+    # El presupuesto configurado limita el saldo aunque el exchange tenga más
+    assert trader.balance == 30
+    # El stream refleja el fill antes de que la orden se liquide
+    trader.account.handle_event(
+        {"e": "outboundAccountPosition", "u": 1, "B": [{"a": "USDT", "f": "80", "l": "0"}]}
+    )
+    trader.sync_balance()
+    trader._submit(order)
+    assert trader.balance == 30
+    assert trader.trades == 1
+    trader.account.handle_event(
+        {"e": "outboundAccountPosition", "u": 2, "B": [{"a": "USDT", "f": "10", "l": "0"}]}
+    )
+    trader.sync_balance()
+    assert trader.balance == 10
@@ -0,0 +1,108 @@
+import pandas as pd
+
+from data_feed.backfill import find_missing_ranges
+from data_feed.downloader import DataFeed
+from data_feed.storage import KLINE_COLUMNS
+
+MINUTE = 60000
+
+
+def test_find_missing_ranges_detects_head_gaps_and_tail():
+    times = [2 * MINUTE, 3 * MINUTE, 6 * MINUTE, 7 * MINUTE]
+    ranges = find_missing_ranges(times, 0, 9 * MINUTE, MINUTE)
+    assert ranges == [
+        (0, 1 * MINUTE),
+        (4 * MINUTE, 5 * MINUTE),
+        (8 * MINUTE, 9 * MINUTE),
+    ]
+    assert find_missing_ranges([], 0, 2 * MINUTE, MINUTE) == [(0, 2 * MINUTE)]
+
+
+class FakeExchange:
+    """Serve 1m klines from ``listed`` onwards, failing on demand."""
+
+    def __init__(self, listed):
+        self.listed = listed
+        self.requests = []
+        self.fail_after = None
+
+    def fetch(self, symbol, limit=1000, start_time=None, end_time=None):
+        self.requests.append((start_time, end_time))
+        if self.fail_after is not None and len(self.requests) > self.fail_after:
+            return pd.DataFrame()
+        first = max(start_time, self.listed) // MINUTE
+        last = min(end_time // MINUTE, first + limit - 1)
+        rows = [
+            [m * MINUTE, m, m, m, m, 1, m * MINUTE + MINUTE - 1, 1, 1, 1, 1, 0]
+            for m in range(first, last + 1)
+        ]
+        df = pd.DataFrame(rows, columns=KLINE_COLUMNS)
+        df["open_time"] = pd.to_datetime(df["open_time"], unit="ms")
+        df["close_time"] = pd.to_datetime(df["close_time"], unit="ms")
+        df["symbol"] = symbol
+        return df
+
+
+def test_backfill_resumes_and_skips_unlisted_range(tmp_path, memory_logger, monkeypatch):
+    logger, _ = memory_logger
+    config = {
+        "api_url": "",
+        "symbols": ["AAA"],
+        "interval": "1m",
+        "storage": "numpy",
+        "data_dir": str(tmp_path),
+        "kline_limit": 10,
+        "backfill_flush_pages": 2,
+    }
+    feed = DataFeed(config, logger)
+    exchange = FakeExchange(listed=20 * MINUTE)
+    monkeypatch.setattr(feed, "_fetch_binance_klines", exchange.fetch)
+    end = 99 * MINUTE
+    days = 99 * MINUTE / 86_400_000
+
+    # The connection drops after three pages; flushed pages must survive
+    exchange.fail_after = 3
+    feed.backfill(days=days, end=end)
+    stored = feed.store.load_records("AAA")["open_time"]
+    assert len(stored) == 30
+    assert stored[0] == 20 * MINUTE
+
+    exchange.fail_after = None
+    exchange.requests.clear()
+    counts = feed.backfill(days=days, end=end)
+    assert counts == {"AAA": 50}
+    # Resumes after the stored candles and never asks for the unlisted range
+    assert exchange.requests[0][0] == 50 * MINUTE
+    stored = feed.store.load_records("AAA")["open_time"]
+    assert stored.tolist() == list(range(20 * MINUTE, 100 * MINUTE, MINUTE))
+    assert len(feed.history()[0]) == 80
+
+    exchange.requests.clear()
+    assert feed.backfill(days=days, end=end) == {"AAA": 0}
+    assert exchange.requests == []
+
+
+def test_backfill_merges_older_history_once(tmp_path, memory_logger, monkeypatch):
+    logger, _ = memory_logger
+    config = {
+        "api_url": "",
+        "symbols": ["AAA"],
+        "interval": "1m",
+        "storage": "csv",
+        "data_dir": str(tmp_path),
+        "kline_limit": 10,
+        "backfill_flush_pages": 1,
+    }
+    feed = DataFeed(config, logger)
+    exchange = FakeExchange(listed=0)
+    monkeypatch.setattr(feed, "_fetch_binance_klines", exchange.fetch)
+    feed.store.write("AAA", exchange.fetch("AAA", start_time=50 * MINUTE, end_time=59 * MINUTE))
+    merged = []
+    merge = feed.store.merge
+    monkeypatch.setattr(feed.store, "merge", lambda symbol, df: (merged.append(len(df)), merge(symbol, df)))
+
+    feed.backfill(days=69 * MINUTE / 86_400_000, end=69 * MINUTE)
+    # El histórico anterior se inserta de una vez; lo posterior a la cola se añade por páginas
+    assert merged == [50, 10]
+    stored = feed.store.load_records("AAA")["open_time"]
+    assert stored.tolist() == list(range(0, 70 * MINUTE, MINUTE))
@@ -1,4 +1,11 @@
-from backtest.engine import Backtester
+import numpy as np
+import pandas as pd
+import pytest
+
+from backtest.cache import FitnessCache
+from backtest.engine import Backtester, evaluate, stochastic_k
+from data_feed.storage import open_store
+from strategy import StrategyVariant
 
 
 def test_backtester_run_logs_message(memory_logger):
@@ -7,3 +14,221 @@ def test_backtester_run_logs_message(memory_logger):
     bt.run()
     log = stream.getvalue()
     assert "Iniciando backtest" in log
+
+
+def _candles(close):
+    close = np.asarray(close, dtype=float)
+    return pd.DataFrame({"close": close, "high": close, "low": close})
+
+
+def test_evaluate_round_trip_metrics():
+    close = np.array([100.0, 110.0, 121.0, 100.0, 100.0])
+    position = np.array([True, True, False, False, False])
+    metrics = evaluate(close, position, commission_pct=0.0)
+    assert metrics["roi"] == pytest.approx(0.21)
+    assert metrics["trades"] == 1
+    assert metrics["winrate"] == 1.0
+    assert metrics["drawdown"] == 0.0
+
+    with_fees = evaluate(close, position, commission_pct=0.01)
+    assert with_fees["roi"] == pytest.approx(0.99 * 1.1 * 1.1 * 0.99 - 1)
+
+
+def test_back_to_back_trades_split_commission_at_the_boundary():
+    close = np.array([100.0, 100.0, 102.5, 102.5, 100.0])
+    # Sale al cierre de la vela 2 y vuelve a entrar al cierre de la 3
+    position = np.array([True, True, False, True, True])
+    metrics = evaluate(close, position, 0.01, entry=close.copy(), exit=close.copy())
+    # 1.025 * 0.99 ** 2 gana; la comisión de la segunda entrada no es suya
+    assert metrics["trades"] == 2
+    assert metrics["winrate"] == 0.5
+    assert metrics["roi"] == pytest.approx(1.025 * 0.99**3 - 1)
+
+    exit = close.copy()
+    exit[3] = 110.0
+    metrics = evaluate(close, position, 0.01, entry=close.copy(), exit=exit)
+    # La ganancia del fill de salida pertenece a la primera operación
+    assert metrics["winrate"] == 0.5
+    assert metrics["roi"] == pytest.approx(1.1 * 0.99**3 - 1)
+
+
+def test_backtester_replays_candles_per_variant(memory_logger):
+    logger, _ = memory_logger
+    bt = Backtester({"commission_pct": 0.0}, logger)
+    rising = _candles(np.linspace(100, 200, 50))
+    always_in = StrategyVariant({"threshold": -1.0, "window": 3})
+    never_in = StrategyVariant({"threshold": 2.0, "window": 3})
+    results = bt.run([always_in, never_in], data={"AAA": rising})
+    assert results[id(always_in)]["roi"] > 0.9
+    assert results[id(never_in)] == {"roi": 0.0, "winrate": 0.0, "drawdown": 0.0, "trades": 0}
+    assert always_in.history[-1] is results[id(always_in)]
+
+
+def test_backtester_loads_stored_candles(tmp_path, memory_logger):
+    logger, stream = memory_logger
+    config = {"symbols": ["AAA"], "storage": "numpy", "data_dir": str(tmp_path)}
+    assert Backtester(config, logger).run([StrategyVariant({"threshold": 0.5})]) == {}
+    assert "Sin velas" in stream.getvalue()
+
+    store = open_store(config)
+    close = np.linspace(100, 110, 30)
+    store.write(
+        "AAA",
+        pd.DataFrame(
+            {
+                "open_time": np.arange(30) * 60000,
+                "open": close,
+                "high": close,
+                "low": close,
+                "close": close,
+                "volume": 1.0,
+                "close_time": np.arange(30) * 60000 + 59999,
+                "quote_asset_volume": 1.0,
+                "number_of_trades": 1,
+                "taker_buy_base": 1.0,
+                "taker_buy_quote": 1.0,
+            }
+        ),
+    )
+    variant = StrategyVariant({"threshold": 0.5})
+    results = Backtester(config, logger).run([variant])
+    assert results[id(variant)]["trades"] == 1
+
+
+def test_population_batch_matches_single_variant_evaluation(memory_logger):
+    logger, _ = memory_logger
+    rng = np.random.default_rng(1)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, 400)))
+    df = pd.DataFrame({"close": close, "high": close * 1.002, "low": close * 0.998})
+    variants = [
+        StrategyVariant({"threshold": float(t), "window": int(w)})
+        for t, w in zip(rng.random(12), rng.choice([5, 14], 12))
+    ]
+    # A tiny budget forces several chunks per window group
+    bt = Backtester({"backtest_chunk_cells": 1000}, logger)
+    results = bt.run(variants, data={"AAA": df})
+    for variant in variants:
+        window = variant.params["window"]
+        score = stochastic_k(close, df["high"].to_numpy(), df["low"].to_numpy(), window)
+        position = np.nan_to_num(score, nan=-np.inf) > variant.params["threshold"]
+        expected = evaluate(close, position, bt.commission_pct)
+        got = results[id(variant)]
+        assert got["roi"] == pytest.approx(expected["roi"])
+        assert got["drawdown"] == pytest.approx(expected["drawdown"])
+        assert got["trades"] == expected["trades"]
+        assert got["winrate"] == pytest.approx(expected["winrate"])
+
+
+def test_parallel_backtest_matches_serial(memory_logger):
+    logger, _ = memory_logger
+    rng = np.random.default_rng(2)
+    data = {}
+    for symbol in ("AAA", "BBB"):
+        close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, 300)))
+        data[symbol] = pd.DataFrame({"close": close, "high": close * 1.001, "low": close * 0.999})
+    thresholds = rng.random(7)
+    serial = [StrategyVariant({"threshold": float(t)}) for t in thresholds]
+    parallel = [StrategyVariant({"threshold": float(t)}) for t in thresholds]
+
+    expected = Backtester({}, logger).run(serial, data=data)
+    bt = Backtester({"backtest_workers": 2}, logger)
+    try:
+        got = bt.run(parallel, data=data)
+    finally:
+        bt.close()
+    for a, b in zip(serial, parallel):
+        assert got[id(b)] == pytest.approx(expected[id(a)])
+
+
+def test_fitness_cache_skips_unchanged_variants(tmp_path, memory_logger):
+    logger, _ = memory_logger
+    config = {"commission_pct": 0.0, "population_path": str(tmp_path / "population.json")}
+    bt = Backtester(config, logger)
+    data = {"AAA": _candles(np.linspace(100, 200, 50))}
+    survivor = StrategyVariant({"threshold": 0.3, "window": 3})
+    clone = StrategyVariant({"threshold": 0.3, "window": 3})
+    first = bt.run([survivor, clone], data=data)
+    assert bt.stats() == {"cache_hits": 0, "cache_misses": 1, "cache_size": 1}
+    assert first[id(survivor)] == first[id(clone)]
+    assert first[id(survivor)] is not first[id(clone)]
+
+    again = bt.run([survivor], data=data)
+    assert again[id(survivor)] == first[id(survivor)]
+    assert bt.stats()["cache_hits"] == 1
+
+    # Una vela nueva cambia la huella de los datos
+    data = {"AAA": _candles(np.linspace(100, 200, 51))}
+    bt.run([survivor], data=data)
+    assert bt.stats()["cache_misses"] == 2
+
+    restarted = Backtester(config, logger)
+    assert (tmp_path / "fitness_cache.json").exists()
+    restarted.run([StrategyVariant({"threshold": 0.3, "window": 3})], data=data)
+    assert restarted.stats() == {"cache_hits": 1, "cache_misses": 0, "cache_size": 2}
+
+
+def test_fitness_cache_evicts_least_recently_used():
+    cache = FitnessCache(max_entries=2)
+    cache.put("a", {"roi": 1.0})
+    cache.put("b", {"roi": 2.0})
+    assert cache.get("a") == {"roi": 1.0}
+    cache.put("c", {"roi": 3.0})
+    assert cache.get("b") is None
+    assert cache.get("a") == {"roi": 1.0}
+    assert cache.stats() == {"cache_hits": 2, "cache_misses": 1, "cache_size": 2}
+
+
+def test_walk_forward_windows_and_incremental_update(memory_logger):
+    logger, _ = memory_logger
+    config = {"commission_pct": 0.0, "walk_forward_train": 20, "walk_forward_test": 10}
+    bt = Backtester(config, logger)
+    rng = np.random.default_rng(3)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, 75)))
+    df = pd.DataFrame(
+        {"open_time": np.arange(75) * 60000, "close": close, "high": close, "low": close}
+    )
+    variants = [StrategyVariant({"threshold": 0.5, "window": 5}), StrategyVariant({"threshold": -1.0, "window": 1})]
+    results = bt.run(variants, data={"AAA": df.iloc[:74]})
+    windows = results[id(variants[1])]["windows"]
+    # Ventanas de test alineadas: [20, 30), ..., [70, 80) todavía abierta
+    assert [w["start"] for w in windows] == [20, 30, 40, 50, 60, 70]
+    # Siempre dentro: el ROI de cada ventana es el del precio en esa ventana
+    assert windows[0]["test"]["roi"] == pytest.approx(close[29] / close[19] - 1)
+    assert windows[0]["train"]["roi"] == pytest.approx(close[19] / close[0] - 1)
+    assert results[id(variants[1])]["roi"] == pytest.approx(close[73] / close[19] - 1)
+    assert variants[1].history[-1] == {k: v for k, v in results[id(variants[1])].items() if k != "windows"}
+
+    # Una vela nueva solo invalida el test de la ventana abierta
+    misses = bt.stats()["cache_misses"]
+    bt.run(variants, data={"AAA": df})
+    assert bt.stats()["cache_misses"] - misses == len(variants)
+
+
+def test_walk_forward_reuses_windows_without_fitness_cache(memory_logger):
+    logger, _ = memory_logger
+    config = {
+        "commission_pct": 0.0,
+        "walk_forward_train": 20,
+        "walk_forward_test": 10,
+        "fitness_cache_size": 0,
+    }
+    bt = Backtester(config, logger)
+    assert bt.cache is None
+    rng = np.random.default_rng(5)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, 75)))
+    df = pd.DataFrame(
+        {"open_time": np.arange(75) * 60000, "close": close, "high": close, "low": close}
+    )
+    variants = [StrategyVariant({"threshold": 0.5, "window": 5}), StrategyVariant({"threshold": 0.2, "window": 3})]
+    first = bt.run(variants, data={"AAA": df.iloc[:74]})
+    evaluated = []
+    metrics = bt._metrics
+    bt._metrics = lambda subset, segments: (evaluated.append(len(subset)), metrics(subset, segments))[1]
+
+    second = bt.run(variants, data={"AAA": df})
+    # Solo el test de la ventana abierta se vuelve a evaluar
+    assert evaluated == [len(variants)]
+    for variant in variants:
+        old, new = first[id(variant)]["windows"], second[id(variant)]["windows"]
+        assert new[:-1] == old[:-1]
+        assert new[-1]["train"] == old[-1]["train"]
@@ -0,0 +1,29 @@
+import numpy as np
+
+from data_feed.buffer import CandleBuffer
+from data_feed.storage import RECORD_DTYPE
+
+
+def _records(times, close=None):
+    records = np.zeros(len(times), dtype=RECORD_DTYPE)
+    records["open_time"] = times
+    records["close"] = times if close is None else close
+    return records
+
+
+def test_buffer_wraps_and_keeps_order():
+    buffer = CandleBuffer(4)
+    buffer.extend(_records([1, 2, 3]))
+    buffer.extend(_records([4, 5, 6]))
+    assert len(buffer) == 4
+    assert buffer.to_records()["open_time"].tolist() == [3, 4, 5, 6]
+    assert buffer.last_open_time() == 6
+
+
+def test_buffer_replaces_open_candle_and_ignores_old_rows():
+    buffer = CandleBuffer(10)
+    buffer.extend(_records([1, 2, 3]))
+    buffer.extend(_records([2, 3, 4], close=[20, 30, 40]))
+    records = buffer.to_records()
+    assert records["open_time"].tolist() == [1, 2, 3, 4]
+    assert records["close"].tolist() == [1, 2, 30, 40]
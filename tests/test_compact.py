@@ -0,0 +1,38 @@
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier
+
+from models.compact import CompactForest, compact_model
+from models.manager import ModelManager
+
+
+def test_compact_forest_matches_sklearn():
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(2000, 5))
+    y = (X[:, 0] + X[:, 1] * X[:, 2] + rng.normal(scale=0.5, size=2000) > 0).astype(int)
+    model = RandomForestClassifier(n_estimators=15, random_state=0).fit(X, y)
+    compact = compact_model(model)
+    assert isinstance(compact, CompactForest)
+    # Valores en float64 muy cerca de los umbrales ejercitan el redondeo a float32
+    X_test = np.vstack([rng.normal(size=(300, 5)), np.tile(model.estimators_[0].tree_.threshold[:5], (5, 1))])
+    np.testing.assert_allclose(compact.predict_proba(X_test), model.predict_proba(X_test), rtol=0, atol=1e-12)
+    np.testing.assert_array_equal(compact.predict(X_test), model.predict(X_test))
+    np.testing.assert_array_equal(compact.classes_, model.classes_)
+    assert compact_model(compact) is compact
+
+
+def test_manager_scores_with_compact_model(tmp_path, memory_logger):
+    logger, _ = memory_logger
+    config = {"model_params": {"n_estimators": 3}, "n_jobs": 1, "buy_threshold": 0.0}
+    mm = ModelManager(config, logger)
+    mm.model_path = str(tmp_path / "model.pkl")
+    close = 100 * np.exp(np.cumsum(np.random.default_rng(1).normal(0, 0.01, 100)))
+    df = pd.DataFrame({"open_time": np.arange(100) * 60000, "close": close, "symbol": "AAA"})
+    mm.retrain([df])
+    assert isinstance(mm.predictor, CompactForest)
+    assert len(mm.predict([df])) == 1
+    assert (tmp_path / "model_registry" / "v0001" / "compact.joblib").exists()
+
+    restarted = ModelManager({**config, "model_registry": str(tmp_path / "model_registry")}, logger)
+    assert isinstance(restarted.model, CompactForest)
+    assert not restarted.need_retrain()
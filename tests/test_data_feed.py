@@ -1,4 +1,5 @@
 import os
+import threading
 import pandas as pd
 import requests
 from data_feed.downloader import DataFeed
@@ -22,7 +23,7 @@ def test_fetch_binance_klines_error(monkeypatch, memory_logger):
     def fake_get(*args, **kwargs):
         raise requests.RequestException("fail")
 
-    monkeypatch.setattr(requests, "get", fake_get)
+    monkeypatch.setattr(requests.Session, "get", fake_get)
     df = feed._fetch_binance_klines("BTCUSDT")
     assert df.empty
     assert "Error descargando velas" in stream.getvalue()
@@ -61,7 +62,7 @@ def test_update_and_latest_data_include_symbol(tmp_path, memory_logger, monkeypa
 
 
 def test_update_creates_csv_from_request(tmp_path, memory_logger, monkeypatch):
-    """DataFeed.update should save klines returned via requests.get."""
+    """DataFeed.update should save klines returned by the HTTP session."""
     logger, _ = memory_logger
     config = {"api_url": "http://test", "symbols": ["BBB"], "interval": "1m"}
     feed = DataFeed(config, logger)
@@ -90,7 +91,7 @@ def test_update_creates_csv_from_request(tmp_path, memory_logger, monkeypatch):
         def json(self):
             return sample_payload
 
-    monkeypatch.setattr(requests, "get", lambda *a, **k: FakeResponse())
+    monkeypatch.setattr(requests.Session, "get", lambda *a, **k: FakeResponse())
 
     feed.update()
     file_path = tmp_path / "BBB_1m.csv"
@@ -148,3 +149,148 @@ def test_env_file_overrides_config(tmp_path, memory_logger, monkeypatch):
     feed = DataFeed(config, logger)
     assert feed.api_key == "envkey"
     assert feed.api_secret == "envsecret"
+
+
+def _kline_rows(start, count):
+    return [
+        [
+            (start + i) * 60000,
+            str(100 + start + i),
+            "2",
+            "0.5",
+            "1.5",
+            "100",
+            (start + i) * 60000 + 59999,
+            "200",
+            10,
+            "50",
+            "75",
+            "0",
+        ]
+        for i in range(count)
+    ]
+
+
+def test_update_incremental_appends_new_candles(tmp_path, memory_logger, monkeypatch):
+    """Subsequent updates should request only new candles and replace the open one."""
+    logger, _ = memory_logger
+    config = {"api_url": "http://test", "symbols": ["INC"], "interval": "1m"}
+    monkeypatch.chdir(tmp_path)
+    requested = []
+    now = {"minute": 5}
+
+    class FakeResponse:
+        status_code = 200
+
+        def __init__(self, payload):
+            self.payload = payload
+
+        def json(self):
+            return self.payload
+
+    def fake_get(session, url, params=None, timeout=None):
+        requested.append(dict(params))
+        start = params.get("startTime")
+        if start is None:
+            return FakeResponse(_kline_rows(0, now["minute"]))
+        first = start // 60000
+        return FakeResponse(_kline_rows(first, now["minute"] - first))
+
+    monkeypatch.setattr(requests.Session, "get", fake_get)
+    DataFeed(config, logger).update()
+    now["minute"] = 7
+    # A fresh instance must resume from the file written by the previous one
+    DataFeed(config, logger).update()
+
+    assert "startTime" not in requested[0]
+    assert requested[1]["startTime"] == 4 * 60000
+    df = pd.read_csv(tmp_path / "INC_1m.csv")
+    assert len(df) == 7
+    assert df["open_time"].is_unique
+    assert df["open"].tolist() == list(range(100, 107))
+
+
+def test_fetch_retries_with_exponential_backoff(monkeypatch, memory_logger):
+    logger, _ = memory_logger
+    config = {
+        "api_url": "http://test",
+        "symbols": ["BTCUSDT"],
+        "interval": "1m",
+        "download_retries": 4,
+        "retry_backoff": 0.5,
+    }
+    feed = DataFeed(config, logger)
+    sleeps = []
+    monkeypatch.setattr("data_feed.downloader.time.sleep", sleeps.append)
+
+    def fake_get(*args, **kwargs):
+        raise requests.RequestException("fail")
+
+    monkeypatch.setattr(requests.Session, "get", fake_get)
+    assert feed._fetch_binance_klines("BTCUSDT").empty
+    assert sleeps == [0.5, 1.0, 2.0]
+
+
+def test_update_downloads_symbols_concurrently(tmp_path, memory_logger, monkeypatch):
+    logger, _ = memory_logger
+    symbols = ["S1", "S2", "S3"]
+    config = {
+        "api_url": "http://test",
+        "symbols": symbols,
+        "interval": "1m",
+        "download_workers": 3,
+    }
+    feed = DataFeed(config, logger)
+    monkeypatch.chdir(tmp_path)
+    barrier = threading.Barrier(len(symbols), timeout=5)
+
+    class FakeResponse:
+        status_code = 200
+        headers = {"X-MBX-USED-WEIGHT-1M": "10"}
+
+        def json(self):
+            return _kline_rows(0, 2)
+
+    def fake_get(session, url, params=None, timeout=None):
+        # Every symbol must be in flight at the same time to pass the barrier
+        barrier.wait()
+        return FakeResponse()
+
+    monkeypatch.setattr(requests.Session, "get", fake_get)
+    feed.update()
+    for symbol in symbols:
+        assert (tmp_path / f"{symbol}_1m.csv").exists()
+
+
+def test_latest_data_served_from_memory_after_update(tmp_path, memory_logger, monkeypatch):
+    logger, _ = memory_logger
+    config = {
+        "api_url": "http://test",
+        "symbols": ["MEM"],
+        "interval": "1m",
+        "cache_candles": 3,
+    }
+    monkeypatch.chdir(tmp_path)
+    feed = DataFeed(config, logger)
+
+    class FakeResponse:
+        status_code = 200
+
+        def json(self):
+            return _kline_rows(0, 5)
+
+    monkeypatch.setattr(requests.Session, "get", lambda *a, **k: FakeResponse())
+    feed.update()
+
+    def fail(*args, **kwargs):
+        raise AssertionError("latest_data must not read from disk")
+
+    monkeypatch.setattr(feed.store, "load", fail)
+    monkeypatch.setattr(feed.store, "load_records", fail)
+    df = feed.latest_data()[0]
+    assert df["open"].tolist() == [102.0, 103.0, 104.0]
+    assert df["symbol"].iloc[-1] == "MEM"
+    # Everything is still persisted for the next warm start
+    assert len(pd.read_csv(tmp_path / "MEM_1m.csv")) == 5
+    warm = DataFeed(config, logger).latest_data()[0]
+    assert warm["open"].tolist() == [102.0, 103.0, 104.0]
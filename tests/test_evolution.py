@@ -0,0 +1,44 @@
+import time
+
+import numpy as np
+
+from data_feed.storage import RECORD_DTYPE, open_store, records_to_frame
+from evolution import EvolutionWorker
+from strategy import StrategyVariant
+
+
+def test_evolution_worker_runs_cycle_in_background(tmp_path, memory_logger):
+    logger, stream = memory_logger
+    config = {
+        "population_size": 6,
+        "log_file": str(tmp_path / "worker.log"),
+        "symbols": ["AAA"],
+        "storage": "numpy",
+        "data_dir": str(tmp_path),
+    }
+    records = np.zeros(200, dtype=RECORD_DTYPE)
+    records["open_time"] = np.arange(200) * 60000
+    records["close"] = 100 + np.sin(np.arange(200) / 5)
+    records["high"] = records["close"] + 0.5
+    records["low"] = records["close"] - 0.5
+    open_store(config).write("AAA", records_to_frame(records, "AAA"))
+    worker = EvolutionWorker(config, logger)
+    try:
+        population = [StrategyVariant({"threshold": 0.1 * i + 0.1}) for i in range(4)]
+        assert worker.submit(population)
+        assert not worker.submit(population)
+        deadline = time.time() + 30
+        result = worker.poll()
+        while result is None and time.time() < deadline:
+            time.sleep(0.05)
+            result = worker.poll()
+        evolved, best = result
+        assert len(evolved) == 6
+        assert best is not None and best.history
+        assert worker.stats["cache_misses"] == 4
+        assert worker.submit(evolved)
+    finally:
+        worker.shutdown()
+    # El proceso del backtest no abre su propio fichero de log
+    assert "Iniciando backtest" in stream.getvalue()
+    assert not (tmp_path / "worker.log").exists()
@@ -0,0 +1,54 @@
+import numpy as np
+import pandas as pd
+from models.features import (
+    FEATURE_NAMES,
+    FeatureTracker,
+    IncrementalFeatures,
+    compute_features,
+    stochastic_k,
+)
+
+
+def _history(n=300, seed=0):
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, n)))
+    return pd.DataFrame(
+        {
+            "open_time": np.arange(n) * 60000,
+            "close": close,
+            "high": close * (1 + rng.random(n) * 0.01),
+            "low": close * (1 - rng.random(n) * 0.01),
+            "volume": rng.random(n) * 10,
+            "symbol": "AAA",
+        }
+    )
+
+
+def test_incremental_features_match_batch():
+    df = _history()
+    columns = [df[c].to_numpy() for c in ("close", "high", "low", "volume")]
+    batch = compute_features(*columns)
+    assert batch.shape == (len(df), len(FEATURE_NAMES))
+    state = IncrementalFeatures()
+    incremental = np.array([state.update(*row) for row in zip(*columns)])
+    np.testing.assert_allclose(incremental, batch, rtol=1e-9, atol=1e-12)
+    np.testing.assert_array_equal(
+        batch[:, FEATURE_NAMES.index("stoch_k")], stochastic_k(*columns[:3])
+    )
+
+
+def test_tracker_only_commits_closed_candles():
+    df = _history()
+    batch = compute_features(*[df[c].to_numpy() for c in ("close", "high", "low", "volume")])
+    tracker = FeatureTracker()
+    np.testing.assert_allclose(tracker.latest("AAA", df.iloc[:100]), batch[99])
+
+    # La vela abierta cambia: no debe quedar registrada en el estado
+    revised = df.iloc[:100].copy()
+    revised.loc[99, "close"] *= 1.05
+    tracker.latest("AAA", revised)
+    state, _ = tracker._states["AAA"]
+    assert state.count == 99
+
+    np.testing.assert_allclose(tracker.latest("AAA", df.iloc[:101]), batch[100])
+    assert state.count == 100
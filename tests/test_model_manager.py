@@ -1,5 +1,11 @@
+import numpy as np
 import pandas as pd
-from models.manager import ModelManager
+import pytest
+
+from models.features import FEATURE_NAMES, forward_labels
+from models.manager import ModelManager, purged_splits
+from models.online import OnlineModel
+from strategy import StrategyVariant
 
 
 def test_need_retrain_when_no_model(memory_logger):
@@ -17,3 +23,116 @@ def test_retrain_creates_model(tmp_path, memory_logger):
     mm.retrain([df])
     assert mm.model is not None
     assert (tmp_path / "model.pkl").exists()
+
+
+class _FakeModel:
+    classes_ = [0, 1]
+    n_features_in_ = len(FEATURE_NAMES)
+
+    def __init__(self, p_up):
+        self.p_up = p_up
+        self.calls = []
+
+    def predict_proba(self, X):
+        self.calls.append(X.shape)
+        p = np.array(self.p_up)
+        return np.column_stack([1 - p, p])
+
+
+def _frame(symbol, n=40):
+    close = np.linspace(100, 110, n)
+    return pd.DataFrame({"open_time": np.arange(n) * 60000, "close": close, "symbol": symbol})
+
+
+def test_predict_scores_all_symbols_in_one_batch(memory_logger):
+    logger, _ = memory_logger
+    mm = ModelManager({"buy_threshold": 0.6, "sell_threshold": 0.4, "trade_size": 10}, logger)
+    mm.model = _FakeModel([0.9, 0.5, 0.1])
+    signals = mm.predict([_frame("AAA"), _frame("BBB"), pd.DataFrame(), _frame("CCC")])
+    assert mm.model.calls == [(3, len(FEATURE_NAMES))]
+    assert [(s["symbol"], s["side"]) for s in signals] == [("AAA", "BUY"), ("CCC", "SELL")]
+    assert signals[0]["score"] == pytest.approx(0.9)
+    assert signals[1]["score"] == pytest.approx(0.9)
+    assert signals[0]["qty"] == pytest.approx(10 / 110)
+
+
+def test_applied_variant_gates_buys_with_its_backtested_rule(memory_logger):
+    logger, _ = memory_logger
+    mm = ModelManager({"buy_threshold": 0.6, "sell_threshold": 0.4}, logger)
+    mm.model = _FakeModel([0.5, 0.9, 0.9, 0.2])
+    falling = _frame("BBB")
+    falling["close"] = falling["close"].to_numpy()[::-1]
+    frames = [_frame("AAA"), falling, _frame("CCC"), _frame("DDD")]
+    assert [(s["symbol"], s["side"]) for s in mm.predict(frames)] == [("BBB", "BUY"), ("CCC", "BUY"), ("DDD", "SELL")]
+    mm.apply_variant(StrategyVariant({"threshold": 0.1, "window": 5}))
+    # El umbral de la variante es un nivel de %K, no de probabilidad
+    assert mm.thresholds() == (0.6, 0.4)
+    # %K de BBB (en mínimos) no supera el umbral: su compra no se emite
+    assert [(s["symbol"], s["side"]) for s in mm.predict(frames)] == [("CCC", "BUY"), ("DDD", "SELL")]
+
+
+def test_model_with_stale_features_needs_retrain(memory_logger):
+    logger, _ = memory_logger
+    mm = ModelManager({}, logger)
+    mm.model = _FakeModel([0.9])
+    mm.model.n_features_in_ = 1
+    assert mm.need_retrain()
+    assert mm.predict([_frame("AAA")]) == []
+
+
+def test_purged_splits_do_not_leak_labels():
+    numbers = np.repeat(np.arange(60), 2)
+    folds = list(purged_splits(numbers, n_splits=4, horizon=3))
+    assert len(folds) == 4
+    for train, test in folds:
+        assert numbers[train].max() + 3 < numbers[test].min()
+
+
+def test_retrain_labels_forward_returns_and_reports_cv(tmp_path, memory_logger):
+    logger, _ = memory_logger
+    config = {"label_horizon": 2, "cv_splits": 3, "model_params": {"n_estimators": 5}, "n_jobs": 1}
+    mm = ModelManager(config, logger)
+    mm.model_path = str(tmp_path / "model.pkl")
+    rng = np.random.default_rng(0)
+    frames = [_frame(s, 120) for s in ("AAA", "BBB")]
+    for df in frames:
+        df["close"] = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, len(df))))
+    X, y, numbers = mm.training_set(frames)
+    assert X.dtype == np.float32 and X.shape == (236, len(FEATURE_NAMES))
+    assert np.all(np.diff(numbers) >= 0)
+    close = frames[0]["close"].to_numpy()
+    np.testing.assert_array_equal(forward_labels(close, 2)[:-2], close[2:] > close[:-2])
+
+    mm.retrain(frames)
+    stats = mm.stats()
+    assert mm.model.n_jobs == 1 and mm.model.n_estimators == 5
+    assert len(stats["cv_scores"]) == 3
+    assert stats["samples"] == 236 and stats["training_time"] > 0
+
+
+def test_online_model_learns_new_candles_and_checkpoints(tmp_path, memory_logger):
+    logger, _ = memory_logger
+    config = {
+        "model_type": "sgd",
+        "online_checkpoint_every": 2,
+        "model_registry": str(tmp_path / "registry"),
+        "cv_splits": 2,
+    }
+    mm = ModelManager(config, logger)
+    mm.model_path = str(tmp_path / "model.pkl")
+    rng = np.random.default_rng(0)
+    df = _frame("AAA", 200)
+    df["close"] = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, 200)))
+    mm.retrain([df.iloc[:150]])
+    assert isinstance(mm.model, OnlineModel)
+    seen = mm.model.samples_seen
+    assert seen == 149 and not mm.need_retrain()
+
+    for end in range(151, 156):
+        mm.predict([df.iloc[:end]])
+    # Cada predicción etiqueta una vela nueva (149..152): 4 updates, 2 checkpoints
+    assert mm.model.samples_seen == seen + 4
+    assert mm.model_version == "v0003"
+    restarted = ModelManager(config, logger)
+    assert isinstance(restarted.model, OnlineModel)
+    assert restarted._trained_until == mm._trained_until
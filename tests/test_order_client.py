@@ -0,0 +1,247 @@
+import hashlib
+import hmac
+import json
+import threading
+import time
+from decimal import Decimal
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+
+import pytest
+
+from trading.client import OrderClient, OrderError
+from trading.live import Trader
+
+KEY = "test-key"
+SECRET = "test-secret"
+
+
+class MockExchange:
+    """Minimal Binance order endpoint served from a background thread."""
+
+    def __init__(self):
+        self.orders = {}
+        self.requests = []
+        self.fail_next = 0
+        self.delay = 0
+        self.headers = {}
+        self.step_size = "0.001"
+        self.min_notional = "5"
+        self.status = "FILLED"
+        exchange = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                exchange.handle(self, "POST")
+
+            def do_GET(self):
+                exchange.handle(self, "GET")
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    def reply(self, handler, status, body):
+        data = json.dumps(body).encode()
+        handler.send_response(status)
+        handler.send_header("Content-Type", "application/json")
+        handler.send_header("Content-Length", str(len(data)))
+        for name, value in self.headers.items():
+            handler.send_header(name, value)
+        handler.end_headers()
+        handler.wfile.write(data)
+
+    def handle(self, handler, method):
+        url = urlsplit(handler.path)
+        if url.path == "/api/v3/exchangeInfo":
+            symbol = dict(parse_qsl(url.query))["symbol"]
+            filters = [
+                {"filterType": "LOT_SIZE", "minQty": self.step_size, "stepSize": self.step_size},
+                {"filterType": "NOTIONAL", "minNotional": self.min_notional},
+            ]
+            return self.reply(handler, 200, {"symbols": [{"symbol": symbol, "filters": filters}]})
+        payload, _, signature = url.query.rpartition("&signature=")
+        expected = hmac.new(SECRET.encode(), payload.encode(), hashlib.sha256).hexdigest()
+        params = dict(parse_qsl(payload))
+        self.requests.append((method, params))
+        if handler.headers.get("X-MBX-APIKEY") != KEY or signature != expected:
+            return self.reply(handler, 401, {"code": -1022, "msg": "Signature invalid."})
+        if method == "GET":
+            order = self.orders.get(params["origClientOrderId"])
+            if order is None:
+                return self.reply(handler, 400, {"code": -2013, "msg": "Order does not exist."})
+            return self.reply(handler, 200, order)
+        client_id = params["newClientOrderId"]
+        if client_id in self.orders:
+            return self.reply(handler, 400, {"code": -2010, "msg": "Duplicate order sent."})
+        time.sleep(self.delay)
+        if params.get("quantity") == "0" or params["symbol"] == "BADUSDT":
+            return self.reply(handler, 400, {"code": -1013, "msg": "Invalid quantity."})
+        if "quantity" in params and Decimal(params["quantity"]) % Decimal(self.step_size):
+            return self.reply(handler, 400, {"code": -1013, "msg": "Filter failure: LOT_SIZE"})
+        quote = float(params.get("quoteOrderQty", 0)) or float(params["quantity"]) * 100
+        if self.status == "EXPIRED":
+            quote = 0
+        self.orders[client_id] = {
+            "symbol": params["symbol"],
+            "clientOrderId": client_id,
+            "side": params["side"],
+            "status": self.status,
+            "executedQty": f"{quote / 100:.8f}",
+            "cummulativeQuoteQty": f"{quote:.8f}",
+        }
+        if self.fail_next:
+            # La orden queda creada pero la respuesta se pierde
+            self.fail_next -= 1
+            return self.reply(handler, 503, {"code": -1001, "msg": "Internal error."})
+        return self.reply(handler, 200, self.orders[client_id])
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def exchange():
+    server = MockExchange()
+    yield server
+    server.close()
+
+
+def _config(exchange):
+    return {"api_url": exchange.url, "retry_backoff": 0, "request_timeout": 5}
+
+
+def test_place_order_is_signed_and_timed(exchange, memory_logger):
+    logger, _ = memory_logger
+    client = OrderClient(_config(exchange), logger, KEY, SECRET)
+    order = client.place_order("BTCUSDT", "BUY", quote_quantity=10)
+    assert order["status"] == "FILLED"
+    method, params = exchange.requests[0]
+    assert method == "POST"
+    assert params["quoteOrderQty"] == "10"
+    assert params["type"] == "MARKET"
+    assert "timestamp" in params and "recvWindow" in params
+    latency = client.stats()[OrderClient.ORDER_ENDPOINT]
+    assert latency["count"] == 1
+    assert sum(latency["buckets"].values()) == 1
+
+
+def test_retry_reuses_client_order_id(exchange, memory_logger):
+    logger, stream = memory_logger
+    exchange.fail_next = 1
+    client = OrderClient(_config(exchange), logger, KEY, SECRET)
+    order = client.place_order("BTCUSDT", "BUY", quote_quantity=10)
+    posts = [params for method, params in exchange.requests if method == "POST"]
+    assert len(posts) == 2
+    assert posts[0]["newClientOrderId"] == posts[1]["newClientOrderId"]
+    assert len(exchange.orders) == 1
+    assert order["clientOrderId"] == posts[0]["newClientOrderId"]
+    assert "respuesta 503" in stream.getvalue()
+
+
+def test_rejected_order_is_not_retried(exchange, memory_logger):
+    logger, _ = memory_logger
+    client = OrderClient(_config(exchange), logger, KEY, SECRET)
+    with pytest.raises(OrderError) as exc:
+        client.place_order("BTCUSDT", "SELL", quantity=0)
+    assert exc.value.code == -1013
+    assert len(exchange.requests) == 1
+
+
+def test_usage_headers_sync_limiters(exchange, memory_logger):
+    logger, _ = memory_logger
+    exchange.headers = {"X-MBX-USED-WEIGHT-1M": "1200", "X-MBX-ORDER-COUNT-10S": "50"}
+    client = OrderClient(_config(exchange), logger, KEY, SECRET)
+    client.place_order("BTCUSDT", "BUY", quote_quantity=10)
+    assert client.weight_limiter.tokens < 1
+    assert client.limiters[("POST", OrderClient.ORDER_ENDPOINT)].tokens < 1
+
+
+def test_trader_uses_filled_amounts(exchange, memory_logger, monkeypatch):
+    logger, stream = memory_logger
+    monkeypatch.setenv("API_KEY", KEY)
+    monkeypatch.setenv("API_SECRET", SECRET)
+    trader = Trader({**_config(exchange), "balance": 100}, logger)
+    trader.account.reconcile({"balances": [{"asset": "BTC", "free": "0.1", "locked": "0"}]}, [])
+    trader.execute([
+        {"symbol": "BTCUSDT", "side": "BUY", "price": 99, "usdt_amount": 20},
+        {"symbol": "BTCUSDT", "side": "SELL", "price": 101, "qty": 0.1},
+    ])
+    assert trader.balance == pytest.approx(100 - 20 + 10)
+    assert "Modo: Real" in stream.getvalue()
+    assert trader.stats()["latency"][OrderClient.ORDER_ENDPOINT]["count"] == 2
+
+
+def test_batch_is_sent_concurrently_with_reserved_balance(exchange, memory_logger, monkeypatch):
+    logger, stream = memory_logger
+    monkeypatch.setenv("API_KEY", KEY)
+    monkeypatch.setenv("API_SECRET", SECRET)
+    exchange.delay = 0.2
+    trader = Trader({**_config(exchange), "balance": 30, "order_workers": 4}, logger)
+    signals = [
+        {"symbol": f"S{i}USDT", "side": "BUY", "price": 100, "usdt_amount": 10} for i in range(4)
+    ]
+    started = time.perf_counter()
+    trader.execute(signals)
+    assert time.perf_counter() - started < 0.6
+    assert len(exchange.orders) == 3
+    assert trader.balance == pytest.approx(0)
+    assert "Trade rechazado: monto (10) mayor que el balance disponible (0)" in stream.getvalue()
+    assert "Lote de 3 órdenes enviado" in stream.getvalue()
+    assert trader.stats()["dispatch"]["count"] == 1
+
+
+def test_failed_order_releases_reservation(exchange, memory_logger, monkeypatch):
+    logger, stream = memory_logger
+    monkeypatch.setenv("API_KEY", KEY)
+    monkeypatch.setenv("API_SECRET", SECRET)
+    trader = Trader({**_config(exchange), "balance": 50}, logger)
+    trader.execute([
+        {"symbol": "BADUSDT", "side": "BUY", "price": 100, "usdt_amount": 20},
+        {"symbol": "BTCUSDT", "side": "BUY", "price": 100, "usdt_amount": 20},
+    ])
+    assert trader.balance == pytest.approx(30)
+    assert "ERROR al ejecutar orden" in stream.getvalue()
+    assert trader.trades == 1
+
+
+def test_misaligned_quantity_is_rounded_to_step_size(exchange, memory_logger, monkeypatch):
+    logger, stream = memory_logger
+    client = OrderClient(_config(exchange), logger, KEY, SECRET)
+    with pytest.raises(OrderError) as exc:
+        client.place_order("BTCUSDT", "SELL", quantity=0.12345)
+    assert exc.value.message == "Filter failure: LOT_SIZE"
+
+    monkeypatch.setenv("API_KEY", KEY)
+    monkeypatch.setenv("API_SECRET", SECRET)
+    trader = Trader({**_config(exchange), "balance": 100}, logger)
+    trader.holdings["BTCUSDT"] = 1.0
+    trader.execute([
+        {"symbol": "BTCUSDT", "side": "SELL", "price": 100, "qty": 0.12345},
+        {"symbol": "ETHUSDT", "side": "SELL", "price": 100, "qty": 0.01},
+        {"symbol": "ETHUSDT", "side": "BUY", "price": 100, "usdt_amount": 2},
+    ])
+    posts = [params for method, params in exchange.requests if method == "POST"]
+    assert [p["quantity"] for p in posts] == ["0.12345", "0.123"]
+    assert trader.trades == 1
+    assert trader.holdings["BTCUSDT"] == pytest.approx(0.877)
+    assert "Venta rechazada: no hay ETHUSDT disponible" in stream.getvalue()
+    assert "Orden omitida: monto (2) por debajo del mínimo de ETHUSDT" in stream.getvalue()
+    assert trader.balance == pytest.approx(100 + 12.3)
+
+
+def test_unfilled_order_is_not_counted(exchange, memory_logger, monkeypatch):
+    logger, stream = memory_logger
+    monkeypatch.setenv("API_KEY", KEY)
+    monkeypatch.setenv("API_SECRET", SECRET)
+    exchange.status = "EXPIRED"
+    trader = Trader({**_config(exchange), "balance": 100}, logger)
+    trader.execute([{"symbol": "BTCUSDT", "side": "BUY", "price": 100, "usdt_amount": 20}])
+    assert trader.trades == 0
+    assert trader.balance == pytest.approx(100)
+    assert "Orden sin ejecutar" in stream.getvalue()
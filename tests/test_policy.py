@@ -0,0 +1,119 @@
+import threading
+
+import numpy as np
+import pandas as pd
+
+from models.features import FEATURE_NAMES
+from models.manager import ModelManager
+from models.policy import RetrainPolicy, RunningMoments
+
+
+def test_running_moments_match_numpy():
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(500, 3))
+    moments = RunningMoments(3)
+    for batch in np.array_split(X, 7):
+        moments.update(batch)
+    np.testing.assert_allclose(moments.mean, X.mean(axis=0))
+    np.testing.assert_allclose(moments.var, X.var(axis=0))
+
+
+def test_policy_triggers_on_drift_age_and_quality(tmp_path):
+    config = {
+        "retrain_min_interval": 10,
+        "retrain_max_age": 1000,
+        "drift_min_samples": 50,
+        "quality_window": 20,
+    }
+    path = str(tmp_path / "state.json")
+    policy = RetrainPolicy(config, path)
+    assert policy.reasons() == ["sin modelo"]
+    rng = np.random.default_rng(1)
+    policy.reset(rng.normal(size=(1000, 2)), expected_accuracy=0.6, now=0)
+    assert policy.reasons(now=5) == []
+
+    policy.observe_features(rng.normal(size=(60, 2)))
+    assert policy.reasons(now=20) == []
+    policy.observe_features(rng.normal(loc=[0, 5], size=(200, 2)))
+    assert policy.reasons(now=5) == []
+    assert policy.reasons(now=20) == ["deriva de features"]
+    assert "antigüedad" in policy.reasons(now=1000)
+
+    for i in range(20):
+        policy.observe_outcome(i % 4 == 0)
+    assert "calidad de predicción" in policy.reasons(now=20)
+
+    policy.save()
+    restored = RetrainPolicy(config, path)
+    assert restored.cycles == 2 and restored.accuracy == 0.25
+    assert restored.reasons(now=20) == ["deriva de features", "calidad de predicción"]
+
+
+class _FakeModel:
+    classes_ = [0, 1]
+    n_features_in_ = len(FEATURE_NAMES)
+
+    def predict_proba(self, X):
+        return np.tile([0.2, 0.8], (len(X), 1))
+
+
+def test_manager_scores_resolved_predictions(memory_logger):
+    logger, _ = memory_logger
+    mm = ModelManager({"label_horizon": 2}, logger)
+    mm.model = _FakeModel()
+    close = np.array([100, 101, 102, 103, 104, 101, 100, 99.0])
+    df = pd.DataFrame({"open_time": np.arange(8) * 60000, "close": close, "symbol": "AAA"})
+    for end in range(3, 9):
+        mm.predict([df.iloc[:end]])
+    # Predicciones de subida en las velas 2..5; cerradas hasta la 6 resuelven 2, 3 y 4
+    assert mm.policy.cycles == 6
+    assert list(mm.policy._outcomes) == [True, False, False]
+    assert mm.stats()["retrain"]["live_accuracy"] == 1 / 3
+
+
+def test_live_moments_follow_recent_rows(tmp_path):
+    rng = np.random.default_rng(2)
+    X = rng.normal(size=(500, 3))
+    decayed = RunningMoments(3, halflife=100)
+    for batch in np.array_split(X, 9):
+        decayed.update(batch)
+    assert decayed.count == 500
+    # Cada fila pesa 0.5 ** (filas posteriores / halflife), sea cual sea el lote
+    weights = 0.5 ** (np.arange(500)[::-1] / 100)
+    mean = np.average(X, axis=0, weights=weights)
+    np.testing.assert_allclose(decayed.mean, mean)
+    np.testing.assert_allclose(decayed.var, np.average((X - mean) ** 2, axis=0, weights=weights))
+
+    config = {"retrain_min_interval": 0, "drift_min_samples": 50, "drift_halflife": 100}
+    path = str(tmp_path / "state.json")
+    policy = RetrainPolicy(config, path)
+    policy.reset(rng.normal(size=(1000, 2)), now=0)
+    # Mucho historial sin deriva no diluye un cambio reciente
+    policy.observe_features(rng.normal(size=(100_000, 2)))
+    policy.observe_features(rng.normal(loc=[0, 3], size=(200, 2)))
+    assert policy.drift() > 2
+    assert RetrainPolicy(config, path).live is None
+    policy.save()
+    assert RetrainPolicy(config, path).drift() == policy.drift()
+
+
+def test_policy_saves_while_predictions_update_it(tmp_path):
+    path = str(tmp_path / "state.json")
+    config = {"quality_window": 5000, "drift_halflife": 0}
+    policy = RetrainPolicy(config, path)
+    policy.reset(np.zeros((10, 2)), now=0)
+
+    def predict():
+        for _ in range(5000):
+            policy.observe_features(np.ones((1, 2)))
+            policy.observe_outcome(True)
+
+    worker = threading.Thread(target=predict)
+    worker.start()
+    # Un guardado desde otro hilo ve cada predicción entera o no la ve
+    while worker.is_alive():
+        policy.save()
+        restored = RetrainPolicy(config, path)
+        assert restored.cycles - len(restored._outcomes) in (0, 1)
+        assert restored.cycles == (restored.live.count if restored.live else 0)
+    worker.join()
@@ -0,0 +1,22 @@
+from modules.ratelimit import RateLimiter
+
+
+def test_rate_limiter_waits_when_budget_exhausted(monkeypatch):
+    clock = {"now": 0.0}
+    monkeypatch.setattr("modules.ratelimit.time.monotonic", lambda: clock["now"])
+
+    def fake_sleep(seconds):
+        clock["now"] += seconds
+
+    monkeypatch.setattr("modules.ratelimit.time.sleep", fake_sleep)
+    limiter = RateLimiter(10, period=10.0)
+    assert limiter.acquire(10) == 0.0
+    waited = limiter.acquire(5)
+    assert abs(waited - 5.0) < 1e-9
+
+
+def test_rate_limiter_sync_lowers_budget(monkeypatch):
+    monkeypatch.setattr("modules.ratelimit.time.monotonic", lambda: 0.0)
+    limiter = RateLimiter(100)
+    limiter.sync(90)
+    assert limiter.tokens == 10
@@ -0,0 +1,75 @@
+import numpy as np
+import pandas as pd
+
+from models.manager import ModelManager
+from models.registry import ModelRegistry
+
+
+def _frames(seed=0, n=120):
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, n)))
+    return [pd.DataFrame({"open_time": np.arange(n) * 60000, "close": close, "symbol": "AAA"})]
+
+
+def test_registry_versions_promote_and_mmap_load(tmp_path):
+    registry = ModelRegistry(str(tmp_path / "reg"), keep=1)
+    assert registry.current() is None
+    first = registry.save({"weights": np.arange(10.0)}, {"metrics": {"cv_mean": 0.5}})
+    registry.promote(first, publish_path=str(tmp_path / "model.pkl"))
+    second = registry.save({"weights": np.arange(5.0)}, {})
+    third = registry.save({"weights": np.arange(3.0)}, {})
+    assert (first, second, third) == ("v0001", "v0002", "v0003")
+    # Se conserva la versión promovida y la más reciente
+    assert registry.versions() == ["v0001", "v0003"]
+    model, metadata = registry.load()
+    assert isinstance(model["weights"], np.memmap)
+    assert metadata == {"metrics": {"cv_mean": 0.5}, "version": "v0001"}
+    assert (tmp_path / "model.pkl").exists()
+
+
+def test_registry_with_keep_zero_never_prunes_the_new_version(tmp_path):
+    registry = ModelRegistry(str(tmp_path / "reg"), keep=0)
+    first = registry.save({"weights": 1}, {})
+    registry.promote(first)
+    second = registry.save({"weights": 2}, {})
+    assert registry.versions() == [first, second]
+    registry.promote(second, publish_path=str(tmp_path / "model.pkl"))
+    assert registry.current() == second
+    assert registry.versions() == [second]
+    assert registry.load(mmap=False)[0] == {"weights": 2}
+
+
+def _regimes(n_alternating, n_trending, seed=0):
+    """Alternating candles followed by runs of eight in the same direction."""
+
+    rng = np.random.default_rng(seed)
+    steps = [0.01 if i % 2 else -0.01 for i in range(n_alternating)]
+    steps += [0.01 if i // 8 % 2 else -0.01 for i in range(n_trending)]
+    close = 100 * np.exp(np.cumsum(np.array(steps) + rng.normal(0, 0.001, len(steps))))
+    return [pd.DataFrame({"open_time": np.arange(len(close)) * 60000, "close": close, "symbol": "AAA"})]
+
+
+def test_retrain_promotes_only_better_models(tmp_path, memory_logger):
+    logger, stream = memory_logger
+    config = {"model_params": {"n_estimators": 10, "random_state": 0}, "n_jobs": 1, "cv_splits": 3}
+    mm = ModelManager(config, logger)
+    mm.model_path = str(tmp_path / "model.pkl")
+
+    mm.retrain(_regimes(300, 0))
+    first = mm.model
+    assert mm.stats()["version"] == "v0001"
+    # Sin velas posteriores a su entrenamiento no hay con qué preferir al candidato
+    mm.retrain(_regimes(300, 0, seed=1))
+    assert mm.model is first
+    assert "Modelo v0002 descartado. CV: None | actual en los mismos folds: None" in stream.getvalue()
+    # Más velas del mismo régimen: el actual acierta igual fuera de muestra
+    mm.retrain(_regimes(400, 0))
+    assert mm.model is first
+    # Cambio de régimen: solo el candidato lo aprende en los folds nuevos
+    mm.retrain(_regimes(400, 300))
+    assert mm.model_version == "v0004"
+    assert mm.stats()["cv_mean"] > 0.6
+
+    restarted = ModelManager({**config, "model_registry": str(tmp_path / "model_registry")}, logger)
+    assert restarted.model_version == "v0004"
+    assert restarted.stats()["cv_mean"] == mm.stats()["cv_mean"]
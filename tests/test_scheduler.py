@@ -0,0 +1,59 @@
+import asyncio
+
+from scheduler import Scheduler
+
+
+def test_scheduler_runs_stages_independently(memory_logger):
+    logger, stream = memory_logger
+    scheduler = Scheduler(logger)
+    calls = {"fast": 0, "triggered": 0}
+    trigger = None
+
+    def fast():
+        calls["fast"] += 1
+        if calls["fast"] == 3:
+            trigger_loop.call_soon_threadsafe(trigger.set)
+
+    def slow_and_broken():
+        raise RuntimeError("boom")
+
+    def triggered():
+        calls["triggered"] += 1
+        trigger_loop.call_soon_threadsafe(scheduler.stop)
+
+    async def scenario():
+        nonlocal trigger, trigger_loop
+        trigger_loop = asyncio.get_running_loop()
+        trigger = asyncio.Event()
+        scheduler.every("fast", 0.01, fast)
+        scheduler.every("broken", 0.01, slow_and_broken)
+        scheduler.on("triggered", trigger, triggered)
+        await scheduler.run()
+
+    trigger_loop = None
+    asyncio.run(asyncio.wait_for(scenario(), timeout=5))
+    assert calls["fast"] >= 3
+    assert calls["triggered"] == 1
+    assert "Error en la etapa 'broken'" in stream.getvalue()
+
+
+def test_every_waits_for_its_delay(memory_logger):
+    logger, _ = memory_logger
+    scheduler = Scheduler(logger)
+    calls = []
+
+    def stop():
+        calls.append("stop")
+        loop.call_soon_threadsafe(scheduler.stop)
+
+    async def scenario():
+        nonlocal loop
+        loop = asyncio.get_running_loop()
+        scheduler.every("delayed", 10, lambda: calls.append("delayed"), delay=0.2)
+        scheduler.every("stop", 10, stop, delay=0.05)
+        await scheduler.run()
+
+    loop = None
+    asyncio.run(asyncio.wait_for(scenario(), timeout=5))
+    # La etapa retrasada no llega a ejecutarse antes de la parada
+    assert calls == ["stop"]
@@ -1,4 +1,9 @@
-from trading.simulation import Simulator
+import numpy as np
+import pandas as pd
+import pytest
+
+from backtest.engine import Backtester, evaluate
+from trading.simulation import ExecutionModel, Simulator
 
 
 def test_simulator_logs_and_updates_balance(memory_logger):
@@ -8,3 +13,106 @@ def test_simulator_logs_and_updates_balance(memory_logger):
     sim.simulate([{"price": 100, "symbol": "T", "side": "BUY"}])
     assert sim.balance == start - 10
     assert "Modo: Simulado" in stream.getvalue()
+
+
+
+def test_sells_are_capped_at_the_position_held(memory_logger):
+    logger, stream = memory_logger
+    sim = Simulator({"balance": 1000, "commission_pct": 0.0}, logger)
+    sim.simulate([{"price": 100, "symbol": "BTCUSDT", "side": "SELL", "qty": 0.1, "usdt_amount": 10}])
+    assert "Venta rechazada: no hay BTCUSDT disponible para vender." in stream.getvalue()
+    assert sim.balance == 1000 and sim.trades == 0
+    assert "BTCUSDT" not in sim.positions
+
+    sim.simulate([{"price": 100, "symbol": "BTCUSDT", "side": "BUY", "usdt_amount": 10}])
+    sim.simulate([{"price": 110, "symbol": "BTCUSDT", "side": "SELL", "qty": 0.5, "usdt_amount": 55}])
+    assert "Venta ajustada" in stream.getvalue()
+    assert sim.positions["BTCUSDT"]["qty"] == pytest.approx(0)
+    assert sim.balance == pytest.approx(1001)
+
+    # En lote: la primera venta no tiene posición y la última solo vende lo comprado
+    df = _frame([100] * 4, [100] * 4)
+    batch = sim.simulate_batch("T", df, [0, 1, 2], [-1, 1, -1], quantity=[1.0, 0.5, 2.0])
+    np.testing.assert_allclose(batch["qty"], [0.0, 0.5, 0.5])
+    np.testing.assert_allclose(batch["position"], [0.0, 0.5, 0.0], atol=1e-12)
+    assert sim.positions["T"]["qty"] == pytest.approx(0)
+
+def _frame(opens, closes, volume=100.0, quote_volume=None):
+    opens = np.asarray(opens, dtype=float)
+    closes = np.asarray(closes, dtype=float)
+    n = len(closes)
+    return pd.DataFrame(
+        {
+            "open_time": pd.to_datetime(np.arange(n) * 60000, unit="ms"),
+            "open": opens,
+            "high": np.maximum(opens, closes) + 1,
+            "low": np.minimum(opens, closes) - 1,
+            "close": closes,
+            "volume": volume,
+            "quote_asset_volume": quote_volume if quote_volume is not None else closes * volume,
+            "symbol": "T",
+        }
+    )
+
+
+def test_fill_models_use_the_next_candle():
+    df = _frame([100, 102, 104], [101, 103, 105], quote_volume=[1, 10500, 1])
+    index = [0, 1, 2]
+    next_open = ExecutionModel("next_open").fill(df, index, 1, quantity=1)
+    assert next_open["price"][:2].tolist() == [102, 104]
+    assert next_open["candle"].tolist() == [1, 2, -1]
+    assert next_open["qty"][2] == 0
+    vwap = ExecutionModel("vwap").fill(df, [0], 1, quantity=1)
+    assert vwap["price"][0] == pytest.approx(105)
+    close = ExecutionModel("close").fill(df, index, -1, quantity=1)
+    assert close["price"].tolist() == [101, 103, 105]
+    bounded = ExecutionModel("high_low", slippage_base=0.5).fill(df, [0], 1, quantity=1)
+    assert bounded["price"][0] == df["high"][1]
+
+
+def test_volume_limits_fills_and_drives_slippage():
+    df = _frame([100, 100], [100, 100], volume=10.0)
+    model = ExecutionModel(
+        "next_open", commission_pct=0.001, slippage_impact=0.01, max_volume_pct=0.5
+    )
+    fills = model.fill(df, [0, 0], [1, -1], quantity=[1.0, 20.0])
+    assert fills["qty"].tolist() == [1.0, 5.0]
+    assert fills["filled"].tolist() == [1.0, 0.25]
+    assert fills["price"][0] == pytest.approx(100 * (1 + 0.01 * np.sqrt(0.1)))
+    assert fills["price"][1] == pytest.approx(100 * (1 - 0.01 * np.sqrt(0.5)))
+    assert fills["commission"][1] == pytest.approx(fills["notional"][1] * 0.001)
+
+
+def test_pending_order_fills_on_next_candle(memory_logger):
+    logger, stream = memory_logger
+    config = {"balance": 100, "fill_model": "next_open", "commission_pct": 0.0}
+    sim = Simulator(config, logger)
+    df = _frame([100, 100], [100, 100])
+    sim.simulate([{"symbol": "T", "side": "BUY", "price": 100, "usdt_amount": 10}], [df])
+    assert sim.balance == 90
+    assert len(sim.pending) == 1
+    assert "Trade ejecutado" not in stream.getvalue()
+    sim.simulate([], [_frame([100, 100, 125], [100, 100, 130])])
+    assert sim.pending == []
+    assert sim.positions["T"]["qty"] == pytest.approx(0.08)
+    assert sim.stats()["pnl"] == pytest.approx(0.08 * 130 - 10)
+    assert "Modo: Simulado" in stream.getvalue()
+
+
+def test_backtest_agrees_with_simulated_round_trip(memory_logger):
+    logger, _ = memory_logger
+    config = {"fill_model": "next_open", "commission_pct": 0.001, "slippage_base": 0.002, "trade_size": 10}
+    rng = np.random.default_rng(3)
+    closes = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, 8)))
+    df = _frame(closes * (1 + rng.normal(0, 0.002, 8)), closes)
+    bt = Backtester(config, logger)
+    entry, exit = bt.execution.round_trip_prices(df, 10)
+    position = np.array([False, True, True, True, False, False, False, False])
+    backtest = evaluate(closes, position, bt.commission_pct, entry, exit)
+
+    sim = Simulator({**config, "balance": 10}, logger)
+    bought = sim.simulate_batch("T", df, [1], 1, quote=10)
+    sold = sim.simulate_batch("T", df, [4], -1, quantity=bought["position"])
+    assert sold["position"][-1] == pytest.approx(0)
+    assert sim.balance / 10 - 1 == pytest.approx(backtest["roi"])
+    assert backtest["trades"] == 1
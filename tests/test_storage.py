@@ -0,0 +1,99 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from data_feed.storage import CsvStore, NumpyStore, SqliteStore, open_store
+
+
+def _klines(start, count, symbol="AAA", base=100.0):
+    minutes = np.arange(start, start + count)
+    return pd.DataFrame(
+        {
+            "open_time": pd.to_datetime(minutes * 60000, unit="ms"),
+            "open": (base + minutes).astype(str),
+            "high": "2",
+            "low": "0.5",
+            "close": (base + minutes).astype(str),
+            "volume": "100",
+            "close_time": pd.to_datetime(minutes * 60000 + 59999, unit="ms"),
+            "quote_asset_volume": "200",
+            "number_of_trades": 10,
+            "taker_buy_base": "50",
+            "taker_buy_quote": "75",
+            "ignore": "0",
+            "symbol": symbol,
+        }
+    )
+
+
+@pytest.fixture(params=["csv", "numpy", "sqlite"])
+def store(request, tmp_path):
+    config = {
+        "storage": request.param,
+        "interval": "1m",
+        "data_dir": str(tmp_path),
+        "database_path": str(tmp_path / "candles.db"),
+    }
+    return open_store(config)
+
+
+def test_open_store_selects_backend(tmp_path):
+    assert isinstance(open_store({}), CsvStore)
+    assert isinstance(open_store({"storage": "numpy"}), NumpyStore)
+    sqlite = open_store({"storage": "sqlite", "database_path": str(tmp_path / "x.db")})
+    assert isinstance(sqlite, SqliteStore)
+    with pytest.raises(ValueError):
+        open_store({"storage": "unknown"})
+
+
+def test_store_append_replaces_open_candle(store):
+    assert store.last_open_time("AAA") is None
+    assert store.load("AAA").empty
+    store.write("AAA", _klines(0, 5))
+    updated = _klines(4, 3, base=1000.0)
+    store.append("AAA", updated)
+
+    df = store.load("AAA")
+    assert len(df) == 7
+    assert store.last_open_time("AAA") == 6 * 60000
+    closes = df["close"].astype(float).tolist()
+    assert closes[:4] == [100.0, 101.0, 102.0, 103.0]
+    assert closes[4:] == [1004.0, 1005.0, 1006.0]
+    assert pd.api.types.is_datetime64_any_dtype(df["open_time"])
+    assert (df["symbol"] == "AAA").all()
+
+
+def test_store_range_reads(store):
+    store.write("AAA", _klines(0, 10))
+    df = store.load("AAA", start=3 * 60000, end=5 * 60000)
+    assert df["close"].astype(float).tolist() == [103.0, 104.0, 105.0]
+    records = store.load_records("AAA", start=8 * 60000)
+    assert records["open_time"].tolist() == [8 * 60000, 9 * 60000]
+
+
+def test_numpy_store_returns_memory_map(tmp_path):
+    store = NumpyStore(str(tmp_path), "1m")
+    store.write("AAA", _klines(0, 4))
+    records = store.load_records("AAA")
+    assert isinstance(records, np.memmap)
+    assert records["close"].dtype == np.float64
+    assert records["number_of_trades"].dtype == np.int64
+
+
+def test_store_merge_appends_after_tail_and_rewrites_only_for_gaps(store, monkeypatch):
+    store.write("AAA", _klines(0, 5))
+    writes = []
+    write = store.write
+    monkeypatch.setattr(store, "write", lambda symbol, df: (writes.append(len(df)), write(symbol, df)))
+    # Velas posteriores a la cola (incluida la última, que se sustituye)
+    store.merge("AAA", _klines(4, 6, base=200.0))
+    assert writes == []
+    store.merge("AAA", _klines(20, 5))
+    assert writes == []
+    # Rellenar un hueco intermedio sí reescribe el fichero
+    store.merge("AAA", _klines(12, 3))
+    times = store.load_records("AAA")["open_time"] // 60000
+    assert times.tolist() == list(range(10)) + [12, 13, 14] + list(range(20, 25))
+    assert store.load_records("AAA")["close"][4] == 204.0
+    if isinstance(store, CsvStore):
+        assert writes == [18]
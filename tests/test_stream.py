@@ -0,0 +1,87 @@
+import asyncio
+import json
+import threading
+
+from websockets.asyncio.server import serve
+
+from data_feed.downloader import DataFeed
+from data_feed.stream import KlineStream
+
+MINUTE = 60000
+
+
+def _message(minute, close, closed):
+    kline = {
+        "t": minute * MINUTE,
+        "T": minute * MINUTE + MINUTE - 1,
+        "s": "AAA",
+        "i": "1m",
+        "o": "1",
+        "c": str(close),
+        "h": "5",
+        "l": "0.5",
+        "v": "10",
+        "n": 3,
+        "x": closed,
+        "q": "20",
+        "V": "4",
+        "Q": "8",
+    }
+    data = {"e": "kline", "E": 0, "s": "AAA", "k": kline}
+    return json.dumps({"stream": "aaa@kline_1m", "data": data})
+
+
+def test_stream_updates_feed_and_reconnects(tmp_path, memory_logger, monkeypatch):
+    logger, _ = memory_logger
+    config = {
+        "api_url": "",
+        "symbols": ["AAA"],
+        "interval": "1m",
+        "storage": "numpy",
+        "data_dir": str(tmp_path),
+    }
+    feed = DataFeed(config, logger)
+    catch_ups = []
+    monkeypatch.setattr(feed, "update", lambda: catch_ups.append(True))
+    writers = []
+    persist = feed.persist_kline
+    monkeypatch.setattr(
+        feed, "persist_kline",
+        lambda symbol, record: (writers.append(threading.current_thread()), persist(symbol, record)),
+    )
+    closed = []
+    paths = []
+
+    async def handler(ws):
+        paths.append(ws.request.path)
+        if len(paths) == 1:
+            await ws.send(_message(0, 1, False))
+            await ws.send(_message(0, 2, True))
+            await ws.send(_message(1, 3, False))
+            return  # Dropping the connection forces a reconnect
+        await ws.send(_message(1, 4, True))
+        await ws.wait_closed()
+
+    async def scenario():
+        async with serve(handler, "127.0.0.1", 0) as server:
+            port = server.sockets[0].getsockname()[1]
+            stream_config = {
+                "stream_url": f"ws://127.0.0.1:{port}",
+                "stream_reconnect_delay": 0.01,
+            }
+            stream = KlineStream(stream_config, logger, feed, on_close=closed.append)
+            task = asyncio.create_task(stream.run())
+            while len(closed) < 2:
+                await asyncio.sleep(0.01)
+            await stream.stop()
+            await task
+
+    asyncio.run(asyncio.wait_for(scenario(), timeout=10))
+
+    assert paths[0] == "/stream?streams=aaa@kline_1m"
+    assert closed == ["AAA", "AAA"]
+    assert len(catch_ups) == 2
+    # Las velas cerradas se guardan fuera del hilo del event loop
+    assert len(writers) == 2 and threading.main_thread() not in writers
+    assert feed.store.load_records("AAA")["close"].tolist() == [2.0, 4.0]
+    assert feed.latest_data()[0]["close"].tolist() == [2.0, 4.0]
@@ -0,0 +1,81 @@
+import numpy as np
+import pytest
+
+from data_feed.trades import TRADE_DTYPE, TradeArchive, import_agg_trades_csv
+from trading.simulation import Simulator
+
+
+def _archive(tmp_path, n=100):
+    archive = TradeArchive(str(tmp_path), "T")
+    records = np.zeros(n, dtype=TRADE_DTYPE)
+    records["agg_id"] = np.arange(n)
+    records["time"] = np.arange(n) * 10
+    records["price"] = 100 + np.arange(n)
+    records["qty"] = 1.0
+    archive.append(records)
+    return archive
+
+
+def test_import_agg_trades_csv(tmp_path):
+    with_header = tmp_path / "a.csv"
+    with_header.write_text(
+        "agg_trade_id,price,quantity,first_trade_id,last_trade_id,transact_time,is_buyer_maker,is_best_match\n"
+        "1,100.5,0.2,1,1,1700000000000000,true,true\n"
+        "2,101.0,0.3,2,3,1700000001000000,false,true\n"
+    )
+    plain = tmp_path / "b.csv"
+    plain.write_text("2,101.0,0.3,2,3,1700000001000,False,True\n3,99.0,1.0,4,4,1700000002000,True,True\n")
+    archive = TradeArchive(str(tmp_path), "T")
+    assert import_agg_trades_csv(str(with_header), archive) == 2
+    # El trade 2 ya estaba importado y se salta
+    assert import_agg_trades_csv(str(plain), archive, chunk_rows=1) == 1
+    records = archive.records()
+    assert records["agg_id"].tolist() == [1, 2, 3]
+    assert records["time"].tolist() == [1700000000000, 1700000001000, 1700000002000]
+    assert records["buyer_maker"].tolist() == [True, False, True]
+    assert len(archive) == 3
+
+
+def test_chunks_are_bounded_views(tmp_path):
+    archive = _archive(tmp_path)
+    chunks = list(archive.chunks(30, start=100, end=595))
+    assert [len(c) for c in chunks] == [30, 20]
+    assert chunks[0]["time"][0] == 100
+    assert chunks[-1]["time"][-1] == 590
+    assert isinstance(chunks[0], np.memmap)
+
+
+def test_replay_matches_across_chunks(tmp_path, memory_logger):
+    logger, stream = memory_logger
+    archive = _archive(tmp_path)
+    config = {"balance": 1000, "commission_pct": 0.0, "max_volume_pct": 0.5}
+    results = []
+    for chunk in (7, 1000):
+        sim = Simulator({**config, "replay_chunk_trades": chunk}, logger)
+        results.append(
+            sim.replay("T", archive, [5, 5, 985], [1, -1, 1], quantity=[2.0, 0.25, 3.0])
+        )
+    small, large = results
+    for name in ("price", "qty", "time", "filled"):
+        np.testing.assert_allclose(small[name], large[name])
+    # 0.5 de cada trade: la compra toma los trades 1 a 4 (101..104)
+    assert large["price"][0] == pytest.approx(102.5)
+    assert large["time"][0] == 40
+    assert large["price"][1] == pytest.approx(101)
+    # Solo queda un trade después de t=985
+    assert large["filled"][2] == pytest.approx(0.5 / 3)
+    assert large["time"][2] == -1
+    assert large["trades"] == 99
+    assert "trades/s" in stream.getvalue()
+
+
+def test_replay_by_quote_books_position(tmp_path, memory_logger):
+    logger, _ = memory_logger
+    archive = _archive(tmp_path)
+    sim = Simulator({"balance": 1000, "commission_pct": 0.0, "replay_latency_ms": 20}, logger)
+    fills = sim.replay("T", archive, [0], 1, quote=[205.0])
+    # Con 20 ms de latencia el primer trade elegible es el de t=30 (103)
+    assert fills["qty"][0] == pytest.approx(1 + 102 / 104)
+    assert fills["notional"][0] == pytest.approx(205)
+    assert sim.balance == pytest.approx(795)
+    assert sim.positions["T"]["qty"] == pytest.approx(fills["qty"][0])
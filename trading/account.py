@@ -0,0 +1,384 @@
+"""Account state maintained from the Binance user data stream."""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, List
+
+from websockets.asyncio.client import connect
+from websockets.exceptions import WebSocketException
+
+from trading.client import OrderError
+
+# Estados en los que una orden sigue viva en el exchange
+OPEN_STATUSES = ("NEW", "PARTIALLY_FILLED", "PENDING_NEW")
+
+
+class AccountState:
+    """Open orders, fills, positions and balances updated event by event.
+
+    Execution reports add fills and move orders in and out of
+    :attr:`open_orders`; fills are de-duplicated by trade ID, so a report
+    seen twice never changes positions twice. Positions hold the net base
+    quantity bought through the bot with its average entry price and
+    realised PnL. Balances come from ``outboundAccountPosition`` and
+    ``balanceUpdate`` events and are replaced by :meth:`reconcile` with a
+    REST snapshot, after which events older than the snapshot are ignored;
+    trades missed while disconnected are applied to fills and positions by
+    the same call.
+    The state is shared between the stream and the trading threads and is
+    protected by a lock.
+
+    Parameters
+    ----------
+    fill_history : int
+        Number of most recent fills kept in :attr:`fills`.
+    quote_asset : str
+        Quote asset of the traded symbols, used to find their base asset.
+    """
+
+    def __init__(self, fill_history: int = 1000, quote_asset: str = "USDT") -> None:
+        self.quote_asset = quote_asset
+        self.open_orders: Dict[str, Dict[str, Any]] = {}
+        self.fills = deque(maxlen=fill_history)
+        self.positions: Dict[str, Dict[str, float]] = {}
+        self.balances: Dict[str, Dict[str, float]] = {}
+        self.filled_orders = 0
+        self.reconciled_at = None
+        self.last_trade_ids: Dict[str, int] = {}
+        self._seen_trades = set()
+        self._trade_order = deque()
+        self._history = max(1, fill_history)
+        self._lock = threading.Lock()
+
+    def handle_event(self, payload: Dict[str, Any]) -> str | None:
+        """Apply one user data stream event and return its type."""
+
+        event = payload.get("e")
+        if event == "executionReport":
+            self.apply_execution_report(payload)
+        elif event == "outboundAccountPosition":
+            self.apply_account_position(payload)
+        elif event == "balanceUpdate":
+            self.apply_balance_update(payload)
+        return event
+
+    def apply_execution_report(self, report: Dict[str, Any]) -> None:
+        """Update open orders, fills and positions from an ``executionReport``."""
+
+        # En las cancelaciones "c" es el ID de la petición y "C" el de la orden
+        client_id = report.get("C") or report["c"]
+        symbol = report["s"]
+        status = report["X"]
+        order = {
+            "symbol": symbol,
+            "client_order_id": client_id,
+            "order_id": report.get("i"),
+            "side": report["S"],
+            "type": report.get("o"),
+            "status": status,
+            "quantity": float(report.get("q", 0)),
+            "price": float(report.get("p", 0)),
+            "executed_qty": float(report.get("z", 0)),
+            "quote_qty": float(report.get("Z", 0)),
+        }
+        with self._lock:
+            new_fill = report.get("x") == "TRADE" and self._add_fill(report)
+            if status in OPEN_STATUSES:
+                self.open_orders[client_id] = order
+            else:
+                self.open_orders.pop(client_id, None)
+                if status == "FILLED" and new_fill:
+                    self.filled_orders += 1
+
+    def _add_fill(self, report: Dict[str, Any]) -> bool:
+        symbol = report["s"]
+        key = (symbol, report.get("t"))
+        if key in self._seen_trades:
+            return False
+        self._seen_trades.add(key)
+        self._trade_order.append(key)
+        if len(self._trade_order) > self._history:
+            self._seen_trades.discard(self._trade_order.popleft())
+        trade_id = report.get("t")
+        if trade_id is not None and trade_id >= 0:
+            self.last_trade_ids[symbol] = max(trade_id, self.last_trade_ids.get(symbol, trade_id))
+        qty = float(report["l"])
+        price = float(report["L"])
+        commission = float(report.get("n") or 0)
+        fill = {
+            "symbol": symbol,
+            "side": report["S"],
+            "qty": qty,
+            "price": price,
+            "commission": commission,
+            "commission_asset": report.get("N"),
+            "trade_id": report.get("t"),
+            "time": report.get("T"),
+        }
+        self.fills.append(fill)
+        position = self.positions.setdefault(
+            symbol, {"qty": 0.0, "avg_price": 0.0, "realized_pnl": 0.0}
+        )
+        # La comisión cobrada en el activo base reduce la cantidad recibida
+        base_fee = commission if report.get("N") == self.base_asset(symbol) else 0.0
+        if report["S"] == "BUY":
+            total = position["qty"] + qty
+            if total > 0:
+                position["avg_price"] = (position["avg_price"] * position["qty"] + price * qty) / total
+            position["qty"] = total - base_fee
+        else:
+            position["realized_pnl"] += (price - position["avg_price"]) * qty
+            position["qty"] -= qty + base_fee
+        return True
+
+    def base_asset(self, symbol: str) -> str:
+        """Return the base asset of ``symbol`` quoted in :attr:`quote_asset`."""
+
+        if symbol.endswith(self.quote_asset):
+            return symbol[: -len(self.quote_asset)]
+        return symbol
+
+    def apply_account_position(self, event: Dict[str, Any]) -> None:
+        """Replace the balances listed in an ``outboundAccountPosition`` event."""
+
+        with self._lock:
+            if self._stale(event.get("u", event.get("E"))):
+                return
+            for balance in event.get("B", []):
+                self.balances[balance["a"]] = {
+                    "free": float(balance["f"]),
+                    "locked": float(balance["l"]),
+                }
+
+    def apply_balance_update(self, event: Dict[str, Any]) -> None:
+        """Apply the deposit, withdrawal or transfer of a ``balanceUpdate`` event."""
+
+        with self._lock:
+            if self._stale(event.get("T", event.get("E"))):
+                return
+            balance = self.balances.setdefault(event["a"], {"free": 0.0, "locked": 0.0})
+            balance["free"] += float(event["d"])
+
+    def _stale(self, event_time) -> bool:
+        return (
+            event_time is not None
+            and self.reconciled_at is not None
+            and event_time <= self.reconciled_at
+        )
+
+    def last_trade_id(self, symbol: str) -> int | None:
+        """Return the ID of the newest trade seen on ``symbol``."""
+
+        with self._lock:
+            return self.last_trade_ids.get(symbol)
+
+    def reconcile(
+        self,
+        account: Dict[str, Any],
+        open_orders: List[Dict[str, Any]],
+        trades: List[Dict[str, Any]] = (),
+    ) -> int:
+        """Replace balances and open orders with REST snapshots.
+
+        ``account`` is the response of ``/api/v3/account``, ``open_orders``
+        the one of ``/api/v3/openOrders`` and ``trades`` entries of
+        ``/api/v3/myTrades``. Trades not seen yet are added to the fills and
+        positions.
+
+        Returns
+        -------
+        int
+            Number of trades recovered from ``trades``.
+        """
+
+        balances = {
+            b["asset"]: {"free": float(b["free"]), "locked": float(b["locked"])}
+            for b in account.get("balances", [])
+        }
+        orders = {
+            o["clientOrderId"]: {
+                "symbol": o["symbol"],
+                "client_order_id": o["clientOrderId"],
+                "order_id": o.get("orderId"),
+                "side": o["side"],
+                "type": o.get("type"),
+                "status": o["status"],
+                "quantity": float(o.get("origQty", 0)),
+                "price": float(o.get("price", 0)),
+                "executed_qty": float(o.get("executedQty", 0)),
+                "quote_qty": float(o.get("cummulativeQuoteQty", 0)),
+            }
+            for o in open_orders
+        }
+        reports = [
+            {
+                "s": t["symbol"],
+                "t": t["id"],
+                "S": "BUY" if t["isBuyer"] else "SELL",
+                "l": t["qty"],
+                "L": t["price"],
+                "n": t.get("commission"),
+                "N": t.get("commissionAsset"),
+                "T": t.get("time"),
+            }
+            for t in sorted(trades, key=lambda t: (t.get("time", 0), t["id"]))
+        ]
+        with self._lock:
+            recovered = sum(bool(self._add_fill(report)) for report in reports)
+            self.balances = balances
+            self.open_orders = orders
+            self.reconciled_at = account.get("updateTime")
+        return recovered
+
+    def balance(self, asset: str) -> float | None:
+        """Return the free balance of ``asset`` or ``None`` if unknown."""
+
+        with self._lock:
+            balance = self.balances.get(asset)
+            return balance["free"] if balance is not None else None
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Return a copy of the state for metrics."""
+
+        with self._lock:
+            return {
+                "open_orders": len(self.open_orders),
+                "filled_orders": self.filled_orders,
+                "fills": len(self.fills),
+                "positions": {s: dict(p) for s, p in self.positions.items() if p["qty"]},
+                "balances": {
+                    a: dict(b) for a, b in self.balances.items() if b["free"] or b["locked"]
+                },
+            }
+
+
+class UserDataStream:
+    """Keep an :class:`AccountState` up to date from the user data stream.
+
+    A listen key is requested through REST, kept alive every
+    ``listen_key_keepalive`` seconds and used to open
+    ``user_stream_url/ws/<listenKey>``. After every (re)connection the
+    account and its open orders are fetched once through REST to recover
+    events missed while disconnected; afterwards the state changes only with
+    stream events, so account endpoints are never polled. ``on_update`` is
+    invoked after the snapshot and after every event that changes balances.
+    The snapshot includes the trades of ``symbols`` and of every open
+    position made after the last trade seen (or after the stream started),
+    so fills that happened while disconnected still reach the positions.
+
+    Parameters
+    ----------
+    config : dict
+        Configuration with optional ``symbols``, ``user_stream_url``,
+        ``listen_key_keepalive`` and ``stream_reconnect_delay`` keys.
+    logger : logging.Logger
+        Logger used to report connection events.
+    client : trading.client.OrderClient
+        Client used for the listen key and the REST snapshots.
+    account : AccountState
+        State updated by the stream.
+    on_update : callable, optional
+        Called without arguments when balances change.
+    """
+
+    BALANCE_EVENTS = ("outboundAccountPosition", "balanceUpdate")
+
+    def __init__(self, config, logger, client, account, on_update=None):
+        self.logger = logger
+        self.client = client
+        self.account = account
+        self.on_update = on_update
+        self.base_url = config.get(
+            "user_stream_url", config.get("stream_url", "wss://stream.binance.com:9443")
+        )
+        self.reconnect_delay = config.get("stream_reconnect_delay", 1.0)
+        self.keepalive_interval = config.get("listen_key_keepalive", 1800)
+        self.symbols = list(config.get("symbols", []))
+        self.listen_key = None
+        self._since = None
+        self._stopped = False
+        self._ws = None
+
+    def handle_message(self, message):
+        """Apply one stream message and return its event type."""
+
+        data = json.loads(message)
+        payload = data.get("data", data)
+        event = self.account.handle_event(payload)
+        if event in self.BALANCE_EVENTS and self.on_update is not None:
+            self.on_update()
+        return event
+
+    def reconcile(self):
+        """Replace the account state with REST snapshots."""
+
+        trades = []
+        for symbol in sorted(set(self.symbols) | set(self.account.positions)):
+            last = self.account.last_trade_id(symbol)
+            if last is not None:
+                trades.extend(self.client.my_trades(symbol, from_id=last + 1))
+            elif self._since is not None:
+                trades.extend(self.client.my_trades(symbol, start_time=self._since))
+        recovered = self.account.reconcile(self.client.account(), self.client.open_orders(), trades)
+        self.logger.info(
+            f"Cuenta reconciliada: {len(self.account.open_orders)} órdenes abiertas, "
+            f"{recovered} fills recuperados"
+        )
+        if self.on_update is not None:
+            self.on_update()
+
+    async def _keepalive(self):
+        while True:
+            await asyncio.sleep(self.keepalive_interval)
+            try:
+                await asyncio.to_thread(self.client.keepalive_listen_key, self.listen_key)
+            except OrderError as exc:
+                self.logger.warning(f"No se pudo renovar la listenKey: {exc}")
+
+    async def run(self):
+        """Consume the stream until :meth:`stop` is called, reconnecting on errors."""
+
+        delay = self.reconnect_delay
+        if self._since is None:
+            self._since = int(time.time() * 1000)
+        while not self._stopped:
+            keepalive = None
+            try:
+                self.listen_key = await asyncio.to_thread(self.client.create_listen_key)
+                async with connect(f"{self.base_url}/ws/{self.listen_key}") as ws:
+                    self._ws = ws
+                    self.logger.info("Conectado al stream de usuario")
+                    # Los eventos perdidos sin conexión se recuperan con una foto REST
+                    await asyncio.to_thread(self.reconcile)
+                    delay = self.reconnect_delay
+                    keepalive = asyncio.create_task(self._keepalive())
+                    async for message in ws:
+                        if self.handle_message(message) == "listenKeyExpired":
+                            self.logger.warning("listenKey expirada; reconectando")
+                            break
+            except (OSError, WebSocketException, OrderError) as exc:
+                self.logger.warning(f"Stream de usuario desconectado: {exc}")
+            finally:
+                self._ws = None
+                if keepalive is not None:
+                    keepalive.cancel()
+            if not self._stopped:
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 60)
+        if self.listen_key is not None:
+            try:
+                await asyncio.to_thread(self.client.close_listen_key, self.listen_key)
+            except OrderError:
+                pass
+
+    async def stop(self):
+        """Stop consuming the stream and close the connection."""
+
+        self._stopped = True
+        if self._ws is not None:
+            await self._ws.close()
@@ -0,0 +1,377 @@
+"""Signed REST client for sending orders to Binance."""
+
+from __future__ import annotations
+
+import bisect
+import hashlib
+import hmac
+import threading
+import time
+import uuid
+from decimal import ROUND_DOWN, Decimal
+from typing import Any, Dict, List
+from urllib.parse import urlencode
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from modules.ratelimit import RateLimiter
+
+
+class OrderError(Exception):
+    """Error returned by the exchange for an order request."""
+
+    def __init__(self, status: int, code: int | None, message: str) -> None:
+        super().__init__(f"{status} {code}: {message}")
+        self.status = status
+        self.code = code
+        self.message = message
+
+
+# Binance rechaza un newClientOrderId repetido con este código
+DUPLICATE_ORDER = -2010
+DUPLICATE_MESSAGE = "Duplicate order sent."
+
+
+class LatencyHistogram:
+    """Thread-safe histogram of request latencies in milliseconds."""
+
+    BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+
+    def __init__(self) -> None:
+        self.counts = [0] * (len(self.BUCKETS_MS) + 1)
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float) -> None:
+        ms = seconds * 1000
+        with self._lock:
+            self.counts[bisect.bisect_left(self.BUCKETS_MS, ms)] += 1
+            self.count += 1
+            self.total_ms += ms
+            self.max_ms = max(self.max_ms, ms)
+
+    def quantile(self, q: float) -> float | None:
+        """Return the upper bound of the bucket holding quantile ``q``."""
+
+        with self._lock:
+            if not self.count:
+                return None
+            target = q * self.count
+            seen = 0
+            for bound, count in zip(self.BUCKETS_MS + (self.max_ms,), self.counts):
+                seen += count
+                if seen >= target:
+                    return float(min(bound, self.max_ms))
+            return self.max_ms
+
+    def summary(self) -> Dict[str, Any]:
+        """Return count, mean, p50/p99 bounds and bucket counts."""
+
+        p50, p99 = self.quantile(0.5), self.quantile(0.99)
+        with self._lock:
+            labels = [f"<={b}ms" for b in self.BUCKETS_MS] + [f">{self.BUCKETS_MS[-1]}ms"]
+            return {
+                "count": self.count,
+                "mean_ms": self.total_ms / self.count if self.count else None,
+                "p50_ms": p50,
+                "p99_ms": p99,
+                "max_ms": self.max_ms,
+                "buckets": dict(zip(labels, self.counts)),
+            }
+
+
+class OrderClient:
+    """Send HMAC-signed requests to the Binance spot trading API.
+
+    Requests share one keep-alive session. Every request spends weight from
+    a ``weight_per_minute`` :class:`modules.ratelimit.RateLimiter` and
+    the ``(method, endpoint)`` pairs in :attr:`limiters` also draw from their own bucket;
+    order placement is limited to ``orders_per_10s``. Each order
+    carries a client order ID generated before the first attempt and reused
+    on retries, so a retry after a lost response cannot place the order
+    twice; if the exchange reports it as a duplicate, the existing order is
+    fetched instead. Latency of every request is recorded per endpoint.
+    The ``LOT_SIZE`` and minimum notional filters of each symbol are fetched
+    from ``exchangeInfo`` once and cached, see :meth:`round_quantity` and
+    :meth:`meets_minimum`.
+
+    Parameters
+    ----------
+    config : dict
+        Configuration with ``api_url`` and optional ``trade_api_url``,
+        ``recv_window``, ``request_timeout``, ``order_retries``,
+        ``retry_backoff``, ``orders_per_10s`` and ``weight_per_minute``.
+    logger : logging.Logger
+        Logger used to report retries.
+    api_key, api_secret : str
+        Credentials used to sign requests.
+    """
+
+    ORDER_ENDPOINT = "/api/v3/order"
+    LISTEN_KEY_ENDPOINT = "/api/v3/userDataStream"
+    EXCHANGE_INFO_ENDPOINT = "/api/v3/exchangeInfo"
+
+    def __init__(self, config, logger, api_key, api_secret):
+        self.config = config
+        self.logger = logger
+        self.api_key = api_key or ""
+        self.api_secret = (api_secret or "").encode()
+        self.base_url = config.get("trade_api_url", config.get("api_url", "https://api.binance.com"))
+        self.recv_window = config.get("recv_window", 5000)
+        self.timeout = config.get("request_timeout", 10)
+        self.max_retries = config.get("order_retries", 3)
+        self.retry_backoff = config.get("retry_backoff", 0.5)
+        self.session = requests.Session()
+        self.session.headers["X-MBX-APIKEY"] = self.api_key
+        workers = max(1, config.get("order_workers", 4))
+        adapter = HTTPAdapter(pool_connections=workers, pool_maxsize=workers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.limiters = {
+            ("POST", self.ORDER_ENDPOINT): RateLimiter(config.get("orders_per_10s", 50), period=10),
+        }
+        self.weight_limiter = RateLimiter(config.get("weight_per_minute", 1200))
+        self.latency: Dict[str, LatencyHistogram] = {}
+        self._filters: Dict[str, Dict[str, Decimal]] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def new_client_order_id() -> str:
+        """Return a unique client order ID accepted by Binance (max 36 chars)."""
+
+        return f"bot-{uuid.uuid4().hex}"
+
+    def sign(self, params: Dict[str, Any]) -> str:
+        """Return the query string of ``params`` with its HMAC-SHA256 signature."""
+
+        query = urlencode(params)
+        signature = hmac.new(self.api_secret, query.encode(), hashlib.sha256).hexdigest()
+        return f"{query}&signature={signature}"
+
+    def _histogram(self, endpoint: str) -> LatencyHistogram:
+        with self._lock:
+            return self.latency.setdefault(endpoint, LatencyHistogram())
+
+    def request(
+        self, method: str, endpoint: str, params: Dict[str, Any], weight: int = 1, signed: bool = True
+    ) -> Any:
+        """Send a request, retrying network errors, 5xx, 418 and 429.
+
+        Signed requests get a fresh timestamp and signature on every attempt;
+        ``signed=False`` only sends the API key header. The limiters are
+        synced with the usage headers of every response.
+
+        Raises
+        ------
+        OrderError
+            If the exchange rejects the request or all attempts fail.
+        """
+
+        limiter = self.limiters.get((method, endpoint))
+        histogram = self._histogram(endpoint)
+        error = OrderError(0, None, "sin respuesta")
+        retry_after = None
+        for attempt in range(1, self.max_retries + 1):
+            if attempt > 1:
+                time.sleep(self._retry_delay(attempt, retry_after))
+            retry_after = None
+            self.weight_limiter.acquire(weight)
+            if limiter is not None:
+                limiter.acquire()
+            if signed:
+                query = self.sign(
+                    {**params, "recvWindow": self.recv_window, "timestamp": int(time.time() * 1000)}
+                )
+            else:
+                query = urlencode(params)
+            started = time.perf_counter()
+            try:
+                resp = self.session.request(
+                    method, f"{self.base_url}{endpoint}?{query}", timeout=self.timeout
+                )
+            except requests.RequestException as exc:
+                histogram.record(time.perf_counter() - started)
+                error = OrderError(0, None, str(exc))
+                self.logger.warning(f"Intento {attempt}: error de red en {endpoint}: {exc}")
+                continue
+            histogram.record(time.perf_counter() - started)
+            self._sync(resp.headers, limiter)
+            if resp.status_code == 200:
+                return resp.json()
+            try:
+                body = resp.json()
+            except ValueError:
+                body = {}
+            error = OrderError(resp.status_code, body.get("code"), body.get("msg", resp.text))
+            if resp.status_code in (418, 429):
+                retry_after = resp.headers.get("Retry-After")
+            elif resp.status_code < 500:
+                raise error
+            self.logger.warning(f"Intento {attempt}: respuesta {resp.status_code} en {endpoint}")
+        raise error
+
+    def _sync(self, headers, limiter) -> None:
+        used = headers.get("X-MBX-USED-WEIGHT-1M")
+        if used is not None:
+            self.weight_limiter.sync(int(used))
+        orders = headers.get("X-MBX-ORDER-COUNT-10S")
+        if orders is not None and limiter is not None:
+            limiter.sync(int(orders))
+
+    def _retry_delay(self, attempt, retry_after=None):
+        """Return the pause before ``attempt`` using exponential backoff.
+
+        A ``Retry-After`` value sent with 418/429 responses takes precedence.
+        """
+
+        if retry_after is not None:
+            try:
+                return float(retry_after)
+            except ValueError:
+                pass
+        return self.retry_backoff * 2 ** (attempt - 2)
+
+    def place_order(
+        self,
+        symbol: str,
+        side: str,
+        quantity: float | None = None,
+        quote_quantity: float | None = None,
+        order_type: str = "MARKET",
+        client_order_id: str | None = None,
+        **extra: Any,
+    ) -> Dict[str, Any]:
+        """Place an order and return the exchange's response.
+
+        Market buys are normally sized with ``quote_quantity`` (USDT to
+        spend) and sells with ``quantity`` (base asset).
+        """
+
+        params: Dict[str, Any] = {
+            "symbol": symbol,
+            "side": side,
+            "type": order_type,
+            "newClientOrderId": client_order_id or self.new_client_order_id(),
+            "newOrderRespType": "FULL",
+        }
+        if quantity is not None:
+            params["quantity"] = _format_number(quantity)
+        if quote_quantity is not None:
+            params["quoteOrderQty"] = _format_number(quote_quantity)
+        params.update(extra)
+        try:
+            return self.request("POST", self.ORDER_ENDPOINT, params)
+        except OrderError as exc:
+            if exc.code != DUPLICATE_ORDER or exc.message != DUPLICATE_MESSAGE:
+                raise
+            # Un intento anterior llegó al exchange: se devuelve esa orden
+            return self.get_order(symbol, params["newClientOrderId"])
+
+    def get_order(self, symbol: str, client_order_id: str) -> Dict[str, Any]:
+        """Return the order with ``client_order_id``."""
+
+        return self.request(
+            "GET", self.ORDER_ENDPOINT, {"symbol": symbol, "origClientOrderId": client_order_id}, weight=4
+        )
+
+    def symbol_filters(self, symbol: str) -> Dict[str, Decimal]:
+        """Return ``step_size``, ``min_qty`` and ``min_notional`` of ``symbol``.
+
+        The filters are requested from ``exchangeInfo`` the first time and
+        cached afterwards; a missing filter is returned as zero.
+        """
+
+        with self._lock:
+            filters = self._filters.get(symbol)
+        if filters is None:
+            info = self.request(
+                "GET", self.EXCHANGE_INFO_ENDPOINT, {"symbol": symbol}, weight=2, signed=False
+            )
+            filters = _parse_filters(info["symbols"][0].get("filters", []))
+            with self._lock:
+                self._filters[symbol] = filters
+        return filters
+
+    def round_quantity(self, symbol: str, quantity: float) -> Decimal:
+        """Round ``quantity`` down to the ``stepSize`` of ``symbol``."""
+
+        step = self.symbol_filters(symbol)["step_size"]
+        value = Decimal(str(quantity))
+        if step > 0:
+            value = (value / step).to_integral_value(ROUND_DOWN) * step
+        return value.normalize() if value else Decimal(0)
+
+    def meets_minimum(self, symbol: str, quantity: float | None = None, notional: float | None = None) -> bool:
+        """Return whether an order passes the ``minQty`` and minimum notional filters."""
+
+        filters = self.symbol_filters(symbol)
+        if quantity is not None and Decimal(str(quantity)) < max(filters["min_qty"], Decimal("1e-8")):
+            return False
+        return notional is None or Decimal(str(notional)) >= filters["min_notional"]
+
+    def account(self) -> Dict[str, Any]:
+        """Return the account snapshot with every asset balance."""
+
+        return self.request("GET", "/api/v3/account", {"omitZeroBalances": "true"}, weight=20)
+
+    def my_trades(
+        self, symbol: str, from_id: int | None = None, start_time: int | None = None
+    ) -> List[Dict[str, Any]]:
+        """Return the account's trades on ``symbol`` from trade ``from_id`` or ``start_time`` (ms)."""
+
+        params: Dict[str, Any] = {"symbol": symbol, "limit": 1000}
+        if from_id is not None:
+            params["fromId"] = from_id
+        elif start_time is not None:
+            params["startTime"] = start_time
+        return self.request("GET", "/api/v3/myTrades", params, weight=20)
+
+    def open_orders(self) -> List[Dict[str, Any]]:
+        """Return the open orders of every symbol."""
+
+        return self.request("GET", "/api/v3/openOrders", {}, weight=80)
+
+    def create_listen_key(self) -> str:
+        """Start a user data stream and return its listen key."""
+
+        return self.request("POST", self.LISTEN_KEY_ENDPOINT, {}, weight=2, signed=False)["listenKey"]
+
+    def keepalive_listen_key(self, listen_key: str) -> None:
+        """Extend the validity of ``listen_key`` by 60 minutes."""
+
+        self.request("PUT", self.LISTEN_KEY_ENDPOINT, {"listenKey": listen_key}, weight=2, signed=False)
+
+    def close_listen_key(self, listen_key: str) -> None:
+        """Close the user data stream of ``listen_key``."""
+
+        self.request("DELETE", self.LISTEN_KEY_ENDPOINT, {"listenKey": listen_key}, weight=2, signed=False)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the latency histogram summary of every endpoint."""
+
+        with self._lock:
+            histograms = dict(self.latency)
+        return {endpoint: h.summary() for endpoint, h in histograms.items()}
+
+
+def _parse_filters(filters: List[Dict[str, Any]]) -> Dict[str, Decimal]:
+    parsed = {"step_size": Decimal(0), "min_qty": Decimal(0), "min_notional": Decimal(0)}
+    for item in filters:
+        kind = item.get("filterType")
+        if kind == "LOT_SIZE":
+            parsed["step_size"] = Decimal(item.get("stepSize", "0"))
+            parsed["min_qty"] = Decimal(item.get("minQty", "0"))
+        elif kind in ("NOTIONAL", "MIN_NOTIONAL"):
+            # Binance sustituyó MIN_NOTIONAL por NOTIONAL; se aceptan ambos
+            parsed["min_notional"] = Decimal(item.get("minNotional", "0"))
+    return parsed
+
+
+def _format_number(value: float) -> str:
+    """Format ``value`` without exponent or trailing zeros."""
+
+    text = f"{float(value):.8f}".rstrip("0").rstrip(".")
+    return text or "0"
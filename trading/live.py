@@ -2,8 +2,14 @@
 
 
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 
+from trading.account import AccountState
+from trading.client import LatencyHistogram, OrderClient
+
 
 class Trader:
     """Execute real trades on the configured exchange."""
@@ -25,51 +31,227 @@ class Trader:
             load_dotenv(".env")
         self.api_key = os.environ.get("API_KEY", config.get("api_key"))
         self.api_secret = os.environ.get("API_SECRET", config.get("api_secret"))
+        self.client = OrderClient(config, logger, self.api_key, self.api_secret)
+        self.order_workers = max(1, config.get("order_workers", 4))
+        self.dispatch_latency = LatencyHistogram()
+        self.quote_asset = config.get("quote_asset", "USDT")
+        self.account = AccountState(config.get("fill_history", 1000), self.quote_asset)
+        self.holdings = {}
+        self.budget = config.get("balance", 1000)
+        self._spent = 0
+        self._reserved = 0
+        self._reserved_qty = {}
+        self._lock = threading.Lock()
         self.trades = 0
-        self.balance = config.get("balance", 1000)
+        self.balance = self.budget
 
     def execute(self, signals):
-        """Send trading orders for the provided signals."""
-
-        for signal in signals:
-            self.logger.info("Enviando orden real: %s", signal)
-            try:
-                usdt_amount = signal.get("usdt_amount")
-                if usdt_amount is None:
-                    self.logger.warning("Falta campo 'usdt_amount' en signal: %s", signal)
-                    usdt_amount = self.config.get("trade_size", 10)
-                price = signal.get("price")
-                if price is None:
-                    self.logger.warning("Falta campo 'price' en signal: %s", signal)
-                    price = 0
-                qty = signal.get("qty", usdt_amount / price if price else 0)
-                fill_price = float(price)
-                side = signal.get("side")
-                # Aquí implementas llamada a la API de Binance para crear orden
-                self.trades += 1
+        """Send trading orders for the provided signals.
+
+        Every signal is validated first and the USDT of each BUY is reserved
+        from the balance in signal order, so a batch can never spend more
+        than is available; SELLs are limited to the quantity held. The
+        accepted orders are then submitted in
+        parallel by up to ``order_workers`` threads and the time taken by the
+        whole batch is recorded in :attr:`dispatch_latency`.
+        """
+
+        started = time.perf_counter()
+        orders = [order for order in map(self._prepare, signals) if order is not None]
+        if self.order_workers > 1 and len(orders) > 1:
+            with ThreadPoolExecutor(max_workers=min(self.order_workers, len(orders))) as executor:
+                list(executor.map(self._submit, orders))
+        else:
+            for order in orders:
+                self._submit(order)
+        if orders:
+            elapsed = time.perf_counter() - started
+            self.dispatch_latency.record(elapsed)
+            self.logger.info(f"Lote de {len(orders)} órdenes enviado en {elapsed * 1000:.1f} ms")
+
+    def _prepare(self, signal):
+        """Validate ``signal`` and reserve its balance; return the order or ``None``."""
+
+        self.logger.info("Enviando orden real: %s", signal)
+        try:
+            usdt_amount = signal.get("usdt_amount")
+            if usdt_amount is None:
+                self.logger.warning("Falta campo 'usdt_amount' en signal: %s", signal)
+                usdt_amount = self.config.get("trade_size", 10)
+            price = signal.get("price")
+            if price is None:
+                self.logger.warning("Falta campo 'price' en signal: %s", signal)
+                price = 0
+            qty = signal.get("qty", usdt_amount / price if price else 0)
+            side = signal.get("side")
+            with self._lock:
                 if side == "BUY":
                     if usdt_amount > self.balance:
                         self.logger.warning(
                             f"Trade rechazado: monto ({usdt_amount}) mayor que el balance disponible ({self.balance})."
                         )
-                        continue
-                    self.balance -= usdt_amount
+                        return None
+                    # Reserva: se liquida con el monto realmente ejecutado
+                    self._reserved += usdt_amount
+                    self._refresh()
                 elif side == "SELL":
-                    self.balance += qty * fill_price
+                    symbol = signal.get("symbol", "n/a")
+                    held = self._held(symbol) - self._reserved_qty.get(symbol, 0.0)
+                    if held <= 0:
+                        self.logger.warning(f"Venta rechazada: no hay {symbol} disponible para vender.")
+                        return None
+                    if qty > held:
+                        self.logger.warning(
+                            f"Venta ajustada: cantidad ({qty}) mayor que la disponible ({held})."
+                        )
+                        qty = held
+                    self._reserved_qty[symbol] = self._reserved_qty.get(symbol, 0.0) + qty
                 else:
                     self.logger.warning("Valor 'side' inválido en signal: %s", signal)
-                self.logger.info(
-                    "Trade ejecutado | Modo: Real | Símbolo: %s | Acción: %s | Monto USDT: %s | Qty: %.8f | Precio: %.2f | Balance post-trade: %.2f",
-                    signal.get("symbol", "n/a"),
-                    side,
-                    usdt_amount,
-                    qty,
-                    fill_price,
-                    self.balance,
-                )
-            except Exception as exc:
-                self.logger.error("ERROR al ejecutar orden: %s", exc)
+                    return None
+            return {
+                "symbol": signal.get("symbol", "n/a"),
+                "side": side,
+                "usdt_amount": usdt_amount,
+                "qty": qty,
+                "price": float(price),
+            }
+        except Exception as exc:
+            self.logger.error("ERROR al ejecutar orden: %s", exc)
+            return None
+
+    def _held(self, symbol):
+        """Return the base quantity of ``symbol`` that can be sold.
+
+        The free balance reported by the exchange is used when known;
+        otherwise only what the bot bought during this run.
+        """
+
+        free = self.account.balance(self.account.base_asset(symbol))
+        return free if free is not None else self.holdings.get(symbol, 0.0)
+
+    def _release(self, order):
+        # Devuelve la reserva de una orden que no llegó a ejecutarse
+        with self._lock:
+            if order["side"] == "BUY":
+                self._reserved -= order["usdt_amount"]
+                self._refresh()
+            else:
+                self._reserved_qty[order["symbol"]] -= order["qty"]
+
+    def _submit(self, order):
+        """Place a prepared order and settle the balance with its fill.
+
+        SELL quantities are rounded down to the symbol's step size and orders
+        below its minimum size or notional are skipped. Only orders that
+        executed something count as trades.
+        """
+
+        symbol = order["symbol"]
+        side = order["side"]
+        reserved = order["usdt_amount"] if side == "BUY" else 0
+        try:
+            if side == "BUY":
+                if not self.client.meets_minimum(symbol, notional=reserved):
+                    self.logger.warning(
+                        f"Orden omitida: monto ({reserved}) por debajo del mínimo de {symbol}."
+                    )
+                    self._release(order)
+                    return
+                response = self.client.place_order(symbol, side, quote_quantity=reserved)
+                filled = _filled(response, reserved, order["qty"], order["price"])
+            else:
+                qty = self.client.round_quantity(symbol, order["qty"])
+                if not self.client.meets_minimum(symbol, qty, float(qty) * order["price"]):
+                    self.logger.warning(
+                        f"Orden omitida: cantidad ({order['qty']}) por debajo del mínimo de {symbol}."
+                    )
+                    self._release(order)
+                    return
+                response = self.client.place_order(symbol, side, quantity=qty)
+                filled = _filled(response, float(qty) * order["price"], float(qty), order["price"])
+        except Exception as exc:
+            self._release(order)
+            self.logger.error("ERROR al ejecutar orden: %s", exc)
+            return
+        if filled is None:
+            self._release(order)
+            self.logger.warning(
+                "Orden sin ejecutar | Símbolo: %s | Acción: %s | Estado: %s",
+                symbol,
+                side,
+                response.get("status"),
+            )
+            return
+        usdt_amount, qty, fill_price = filled
+        with self._lock:
+            self.trades += 1
+            # Cada orden se liquida una sola vez, aquí; el saldo se recalcula
+            if side == "BUY":
+                self._reserved -= reserved
+                self._spent += usdt_amount
+                self.holdings[symbol] = self.holdings.get(symbol, 0.0) + qty
+            else:
+                self._reserved_qty[symbol] -= order["qty"]
+                self._spent -= usdt_amount
+                self.holdings[symbol] = max(self.holdings.get(symbol, 0.0) - qty, 0.0)
+            balance = self._refresh()
+        self.logger.info(
+            "Trade ejecutado | Modo: Real | Símbolo: %s | Acción: %s | Monto USDT: %s | Qty: %.8f | Precio: %.2f | Balance post-trade: %.2f",
+            symbol,
+            side,
+            usdt_amount,
+            qty,
+            fill_price,
+            balance,
+        )
+
+    def _refresh(self):
+        # Llamar con el lock tomado; el saldo se deriva siempre de sus fuentes
+        balance = self.budget - self._spent - self._reserved
+        free = self.account.balance(self.quote_asset)
+        if free is not None:
+            balance = min(balance, free - self._reserved)
+        self.balance = balance
+        return balance
+
+    def sync_balance(self):
+        """Recompute :attr:`balance` after the exchange reports new balances.
+
+        The balance is the configured budget minus the USDT spent by settled
+        orders and reserved by orders in flight, capped by the free quote
+        balance on the exchange (also minus reservations) once the user data
+        stream has reported it. It is always derived from those sources, so a
+        fill seen by the stream before its order is settled is never counted
+        twice.
+        """
+
+        with self._lock:
+            self._refresh()
 
     def stats(self):
         """Return runtime trading statistics."""
-        return {"trades": self.trades, "balance": self.balance}
+        return {
+            "trades": self.trades,
+            "balance": self.balance,
+            "latency": self.client.stats(),
+            "dispatch": self.dispatch_latency.summary(),
+            "account": self.account.snapshot(),
+        }
+
+
+def _filled(order, usdt_amount, qty, price):
+    """Return ``(usdt_amount, qty, price)`` actually filled by ``order``.
+
+    Returns ``None`` when the exchange reports that nothing was executed,
+    e.g. a market order that expired. The requested values are kept only
+    when the response does not include ``executedQty`` at all.
+    """
+
+    if order.get("executedQty") is None:
+        return usdt_amount, qty, price
+    executed = float(order["executedQty"])
+    if executed <= 0:
+        return None
+    quote = float(order.get("cummulativeQuoteQty", 0) or 0) or executed * price
+    return quote, executed, quote / executed
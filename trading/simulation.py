@@ -1,10 +1,318 @@
 """Trading simulator used for backtests or dry runs."""
 
-import random
+from __future__ import annotations
+
+from time import perf_counter
+from typing import Any, Dict
+
+import numpy as np
+
+# Modelos de ejecución: precio de referencia de cada orden
+FILL_MODELS = ("close", "next_open", "vwap", "high_low")
+
+
+def candle_arrays(candles) -> Dict[str, np.ndarray]:
+    """Return the OHLCV columns of ``candles`` as float arrays.
+
+    ``candles`` is a data frame or a mapping of column arrays. A missing
+    ``open`` falls back to ``close``, missing ``high``/``low`` to ``close``
+    and missing volumes to zeros, which disables volume-dependent effects.
+    """
+
+    close = np.asarray(candles["close"], dtype=float)
+
+    def column(name, default):
+        return np.asarray(candles[name], dtype=float) if name in candles else default
+
+    zeros = np.zeros(len(close))
+    return {
+        "open": column("open", close),
+        "high": column("high", close),
+        "low": column("low", close),
+        "close": close,
+        "volume": column("volume", zeros),
+        "quote_volume": column("quote_asset_volume", zeros),
+    }
+
+
+def _arrays(candles):
+    # Evita reconvertir columnas que ya pasaron por candle_arrays
+    if isinstance(candles, dict) and "quote_volume" in candles:
+        return candles
+    return candle_arrays(candles)
+
+
+class ExecutionModel:
+    """Fill batches of orders against recorded candles.
+
+    An order decided at the close of candle ``i`` fills on candle ``i`` at
+    its close with ``fill_model="close"``; the other models fill on candle
+    ``i + 1`` at its open (``next_open``), at its volume-weighted average
+    price (``vwap``) or at its open clipped to its high/low range after
+    slippage (``high_low``). Orders without a fill candle are left unfilled.
+
+    At most ``max_volume_pct`` of the fill candle's volume is executed, so
+    large orders fill partially. Slippage grows with the square root of the
+    order's share of that volume: ``slippage_base + slippage_impact *
+    sqrt(participation)``, paid above the reference price on buys and below
+    it on sells. ``commission_pct`` of the notional is charged on every fill.
+    Candles without volume disable the volume cap and impact.
+
+    Parameters
+    ----------
+    fill_model : str
+        One of :data:`FILL_MODELS`.
+    commission_pct, slippage_base, slippage_impact, max_volume_pct : float
+        Cost and liquidity parameters described above.
+    """
+
+    def __init__(
+        self,
+        fill_model: str = "close",
+        commission_pct: float = 0.001,
+        slippage_base: float = 0.0,
+        slippage_impact: float = 0.0,
+        max_volume_pct: float = 0.0,
+    ) -> None:
+        if fill_model not in FILL_MODELS:
+            raise ValueError(f"Modelo de ejecución desconocido: {fill_model}")
+        self.fill_model = fill_model
+        self.commission_pct = commission_pct
+        self.slippage_base = slippage_base
+        self.slippage_impact = slippage_impact
+        self.max_volume_pct = max_volume_pct
+
+    @classmethod
+    def from_config(cls, config):
+        """Build the model from ``fill_model``, ``commission_pct``,
+        ``slippage_base``, ``slippage_impact`` and ``max_volume_pct``."""
+
+        return cls(
+            fill_model=config.get("fill_model", "close"),
+            commission_pct=config.get("commission_pct", 0.001),
+            slippage_base=config.get("slippage_base", 0.0),
+            slippage_impact=config.get("slippage_impact", 0.0),
+            max_volume_pct=config.get("max_volume_pct", 0.0),
+        )
+
+    def params(self):
+        """Return the parameters as a tuple, e.g. for cache keys."""
+
+        return (
+            self.fill_model,
+            self.commission_pct,
+            self.slippage_base,
+            self.slippage_impact,
+            self.max_volume_pct,
+        )
+
+    def fill(self, candles, index, side, quantity=None, quote=None, fill_model=None):
+        """Fill a batch of orders.
+
+        Parameters
+        ----------
+        candles : pandas.DataFrame or dict
+            Candles of one symbol, see :func:`candle_arrays`.
+        index : array_like
+            Candle at whose close each order is decided.
+        side : array_like
+            ``1`` for buys and ``-1`` for sells.
+        quantity, quote : array_like, optional
+            Size of each order in base asset or in quote asset (USDT); one
+            of them is required. Quote-sized buys never spend more than
+            ``quote``.
+        fill_model : str, optional
+            Overrides the configured model for this batch.
+
+        Returns
+        -------
+        dict
+            Arrays aligned with the orders: ``candle`` (fill candle or
+            ``-1``), ``price`` (``nan`` when unfilled), ``qty``, ``notional``
+            (``qty * price``), ``commission`` (in quote asset) and
+            ``filled`` (executed share of the requested size).
+        """
+
+        c = _arrays(candles)
+        model = fill_model or self.fill_model
+        index = np.atleast_1d(np.asarray(index, dtype=np.int64))
+        side = np.broadcast_to(np.asarray(side, dtype=float), index.shape)
+        n = len(c["close"])
+        j = index if model == "close" else index + 1
+        valid = (index >= 0) & (j < n)
+        k = np.clip(j, 0, max(n - 1, 0))
+        if model == "close":
+            ref = c["close"][k]
+        elif model == "vwap":
+            volume = c["volume"][k]
+            typical = (c["high"][k] + c["low"][k] + c["close"][k]) / 3
+            with np.errstate(divide="ignore", invalid="ignore"):
+                ref = np.where(
+                    (volume > 0) & (c["quote_volume"][k] > 0), c["quote_volume"][k] / volume, typical
+                )
+        else:
+            ref = c["open"][k]
+
+        volume = c["volume"][k]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            if quantity is not None:
+                requested = np.broadcast_to(np.asarray(quantity, dtype=float), index.shape)
+            else:
+                quote = np.broadcast_to(np.asarray(quote, dtype=float), index.shape)
+                requested = quote / ref
+            limited = (volume > 0) & (self.max_volume_pct > 0)
+            cap = np.where(limited, self.max_volume_pct * volume, np.inf)
+            qty = np.where(valid, np.minimum(requested, cap), 0.0)
+            participation = np.where(volume > 0, qty / volume, 0.0)
+            slip = self.slippage_base + self.slippage_impact * np.sqrt(participation)
+            price = np.where(valid, ref * (1 + side * slip), np.nan)
+            if model == "high_low":
+                price = np.clip(price, c["low"][k], c["high"][k])
+            notional = np.where(valid, qty * price, 0.0)
+            if quantity is None:
+                # Una compra en USDT gasta lo pedido, nunca más
+                spent = np.where(valid, np.minimum(quote, cap * price), 0.0)
+                notional = np.where(side > 0, spent, notional)
+                qty = np.where(side > 0, np.where(valid, spent / price, 0.0), qty)
+                filled = np.where(side > 0, spent / quote, qty / requested)
+            else:
+                filled = qty / requested
+            filled = np.where(requested > 0, filled, 0.0)
+        return {
+            "candle": np.where(valid, k, -1),
+            "price": price,
+            "qty": qty,
+            "notional": notional,
+            "commission": notional * self.commission_pct,
+            "filled": np.minimum(filled, 1.0),
+        }
+
+    def fill_trades(self, chunks, time, side, quantity=None, quote=None, latency_ms=0):
+        """Fill a batch of market orders against a stream of aggregated trades.
+
+        Each order walks the trades printed after ``time + latency_ms`` and
+        takes ``max_volume_pct`` of each trade's quantity (all of it when
+        ``0``) until its size is reached, so it fills at the VWAP of the
+        liquidity it consumed. ``slippage_base`` is added on top and
+        ``commission_pct`` is charged. Orders are matched independently and
+        never compete for the same trades.
+
+        ``chunks`` yields :data:`data_feed.trades.TRADE_DTYPE` arrays sorted
+        by time, e.g. :meth:`data_feed.trades.TradeArchive.chunks`. Every
+        chunk is processed with cumulative sums and binary searches for all
+        orders at once; orders that reach the end of a chunk carry their
+        remaining size to the next, so memory stays bounded by one chunk.
+
+        Returns
+        -------
+        dict
+            Arrays aligned with the orders: ``time`` (of the trade that
+            completed the order, ``-1`` if it never completed), ``price``
+            (``nan`` when nothing filled), ``qty``, ``notional``,
+            ``commission`` and ``filled``; plus ``trades``, the number of
+            trades replayed.
+        """
+
+        time = np.atleast_1d(np.asarray(time, dtype=np.int64)) + int(latency_ms)
+        side = np.broadcast_to(np.asarray(side, dtype=float), time.shape)
+        by_quote = quantity is None
+        target = np.broadcast_to(
+            np.asarray(quote if by_quote else quantity, dtype=float), time.shape
+        ).copy()
+        qty = np.zeros(len(time))
+        notional = np.zeros(len(time))
+        done_at = np.full(len(time), -1, dtype=np.int64)
+        share = self.max_volume_pct if self.max_volume_pct > 0 else 1.0
+        replayed = 0
+        for chunk in chunks:
+            n = len(chunk)
+            if n == 0:
+                continue
+            replayed += n
+            times = np.asarray(chunk["time"])
+            price = np.asarray(chunk["price"], dtype=float)
+            size = np.asarray(chunk["qty"], dtype=float) * share
+            # Sumas acumuladas con un cero inicial: cum[k] = suma de los k primeros
+            cum_qty = np.concatenate([[0.0], np.cumsum(size)])
+            cum_notional = np.concatenate([[0.0], np.cumsum(size * price)])
+            cum = cum_notional if by_quote else cum_qty
+            active = np.flatnonzero((done_at < 0) & (target > 0) & (time <= times[-1]))
+            if len(active) == 0:
+                continue
+            taken = notional if by_quote else qty
+            remaining = target[active] - taken[active]
+            start = np.searchsorted(times, time[active], "right")
+            base = cum[start]
+            end = np.searchsorted(cum, base + remaining, "left")
+            complete = end <= n
+            last = np.minimum(end, n) - 1
+            # Órdenes que se completan dentro del bloque
+            k = last[complete]
+            idx = active[complete]
+            partial_amount = base[complete] + remaining[complete] - cum[k]
+            partial_qty = partial_amount / price[k] if by_quote else partial_amount
+            qty[idx] += cum_qty[k] - cum_qty[start[complete]] + partial_qty
+            notional[idx] += cum_notional[k] - cum_notional[start[complete]] + partial_qty * price[k]
+            done_at[idx] = times[k]
+            # El resto consume todo el bloque y sigue en el siguiente
+            idx = active[~complete]
+            rest = start[~complete]
+            qty[idx] += cum_qty[n] - cum_qty[rest]
+            notional[idx] += cum_notional[n] - cum_notional[rest]
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            vwap = notional / qty
+            filled = np.where(target > 0, (notional if by_quote else qty) / target, 0.0)
+        price = vwap * (1 + side * self.slippage_base)
+        if by_quote:
+            # Con deslizamiento el mismo monto compra menos cantidad
+            qty = np.where(qty > 0, notional / price, 0.0)
+        else:
+            notional = qty * np.nan_to_num(price)
+        return {
+            "time": done_at,
+            "price": price,
+            "qty": qty,
+            "notional": notional,
+            "commission": notional * self.commission_pct,
+            "filled": np.minimum(filled, 1.0),
+            "trades": replayed,
+        }
+
+    def round_trip_prices(self, candles, quote):
+        """Return entry and exit prices of long positions held candle by candle.
+
+        ``entry[t]`` is the price of a buy decided at the close of candle
+        ``t - 1`` and ``exit[t]`` the price of a sell decided then, both for
+        orders of ``quote`` USDT; the first element repeats the first close.
+        The backtester marks positions to these prices so it agrees with
+        paper trading; partial fills are not modelled there.
+        """
+
+        c = _arrays(candles)
+        n = len(c["close"])
+        decided = np.arange(n - 1)
+        entry = np.empty(n)
+        exit = np.empty(n)
+        entry[0] = exit[0] = c["close"][0] if n else np.nan
+        entry[1:] = self.fill(c, decided, 1, quote=quote)["price"]
+        exit[1:] = self.fill(c, decided, -1, quote=quote)["price"]
+        return entry, exit
 
 
 class Simulator:
-    """Simulate order execution without interacting with an exchange."""
+    """Simulate order execution without interacting with an exchange.
+
+    Orders are filled by an :class:`ExecutionModel` built from the
+    configuration, the same one the backtester uses. Positions keep the base
+    quantity and the net USDT invested per symbol, so ``qty * price - cost``
+    is their profit. Sells never exceed the quantity held, as in live
+    trading, so positions are long or flat like the backtester's. With a
+    fill model that fills on the next candle, orders stay pending until
+    candle data containing that candle is passed to :meth:`simulate`; the
+    USDT of pending buys and the quantity of pending sells are reserved
+    meanwhile.
+    """
 
     def __init__(self, config, logger):
         """Create a new simulator instance.
@@ -20,10 +328,34 @@ class Simulator:
         self.config = config
         self.logger = logger
         self.balance = config.get("balance", 1000)  # Capital virtual inicial
-        self.commission_pct = 0.001
+        self.initial_balance = self.balance
+        self.commission_pct = config.get("commission_pct", 0.001)
+        self.engine = ExecutionModel.from_config(config)
+        self.positions: Dict[str, Dict[str, float]] = {}
+        self.prices: Dict[str, float] = {}
+        self.trades = 0
+        self.fees = 0.0
+        self.pending = []
+
+    def simulate(self, signals, data=None):
+        """Process signals updating the virtual balance.
+
+        Parameters
+        ----------
+        signals : list[dict]
+            Signals with ``symbol``, ``side``, ``price`` and ``usdt_amount``
+            or ``qty``.
+        data : list[pandas.DataFrame], optional
+            Latest candles of every symbol. Without candles for a symbol its
+            orders fill immediately at the signal price.
+        """
 
-    def simulate(self, signals):
-        """Process signals updating the virtual balance."""
+        frames = {}
+        for df in data or []:
+            if len(df) and "symbol" in df:
+                frames[df["symbol"].iloc[-1]] = df
+                self.prices[df["symbol"].iloc[-1]] = float(df["close"].iloc[-1])
+        self._fill_pending(frames)
 
         for signal in signals:
             usdt_amount = signal.get("usdt_amount")
@@ -35,31 +367,273 @@ class Simulator:
                 self.logger.warning("Falta campo 'price' en signal: %s", signal)
                 price = 0
             qty = signal.get("qty", usdt_amount / price if price else 0)
-            fill_price = self._simulate_slippage(signal)
             side = signal.get("side")
+            symbol = signal.get("symbol", "n/a")
             if side == "BUY":
                 if usdt_amount > self.balance:
                     self.logger.warning(
                         f"Trade rechazado: monto ({usdt_amount}) mayor que el balance disponible ({self.balance})."
                     )
                     continue
+                # Se reserva el monto; lo no ejecutado se devuelve al llenar
                 self.balance -= usdt_amount
             elif side == "SELL":
-                self.balance += qty * fill_price
+                # Como en Trader._prepare: solo se vende lo que se tiene y no está ya en venta
+                held = self._held(symbol)
+                if held <= 0:
+                    self.logger.warning(f"Venta rechazada: no hay {symbol} disponible para vender.")
+                    continue
+                if qty > held:
+                    self.logger.warning(
+                        f"Venta ajustada: cantidad ({qty}) mayor que la disponible ({held})."
+                    )
+                    qty = held
             else:
                 self.logger.warning("Valor 'side' inválido en signal: %s", signal)
-            self.logger.info(
-                "Trade ejecutado | Modo: Simulado | Símbolo: %s | Acción: %s | Monto USDT: %s | Qty: %.8f | Precio: %.2f | Balance post-trade: %.2f",
-                signal.get("symbol", "n/a"),
-                side,
-                usdt_amount,
-                qty,
-                fill_price,
-                self.balance,
-            )
-
-    def _simulate_slippage(self, signal):
-        """Return a fill price with random slippage applied."""
-
-        # Dummy: slippage aleatorio +/- 0.1%
-        return float(signal.get("price", 100)) * (1 + random.uniform(-0.001, 0.001))
+                continue
+            order = {
+                "symbol": symbol,
+                "side": side,
+                "quote": usdt_amount if side == "BUY" else None,
+                "qty": qty if side == "SELL" else None,
+            }
+            df = frames.get(symbol)
+            if df is None:
+                self.prices[symbol] = float(price)
+                self._execute(order, candle_arrays({"close": [float(price)]}), 0, "close")
+            elif self.engine.fill_model == "close":
+                self._execute(order, candle_arrays(df), len(df) - 1)
+            else:
+                order["open_time"] = df["open_time"].iloc[-1]
+                self.pending.append(order)
+
+    def _held(self, symbol):
+        """Return the quantity of ``symbol`` held and not reserved by pending sells."""
+
+        pending = sum(
+            order["qty"] for order in self.pending
+            if order["symbol"] == symbol and order["side"] == "SELL"
+        )
+        return self.positions.get(symbol, {}).get("qty", 0.0) - pending
+
+    def _cap_sells(self, symbol, side, fills, sequence):
+        """Limit the sells of ``fills`` to the position held when each is placed.
+
+        Orders are taken in ``sequence`` order and the position is their
+        running sum clamped at zero, so a sell never opens a short, as in
+        live trading; a sell from a flat position gets no quantity. The
+        quantity, notional, commission and fill ratio of capped sells are
+        scaled down in place.
+        """
+
+        qty = fills["qty"][sequence]
+        sells = side[sequence] < 0
+        start = max(self.positions.get(symbol, {}).get("qty", 0.0), 0.0)
+        level = start + np.cumsum(np.where(sells, -qty, qty * (1 - self.commission_pct)))
+        # Suma acumulada reflejada en cero: posición tras cada orden sin cortos
+        position = level - np.minimum(np.minimum.accumulate(level), 0.0)
+        before = np.concatenate([[start], position[:-1]])
+        allowed = np.where(sells, np.minimum(qty, before), qty)
+        capped = sells & (allowed < qty)
+        if not capped.any():
+            return
+        rejected = int((capped & (allowed <= 0)).sum())
+        self.logger.warning(
+            f"Ventas de {symbol} ajustadas a la posición: {int(capped.sum())} "
+            f"({rejected} rechazadas sin {symbol} disponible)"
+        )
+        scale = np.ones(len(fills["qty"]))
+        scale[sequence] = np.where(capped, allowed / np.where(qty > 0, qty, 1.0), 1.0)
+        for name in ("qty", "notional", "commission", "filled"):
+            fills[name] = fills[name] * scale
+
+    def _fill_pending(self, frames):
+        waiting = []
+        for order in self.pending:
+            df = frames.get(order["symbol"])
+            if df is None:
+                waiting.append(order)
+                continue
+            times = df["open_time"].to_numpy()
+            index = int(np.searchsorted(times, np.datetime64(order["open_time"])))
+            if index >= len(times) or times[index] != np.datetime64(order["open_time"]):
+                self.logger.warning("Orden simulada cancelada: sin vela de referencia %s", order)
+                self._refund(order, 0.0)
+                continue
+            if index + 1 >= len(times):
+                waiting.append(order)
+                continue
+            self._execute(order, candle_arrays(df), index)
+        self.pending = waiting
+
+    def _refund(self, order, spent):
+        if order["side"] == "BUY":
+            self.balance += order["quote"] - spent
+
+    def _execute(self, order, candles, index, fill_model=None):
+        buy = order["side"] == "BUY"
+        fill = self.engine.fill(
+            candles,
+            [index],
+            1 if buy else -1,
+            quantity=None if buy else [order["qty"]],
+            quote=[order["quote"]] if buy else None,
+            fill_model=fill_model,
+        )
+        fill = {name: values[0] for name, values in fill.items()}
+        self._refund(order, fill["notional"] if buy else 0.0)
+        if fill["qty"] <= 0:
+            self.logger.warning("Orden simulada sin ejecutar: %s", order)
+            return
+        self._apply(
+            order["symbol"], 1 if buy else -1, fill["qty"], fill["notional"], reserved=True
+        )
+        if fill["filled"] < 1:
+            self.logger.info("Ejecución parcial: %.1f%% de la orden", fill["filled"] * 100)
+        self.logger.info(
+            "Trade ejecutado | Modo: Simulado | Símbolo: %s | Acción: %s | Monto USDT: %s | Qty: %.8f | Precio: %.2f | Balance post-trade: %.2f",
+            order["symbol"],
+            order["side"],
+            fill["notional"],
+            fill["qty"],
+            fill["price"],
+            self.balance,
+        )
+
+    def _apply(self, symbol, side, qty, notional, reserved=False):
+        """Book fills of one symbol; arrays are summed in a single step.
+
+        Buys pay the notional and receive the quantity net of commission;
+        sells remove the quantity and credit the proceeds net of
+        commission. With ``reserved`` the buys were already deducted from
+        the balance when their signal was accepted.
+
+        Returns
+        -------
+        tuple of numpy.ndarray
+            Base asset and USDT flow of every fill.
+        """
+
+        side = np.atleast_1d(side)
+        qty = np.atleast_1d(qty)
+        notional = np.atleast_1d(notional)
+        buys = side > 0
+        commission = notional * self.commission_pct
+        base = np.where(buys, qty * (1 - self.commission_pct), -qty)
+        cash = np.where(buys, -notional, notional - commission)
+        position = self.positions.setdefault(symbol, {"qty": 0.0, "cost": 0.0})
+        position["qty"] += float(base.sum())
+        position["cost"] -= float(cash.sum())
+        self.balance += float(cash[~buys].sum() if reserved else cash.sum())
+        self.trades += len(qty)
+        self.fees += float(commission.sum())
+        return base, cash
+
+    def simulate_batch(self, symbol, candles, index, side, quantity=None, quote=None):
+        """Simulate a whole array of orders on the candles of ``symbol`` at once.
+
+        Orders are filled with :meth:`ExecutionModel.fill` and booked
+        together; unlike :meth:`simulate` the balance is not checked order
+        by order, so it may go negative. Sells are capped at the position
+        held, taking orders by candle (see :meth:`_cap_sells`).
+
+        Returns
+        -------
+        dict
+            The fills plus ``position``, the holdings of ``symbol`` after
+            each order, ``cash``, the cumulative USDT flow of the batch, and
+            ``equity``, the batch's profit marked to the last fill price.
+        """
+
+        c = candle_arrays(candles)
+        side = np.broadcast_to(np.asarray(side, dtype=float), np.shape(index))
+        fills = self.engine.fill(c, index, side, quantity=quantity, quote=quote)
+        self._cap_sells(symbol, side, fills, np.argsort(np.atleast_1d(index), kind="stable"))
+        done = fills["qty"] > 0
+        start = self.positions.get(symbol, {}).get("qty", 0.0)
+        base, cash = self._apply(
+            symbol, side[done], fills["qty"][done], fills["notional"][done]
+        )
+        self.prices[symbol] = float(c["close"][-1])
+        position = np.zeros(len(done))
+        flow = np.zeros(len(done))
+        position[done] = base
+        flow[done] = cash
+        position = np.cumsum(position)
+        flow = np.cumsum(flow)
+        # Cada orden se valora al precio del último llenado hasta ella
+        last = np.maximum.accumulate(np.where(done, np.arange(len(done)), -1))
+        mark = np.where(last >= 0, np.nan_to_num(fills["price"])[np.maximum(last, 0)], 0.0)
+        return {**fills, "position": start + position, "cash": flow, "equity": flow + position * mark}
+
+    def replay(self, symbol, archive, time, side, quantity=None, quote=None, start=None, end=None):
+        """Fill orders of ``symbol`` against a trade archive and book them.
+
+        The archive is streamed ``replay_chunk_trades`` trades at a time
+        through :meth:`ExecutionModel.fill_trades`, with orders eligible
+        ``replay_latency_ms`` after their ``time``. As in
+        :meth:`simulate_batch` the balance is not checked order by order and
+        sells are capped at the position, taking orders by submission time.
+
+        Parameters
+        ----------
+        symbol : str
+            Symbol of the orders.
+        archive : data_feed.trades.TradeArchive
+            Aggregated trades of ``symbol``.
+        time : array_like
+            Submission time of each order in ms.
+        side, quantity, quote : array_like
+            As in :meth:`ExecutionModel.fill`.
+        start, end : int, optional
+            Time range of the archive to replay; defaults to the orders'
+            first submission onwards.
+
+        Returns
+        -------
+        dict
+            The fills of :meth:`ExecutionModel.fill_trades` plus
+            ``seconds`` spent and ``trades_per_second`` replayed.
+        """
+
+        time = np.atleast_1d(np.asarray(time, dtype=np.int64))
+        side = np.broadcast_to(np.asarray(side, dtype=float), time.shape)
+        chunk_size = self.config.get("replay_chunk_trades", 1_000_000)
+        latency = self.config.get("replay_latency_ms", 0)
+        if start is None and len(time):
+            start = int(time.min()) + latency
+        started = perf_counter()
+        fills = self.engine.fill_trades(
+            archive.chunks(chunk_size, start, end), time, side, quantity, quote, latency
+        )
+        seconds = perf_counter() - started
+        self._cap_sells(symbol, side, fills, np.argsort(time, kind="stable"))
+        done = fills["qty"] > 0
+        self._apply(symbol, side[done], fills["qty"][done], fills["notional"][done])
+        if done.any():
+            self.prices[symbol] = float(fills["price"][done][-1])
+        rate = fills["trades"] / seconds if seconds > 0 else float("inf")
+        self.logger.info(
+            f"Replay de {symbol}: {fills['trades']} trades en {seconds:.3f} s ({rate:,.0f} trades/s), "
+            f"{int(done.sum())}/{len(time)} órdenes ejecutadas"
+        )
+        return {**fills, "seconds": seconds, "trades_per_second": rate}
+
+    def pnl(self) -> float:
+        """Return the profit of the simulation with positions at their last price."""
+
+        pending = sum(order["quote"] for order in self.pending if order["side"] == "BUY")
+        value = sum(p["qty"] * self.prices.get(s, 0.0) for s, p in self.positions.items())
+        return self.balance + pending + value - self.initial_balance
+
+    def stats(self) -> Dict[str, Any]:
+        """Return runtime simulation statistics."""
+
+        return {
+            "trades": self.trades,
+            "balance": self.balance,
+            "fees": self.fees,
+            "pending": len(self.pending),
+            "pnl": self.pnl(),
+            "positions": {s: dict(p) for s, p in self.positions.items() if p["qty"]},
+        }